@@ -1,5 +1,7 @@
 from .knowledge import router as knowledge_router
 from .chat import router as chat_router
 from .settings import router as settings_router
+from .admin import router as admin_router
+from .evaluation import router as evaluation_router
 
-__all__ = ["knowledge_router", "chat_router", "settings_router"]
+__all__ = ["knowledge_router", "chat_router", "settings_router", "admin_router", "evaluation_router"]
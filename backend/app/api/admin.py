@@ -0,0 +1,56 @@
+import asyncio
+import hmac
+import threading
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.config import settings
+from app.services.profiler import sample_threads, to_collapsed, slow_requests
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/api/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+_profile_lock = asyncio.Lock()
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(10.0, gt=0, le=120),
+    interval_ms: float = Query(5.0, ge=1, le=100),
+    all_threads: bool = False,
+):
+    """Sample this worker's stacks for ``seconds``; returns collapsed stacks for flamegraph.pl / speedscope."""
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    async with _profile_lock:
+        # This handler runs on the event loop thread, which is the one worth sampling
+        thread_ids = None if all_threads else [threading.get_ident()]
+        stacks = await asyncio.to_thread(sample_threads, seconds, interval_ms / 1000, thread_ids)
+    return to_collapsed(stacks)
+
+
+@router.get("/slow-requests")
+async def list_slow_requests():
+    return [
+        {key: value for key, value in record.items() if key != "profile"}
+        for record in reversed(slow_requests.records())
+    ]
+
+
+@router.get("/slow-requests/{record_id}")
+async def get_slow_request(record_id: int, format: str = "json"):
+    record = slow_requests.get(record_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Slow request not found (it may have been evicted)")
+    if format == "collapsed":
+        return PlainTextResponse(record["profile"])
+    return record
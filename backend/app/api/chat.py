@@ -1,42 +1,84 @@
 import json
+import time
 import asyncio
+import logging
 from uuid import UUID, uuid4
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from typing import List, Optional
 
 from app.db import get_db
-from app.models import Conversation, Message
-from app.schemas import ChatRequest, ChatMessageResponse, ConversationResponse
+from app.api.pagination import keyset, page, decode_cursor
+from app.models import Conversation, KnowledgeBase, Message
+from app.schemas import ChatRequest, ChatMessageResponse, ConversationResponse, SourceItem, SourceLookupRequest
 from app.services.retriever import retrieve_relevant_chunks
 from app.services.llm import stream_chat_response
-from app.db import async_session as async_session_factory
+from app.services.admission import AdmissionRejected, AdmissionTimeout
+from app.services.llm_router import NoProviderAvailable
+from app.services.message_sink import message_sink
+from app.services.metrics import stage, observe
+from app.services.profiler import slow_requests
+from app.services.sources import source_ref, resolve_sources
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
 
 @router.get("/conversations", response_model=List[ConversationResponse])
-async def list_conversations(knowledge_base_id: UUID, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(Conversation)
-        .where(Conversation.knowledge_base_id == knowledge_base_id)
-        .order_by(Conversation.updated_at.desc())
-    )
-    return result.scalars().all()
-
-
-@router.get("/conversations/{conv_id}/messages", response_model=List[ChatMessageResponse])
-async def get_messages(conv_id: UUID, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(Message).where(Message.conversation_id == conv_id).order_by(Message.created_at.asc())
-    )
-    return result.scalars().all()
+async def list_conversations(
+    knowledge_base_id: UUID,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_db),
+):
+    """Newest first; see app/api/pagination.py for the cursor."""
+    result = await db.execute(keyset(
+        select(Conversation).where(Conversation.knowledge_base_id == knowledge_base_id),
+        Conversation.updated_at, Conversation.id, cursor, limit, descending=True,
+    ))
+    conversations = result.scalars().all()
+    if not cursor:
+        # Buffered conversations are the newest ones, so they only belong on the first page
+        conversations = message_sink.merge_conversations(knowledge_base_id, conversations)
+    return page(conversations, limit, response, at=lambda c: c.updated_at)
+
+
+@router.get(
+    "/conversations/{conv_id}/messages", response_model=List[ChatMessageResponse], response_model_exclude_none=True,
+)
+async def get_messages(
+    conv_id: UUID,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db),
+):
+    """Oldest first; see app/api/pagination.py for the cursor."""
+    result = await db.execute(keyset(
+        select(Message).where(Message.conversation_id == conv_id),
+        Message.created_at, Message.id, cursor, limit, descending=False,
+    ))
+    messages = message_sink.merge_messages(conv_id, result.scalars().all())
+    if cursor:
+        after = decode_cursor(cursor)
+        messages = [m for m in messages if (m.created_at, m.id) > after]
+    return page(messages, limit, response)
+
+
+@router.post("/sources", response_model=List[SourceItem])
+async def lookup_sources(data: SourceLookupRequest):
+    """Resolve stored chunk references to url, title and text in one batch."""
+    return await resolve_sources(str(data.knowledge_base_id), [ref.model_dump() for ref in data.refs])
 
 
 @router.delete("/conversations/{conv_id}")
 async def delete_conversation(conv_id: UUID, db: AsyncSession = Depends(get_db)):
+    await message_sink.flush()
     conv = await db.get(Conversation, conv_id)
     if not conv:
         raise HTTPException(status_code=404, detail="Conversation not found")
@@ -47,78 +89,93 @@ async def delete_conversation(conv_id: UUID, db: AsyncSession = Depends(get_db))
 
 @router.post("/ask")
 async def ask_question(data: ChatRequest, db: AsyncSession = Depends(get_db)):
-    # Get or create conversation
-    if data.conversation_id:
-        conversation = await db.get(Conversation, data.conversation_id)
-        if not conversation:
-            raise HTTPException(status_code=404, detail="Conversation not found")
-    else:
-        conversation = Conversation(
-            knowledge_base_id=data.knowledge_base_id,
-            title=data.question[:50]
-        )
-        db.add(conversation)
-        await db.commit()
-        await db.refresh(conversation)
-
-    # Save user message
-    user_msg = Message(
-        conversation_id=conversation.id,
-        role="user",
-        content=data.question,
-        sources=[]
-    )
-    db.add(user_msg)
-    await db.commit()
+    op = slow_requests.begin("ask", data.question[:100])
+    try:
+        # Get or create conversation
+        if data.conversation_id:
+            conversation = message_sink.get_conversation(data.conversation_id)
+            if not conversation:
+                conversation = await db.get(Conversation, data.conversation_id)
+            if not conversation:
+                raise HTTPException(status_code=404, detail="Conversation not found")
+        else:
+            # The insert is deferred, so an unknown knowledge base has to be caught here
+            if not await db.get(KnowledgeBase, data.knowledge_base_id):
+                raise HTTPException(status_code=404, detail="Knowledge base not found")
+            conversation = message_sink.add_conversation(
+                knowledge_base_id=data.knowledge_base_id,
+                title=data.question[:50]
+            )
 
-    # Get conversation history
-    history_result = await db.execute(
-        select(Message)
-        .where(Message.conversation_id == conversation.id)
-        .order_by(Message.created_at.asc())
-    )
-    history = history_result.scalars().all()
+        # Save user message (flushed in the background)
+        message_sink.add_message(conversation.id, "user", data.question)
 
-    # Retrieve relevant chunks
-    chunks = await retrieve_relevant_chunks(
-        str(data.knowledge_base_id),
-        data.question
-    )
+        # Get conversation history
+        with stage("history"):
+            history_result = await db.execute(
+                select(Message)
+                .where(Message.conversation_id == conversation.id)
+                .order_by(Message.created_at.asc(), Message.id.asc())
+            )
+            history = message_sink.merge_messages(conversation.id, history_result.scalars().all())
+
+        # Retrieve relevant chunks
+        chunks = await retrieve_relevant_chunks(
+            str(data.knowledge_base_id),
+            data.question
+        )
 
-    # Build sources
-    sources = [
-        {"url": c["url"], "title": c["title"], "chunk_text": c["text"]}
-        for c in chunks
-    ]
+        # Build sources: full text for the live answer, chunk references for the stored message
+        sources = [
+            {**source_ref(c), "url": c["url"], "title": c["title"], "chunk_text": c["text"]}
+            for c in chunks
+        ]
+    except BaseException:
+        slow_requests.finish(op)
+        raise
 
     # Stream response
     async def event_stream():
-        full_response = ""
-        # Send conversation_id first
-        yield f"data: {json.dumps({'type': 'meta', 'conversation_id': str(conversation.id)})}\n\n"
-
-        async for token in stream_chat_response(
-            question=data.question,
-            context_chunks=chunks,
-            history=[(m.role, m.content) for m in history[:-1]]  # exclude current user msg
-        ):
-            full_response += token
-            yield f"data: {json.dumps({'type': 'token', 'content': token})}\n\n"
-
-        # Send sources
-        yield f"data: {json.dumps({'type': 'sources', 'sources': sources})}\n\n"
-
-        # Save assistant message
-        async with async_session_factory() as save_db:
-            assistant_msg = Message(
-                conversation_id=conversation.id,
-                role="assistant",
-                content=full_response,
-                sources=sources
-            )
-            save_db.add(assistant_msg)
-            await save_db.commit()
-
-        yield f"data: {json.dumps({'type': 'done'})}\n\n"
-
-    return StreamingResponse(event_stream(), media_type="text/event-stream")
+        try:
+            started_at = time.perf_counter()
+            full_response = ""
+            # Send conversation_id first
+            yield f"data: {json.dumps({'type': 'meta', 'conversation_id': str(conversation.id)})}\n\n"
+
+            try:
+                async for token in stream_chat_response(
+                    question=data.question,
+                    context_chunks=chunks,
+                    history=[(m.role, m.content) for m in history[:-1]],  # exclude current user msg
+                    report_queue=True,
+                ):
+                    if isinstance(token, dict):
+                        yield f"data: {json.dumps(token)}\n\n"
+                        continue
+                    full_response += token
+                    yield f"data: {json.dumps({'type': 'token', 'content': token})}\n\n"
+            except (AdmissionRejected, AdmissionTimeout, NoProviderAvailable) as e:
+                yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+                return
+            except Exception as e:
+                logger.exception("LLM stream failed")
+                yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+                return
+
+            # Send sources
+            yield f"data: {json.dumps({'type': 'sources', 'sources': sources})}\n\n"
+
+            # Save assistant message
+            message_sink.add_message(conversation.id, "assistant", full_response, [source_ref(c) for c in chunks])
+
+            yield f"data: {json.dumps({'type': 'done'})}\n\n"
+            observe("sse_stream", time.perf_counter() - started_at)
+        finally:
+            slow_requests.finish(op)
+
+    # The generator's finally never runs if the client leaves before the body starts
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        background=BackgroundTask(slow_requests.finish, op),
+    )
@@ -0,0 +1,43 @@
+import json
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.services.evaluation import evaluate, read_questions
+
+router = APIRouter(prefix="/api/eval", tags=["evaluation"])
+
+
+@router.post("/run")
+async def run_evaluation(
+    request: Request,
+    knowledge_base_id: Optional[UUID] = None,
+    concurrency: int = Query(None, ge=1, le=settings.eval_max_concurrency),
+    top_k: int = Query(None, ge=1, le=50),
+    include_context: bool = False,
+):
+    """Answer a JSON Lines body of questions without saving conversations; streams JSON Lines results.
+
+    ``knowledge_base_id`` applies to lines that don't name their own.
+    """
+    # Read the whole body up front: once the response streams, Starlette consumes the
+    # request's receive channel to watch for a disconnect
+    body = await request.body()
+
+    async def body_chunks():
+        yield body
+
+    async def results():
+        async for result in evaluate(
+            read_questions(body_chunks()),
+            default_kb_id=str(knowledge_base_id) if knowledge_base_id else None,
+            concurrency=concurrency,
+            top_k=top_k,
+            include_context=include_context,
+        ):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
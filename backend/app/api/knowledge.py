@@ -1,13 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func as sa_func
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
 from app.db import get_db
+from app.api.pagination import keyset, page
+from app.config import settings
 from app.models import KnowledgeBase, Document
-from app.schemas import KnowledgeBaseCreate, KnowledgeBaseResponse, DocumentAddRequest, DocumentResponse
+from app.schemas import (
+    KnowledgeBaseCreate, KnowledgeBaseResponse, DocumentAddRequest, DocumentResponse, IndexSettings,
+    StorageLayoutUpdate,
+)
 from app.services.crawler import process_urls
+from app.services.qdrant_store import update_index_settings, move_kb_layout, check_layout_move, LayoutMoveError
+from app.services.vector_gc import vector_gc
+from app.services.snapshot import export_snapshot, import_snapshot, StreamReader, SnapshotError
 
 router = APIRouter(prefix="/api/knowledge", tags=["knowledge"])
 
@@ -20,7 +29,12 @@ async def list_knowledge_bases(db: AsyncSession = Depends(get_db)):
 
 @router.post("/bases", response_model=KnowledgeBaseResponse)
 async def create_knowledge_base(data: KnowledgeBaseCreate, db: AsyncSession = Depends(get_db)):
-    kb = KnowledgeBase(name=data.name, description=data.description)
+    kb = KnowledgeBase(
+        name=data.name,
+        description=data.description,
+        index_settings=data.index_settings.model_dump(),
+        storage_layout=data.storage_layout or settings.default_storage_layout,
+    )
     db.add(kb)
     await db.commit()
     await db.refresh(kb)
@@ -35,22 +49,91 @@ async def get_knowledge_base(kb_id: UUID, db: AsyncSession = Depends(get_db)):
     return kb
 
 
+@router.put("/bases/{kb_id}/index", response_model=KnowledgeBaseResponse)
+async def update_kb_index_settings(kb_id: UUID, data: IndexSettings, db: AsyncSession = Depends(get_db)):
+    if settings.vector_store != "qdrant":
+        raise HTTPException(status_code=400, detail="Index settings require the Qdrant vector store")
+    kb = await db.get(KnowledgeBase, kb_id)
+    if not kb:
+        raise HTTPException(status_code=404, detail="Knowledge base not found")
+    kb.index_settings = data.model_dump()
+    await db.commit()
+    await db.refresh(kb)
+
+    # Rebuild the vector collection in the background; searches keep using the old one until the switch
+    import asyncio
+    asyncio.create_task(update_index_settings(str(kb_id), data))
+
+    return kb
+
+
+@router.put("/bases/{kb_id}/layout")
+async def update_kb_storage_layout(kb_id: UUID, data: StorageLayoutUpdate, db: AsyncSession = Depends(get_db)):
+    if settings.vector_store != "qdrant":
+        raise HTTPException(status_code=400, detail="Storage layouts require the Qdrant vector store")
+    kb = await db.get(KnowledgeBase, kb_id)
+    if not kb:
+        raise HTTPException(status_code=404, detail="Knowledge base not found")
+    try:
+        await check_layout_move(str(kb_id), data.layout)
+    except LayoutMoveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Vectors are copied in the background; the layout switches once the copy is done
+    import asyncio
+    asyncio.create_task(move_kb_layout(str(kb_id), data.layout))
+
+    return {"ok": True}
+
+
 @router.delete("/bases/{kb_id}")
 async def delete_knowledge_base(kb_id: UUID, db: AsyncSession = Depends(get_db)):
     kb = await db.get(KnowledgeBase, kb_id)
     if not kb:
         raise HTTPException(status_code=404, detail="Knowledge base not found")
+    layout = kb.storage_layout
     await db.delete(kb)
     await db.commit()
+    vector_gc.delete_knowledge_base(str(kb_id), layout)
     return {"ok": True}
 
 
-@router.get("/bases/{kb_id}/documents", response_model=List[DocumentResponse])
-async def list_documents(kb_id: UUID, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(Document).where(Document.knowledge_base_id == kb_id).order_by(Document.created_at.desc())
+@router.get("/bases/{kb_id}/snapshot")
+async def export_knowledge_base(kb_id: UUID, db: AsyncSession = Depends(get_db)):
+    """Stream a snapshot (documents, chunks and vectors) that import restores without re-embedding."""
+    kb = await db.get(KnowledgeBase, kb_id)
+    if not kb:
+        raise HTTPException(status_code=404, detail="Knowledge base not found")
+    return StreamingResponse(
+        export_snapshot(str(kb_id)),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="kb-{kb_id}.ragsnap"'},
     )
-    return result.scalars().all()
+
+
+@router.post("/bases/import")
+async def import_knowledge_base(request: Request, name: Optional[str] = None, force: bool = False):
+    """Create a knowledge base from a snapshot sent as the raw request body."""
+    try:
+        return await import_snapshot(StreamReader(chunks=request.stream().__aiter__()), name=name, force=force)
+    except SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/bases/{kb_id}/documents", response_model=List[DocumentResponse])
+async def list_documents(
+    kb_id: UUID,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+):
+    """Newest first; see app/api/pagination.py for the cursor."""
+    result = await db.execute(keyset(
+        select(Document).where(Document.knowledge_base_id == kb_id),
+        Document.created_at, Document.id, cursor, limit, descending=True,
+    ))
+    return page(result.scalars().all(), limit, response)
 
 
 @router.post("/bases/{kb_id}/documents", response_model=List[DocumentResponse])
@@ -91,4 +174,5 @@ async def delete_document(kb_id: UUID, doc_id: UUID, db: AsyncSession = Depends(
     kb.document_count = count_result.scalar()
 
     await db.commit()
+    vector_gc.delete_document(str(kb_id), str(doc_id))
     return {"ok": True}
@@ -0,0 +1,49 @@
+"""Keyset pagination over ``(timestamp, id)`` orderings.
+
+List endpoints take ``limit`` and an opaque ``cursor`` and return a plain list;
+when more rows follow, the cursor of the next page is in the ``X-Next-Cursor``
+response header.
+"""
+import base64
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException, Response
+from sqlalchemy import Select, tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(at: datetime, row_id: UUID) -> str:
+    return base64.urlsafe_b64encode(f"{at.isoformat()}|{row_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        at, row_id = raw.split("|")
+        return datetime.fromisoformat(at), UUID(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset(query: Select, at_column, id_column, cursor: Optional[str], limit: int, descending: bool) -> Select:
+    """Order by (at, id) and start after ``cursor``; fetches one extra row to tell if more follow."""
+    key = tuple_(at_column, id_column)
+    if cursor:
+        after = tuple_(*decode_cursor(cursor))
+        query = query.where(key < after if descending else key > after)
+    if descending:
+        query = query.order_by(at_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(at_column.asc(), id_column.asc())
+    return query.limit(limit + 1)
+
+
+def page(items: List, limit: int, response: Response, at: Callable = lambda item: item.created_at) -> List:
+    """The first ``limit`` items; sets the next-page cursor header when there were more."""
+    if len(items) > limit:
+        items = items[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(at(items[-1]), items[-1].id)
+    return items
@@ -9,6 +9,8 @@ from app.models import ModelConfig
 from app.schemas import ModelConfigCreate, ModelConfigResponse, ModelTestRequest
 from app.services.llm import test_llm_connection
 from app.services.embedding import test_embedding_connection
+from app.services.admission import admission_stats
+from app.services.llm_router import routing_stats
 
 router = APIRouter(prefix="/api/settings", tags=["settings"])
 
@@ -39,6 +41,10 @@ async def create_model(data: ModelConfigCreate, db: AsyncSession = Depends(get_d
         api_key=data.api_key,
         model_name=data.model_name,
         is_default=data.is_default,
+        max_concurrency=data.max_concurrency,
+        max_queue=data.max_queue,
+        queue_timeout=data.queue_timeout,
+        runtime=data.runtime,
     )
     db.add(model)
     await db.commit()
@@ -46,6 +52,18 @@ async def create_model(data: ModelConfigCreate, db: AsyncSession = Depends(get_d
     return model
 
 
+@router.get("/models/admission")
+async def get_admission_stats():
+    """Queue depth, in-flight count and wait times per LLM config."""
+    return admission_stats()
+
+
+@router.get("/models/routing")
+async def get_routing_stats():
+    """Rolling TTFT, error rate and circuit state per LLM provider."""
+    return routing_stats()
+
+
 @router.put("/models/{model_id}", response_model=ModelConfigResponse)
 async def update_model(model_id: UUID, data: ModelConfigCreate, db: AsyncSession = Depends(get_db)):
     model = await db.get(ModelConfig, model_id)
@@ -63,12 +81,9 @@ async def update_model(model_id: UUID, data: ModelConfigCreate, db: AsyncSession
         for m in result.scalars().all():
             m.is_default = False
 
-    model.name = data.name
-    model.base_url = data.base_url
-    model.api_key = data.api_key
-    model.model_name = data.model_name
-    model.is_default = data.is_default
-    model.type = data.type
+    # Fields the client did not send (e.g. admission limits the settings form doesn't show) keep their value
+    for field, value in data.model_dump(exclude_unset=True).items():
+        setattr(model, field, value)
 
     await db.commit()
     await db.refresh(model)
@@ -91,7 +106,7 @@ async def test_model(data: ModelTestRequest):
         if data.type == "llm":
             result = await test_llm_connection(data.base_url, data.api_key, data.model_name)
         else:
-            result = await test_embedding_connection(data.base_url, data.api_key, data.model_name)
+            result = await test_embedding_connection(data.base_url, data.api_key, data.model_name, data.runtime)
         return {"ok": True, "message": result}
     except Exception as e:
         return {"ok": False, "message": str(e)}
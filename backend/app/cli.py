@@ -0,0 +1,229 @@
+"""Maintenance commands.
+
+    python -m app.cli move-layout <kb_id> shared
+    python -m app.cli consolidate --max-points 20000
+    python -m app.cli reconcile-vectors
+    python -m app.cli export-onnx BAAI/bge-m3
+    python -m app.cli check-onnx BAAI/bge-m3 --texts samples.txt
+    python -m app.cli export-kb <kb_id> kb.ragsnap
+    python -m app.cli import-kb kb.ragsnap --name "Help center (copy)"
+    python -m app.cli compact-sources --dry-run
+    python -m app.cli evaluate questions.jsonl --kb <kb_id> --output results.jsonl
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+
+from sqlalchemy import select
+
+from app.db import async_session
+from app.models import KnowledgeBase
+from app.services.qdrant_store import move_kb_layout, count_kb_points, LAYOUT_DEDICATED, LAYOUT_SHARED
+from app.services.vector_gc import vector_gc
+from app.services import onnx_embedder
+from app.services.sources import compact_message_sources
+from app.services.evaluation import evaluate, read_questions
+from app.services.snapshot import export_snapshot, import_snapshot, StreamReader, SnapshotError
+
+
+async def _move_layout(args):
+    await move_kb_layout(args.kb_id, args.layout)
+
+
+async def _consolidate(args):
+    """Move every dedicated knowledge base with at most --max-points vectors into the shared collection."""
+    async with async_session() as db:
+        result = await db.execute(select(KnowledgeBase.id).where(KnowledgeBase.storage_layout != LAYOUT_SHARED))
+        kb_ids = [str(kb_id) for kb_id in result.scalars().all()]
+
+    small = []
+    for kb_id in kb_ids:
+        count = await asyncio.to_thread(count_kb_points, kb_id, LAYOUT_DEDICATED)
+        if count <= args.max_points:
+            small.append(kb_id)
+            print(f"{kb_id}: {count} points")
+    print(f"{len(small)} of {len(kb_ids)} dedicated knowledge bases qualify")
+    if args.dry_run:
+        return
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def move(kb_id):
+        async with semaphore:
+            await move_kb_layout(kb_id, LAYOUT_SHARED)
+
+    await asyncio.gather(*(move(kb_id) for kb_id in small))
+
+
+async def _reconcile_vectors(args):
+    """Purge vectors whose document or knowledge base no longer exists."""
+    found = await vector_gc.reconcile()
+    print(f"Orphaned: {found['knowledge_bases']} knowledge bases, {found['documents']} documents")
+    if not args.dry_run:
+        await vector_gc.collect()
+
+
+async def _export_onnx(args):
+    out_dir = await asyncio.to_thread(onnx_embedder.export_model, args.model)
+    print(f"Exported {args.model} to {out_dir}")
+    if not args.skip_check:
+        await _check_onnx(args)
+
+
+async def _check_onnx(args):
+    """Compare the int8 export with the reference model; exits 1 below --min-cosine."""
+    texts = None
+    if getattr(args, "texts", None):
+        with open(args.texts) as f:
+            texts = [line.strip() for line in f if line.strip()]
+    report = await asyncio.to_thread(onnx_embedder.check_quality, args.model, texts)
+    print(json.dumps(report, indent=2))
+    if report["mean_cosine"] < args.min_cosine:
+        print(f"Mean cosine {report['mean_cosine']} is below {args.min_cosine}", file=sys.stderr)
+        sys.exit(1)
+
+
+async def _export_kb(args):
+    size = 0
+    with open(args.path, "wb") as f:
+        try:
+            async for data in export_snapshot(args.kb_id):
+                f.write(data)
+                size += len(data)
+        except SnapshotError as e:
+            print(f"Export failed: {e}", file=sys.stderr)
+            sys.exit(1)
+    print(f"Wrote {size / 1e6:.1f} MB to {args.path}")
+
+
+async def _import_kb(args):
+    with open(args.path, "rb") as f:
+        async def read(n):
+            return f.read(n)
+
+        try:
+            result = await import_snapshot(StreamReader(read=read), name=args.name, force=args.force)
+        except SnapshotError as e:
+            print(f"Import failed: {e}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            # Vectors of a failed import are queued for deletion; purge them before exiting
+            await vector_gc.collect()
+    print(json.dumps(result, indent=2))
+
+
+async def _compact_sources(args):
+    """Replace the chunk text copied into old messages' sources with chunk references."""
+    stats = await compact_message_sources(args.batch_size, args.dry_run)
+    print(json.dumps(stats, indent=2))
+    if stats["updated"] and not args.dry_run:
+        print("Run VACUUM FULL messages (or pg_repack) to return the freed space to the OS")
+
+
+async def _evaluate(args):
+    """Answer every question of a JSON Lines file, writing JSON Lines results; summary on stderr."""
+    async def file_chunks():
+        with open(args.questions, "rb") as f:
+            while data := f.read(1 << 16):
+                yield data
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    started = time.perf_counter()
+    total = errors = hits = ranked = 0
+    llm_ms = []
+    try:
+        async for result in evaluate(
+            read_questions(file_chunks()), args.kb, args.concurrency, args.top_k, args.include_context,
+        ):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            total += 1
+            errors += result["error"] is not None
+            if "retrieval" in result:
+                ranked += 1
+                hits += result["retrieval"]["hit"]
+            if "llm" in result["timings_ms"]:
+                llm_ms.append(result["timings_ms"]["llm"])
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    llm_ms.sort()
+    summary = {
+        "questions": total,
+        "errors": errors,
+        "seconds": round(time.perf_counter() - started, 1),
+        "retrieval_hit_rate": round(hits / ranked, 4) if ranked else None,
+        "llm_p50_ms": llm_ms[len(llm_ms) // 2] if llm_ms else None,
+        "llm_p95_ms": llm_ms[int(len(llm_ms) * 0.95)] if llm_ms else None,
+    }
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    move = commands.add_parser("move-layout", help="Move a knowledge base between vector storage layouts")
+    move.add_argument("kb_id")
+    move.add_argument("layout", choices=[LAYOUT_DEDICATED, LAYOUT_SHARED])
+    move.set_defaults(handler=_move_layout)
+
+    consolidate = commands.add_parser("consolidate", help="Move small knowledge bases into the shared collection")
+    consolidate.add_argument("--max-points", type=int, default=10000)
+    consolidate.add_argument("--concurrency", type=int, default=4)
+    consolidate.add_argument("--dry-run", action="store_true")
+    consolidate.set_defaults(handler=_consolidate)
+
+    reconcile = commands.add_parser("reconcile-vectors", help="Purge vectors of deleted documents and knowledge bases")
+    reconcile.add_argument("--dry-run", action="store_true")
+    reconcile.set_defaults(handler=_reconcile_vectors)
+
+    export_onnx = commands.add_parser("export-onnx", help="Export a local embedding model to int8 ONNX")
+    export_onnx.add_argument("model")
+    export_onnx.add_argument("--skip-check", action="store_true")
+    export_onnx.add_argument("--min-cosine", type=float, default=0.99)
+    export_onnx.set_defaults(handler=_export_onnx)
+
+    check_onnx = commands.add_parser("check-onnx", help="Compare an int8 ONNX export with the reference model")
+    check_onnx.add_argument("model")
+    check_onnx.add_argument("--texts", help="file with one sample text per line")
+    check_onnx.add_argument("--min-cosine", type=float, default=0.99)
+    check_onnx.set_defaults(handler=_check_onnx)
+
+    export_kb = commands.add_parser("export-kb", help="Write a knowledge base snapshot, vectors included")
+    export_kb.add_argument("kb_id")
+    export_kb.add_argument("path")
+    export_kb.set_defaults(handler=_export_kb)
+
+    import_kb = commands.add_parser("import-kb", help="Create a knowledge base from a snapshot without re-embedding")
+    import_kb.add_argument("path")
+    import_kb.add_argument("--name", help="name of the new knowledge base (default: the exported one's)")
+    import_kb.add_argument("--force", action="store_true", help="import even if the embedding model differs")
+    import_kb.set_defaults(handler=_import_kb)
+
+    compact = commands.add_parser("compact-sources", help="Rewrite stored message sources as chunk references")
+    compact.add_argument("--batch-size", type=int, default=500)
+    compact.add_argument("--dry-run", action="store_true")
+    compact.set_defaults(handler=_compact_sources)
+
+    evaluate_cmd = commands.add_parser(
+        "evaluate", help="Answer a file of questions without saving conversations (JSON Lines in and out)",
+    )
+    evaluate_cmd.add_argument("questions", help="JSON Lines of {question, knowledge_base_id?, id?, expected_urls?}")
+    evaluate_cmd.add_argument("--kb", help="knowledge base for questions that don't name one")
+    evaluate_cmd.add_argument("--output", help="results file (default: stdout)")
+    evaluate_cmd.add_argument("--concurrency", type=int, help="LLM calls in flight (default: EVAL_CONCURRENCY)")
+    evaluate_cmd.add_argument("--top-k", type=int)
+    evaluate_cmd.add_argument("--include-context", action="store_true", help="include chunk text in sources")
+    evaluate_cmd.set_defaults(handler=_evaluate)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
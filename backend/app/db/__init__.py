@@ -1,3 +1,3 @@
-from .database import Base, get_db, init_db, engine, async_session
+from .database import Base, get_db, init_db, create_missing_indexes, engine, async_session, try_advisory_lock
 
-__all__ = ["Base", "get_db", "init_db", "engine", "async_session"]
+__all__ = ["Base", "get_db", "init_db", "create_missing_indexes", "engine", "async_session", "try_advisory_lock"]
@@ -1,7 +1,16 @@
+import logging
+import re
+from contextlib import asynccontextmanager
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
 engine = create_async_engine(settings.database_url, echo=False)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
@@ -15,6 +24,79 @@ async def get_db():
         yield session
 
 
+@asynccontextmanager
+async def try_advisory_lock(key: int):
+    """Session-level pg advisory lock on its own connection.
+
+    Yields the (autocommit) connection holding the lock, or None if another session
+    has it. The lock is released before the connection goes back to the pool.
+    """
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        if not await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}):
+            yield None
+            return
+        try:
+            yield conn
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+
+
+# Columns added after a table was first created; create_all does not alter existing tables
+ADDED_COLUMNS = [
+    ("model_configs", "max_concurrency", "INTEGER"),
+    ("model_configs", "max_queue", "INTEGER"),
+    ("model_configs", "queue_timeout", "DOUBLE PRECISION"),
+    ("model_configs", "runtime", "VARCHAR(30)"),
+    ("knowledge_bases", "index_settings", "JSONB DEFAULT '{}'::jsonb"),
+    ("knowledge_bases", "storage_layout", "VARCHAR(20) DEFAULT 'dedicated'"),
+    ("knowledge_bases", "storage_migration", "JSONB"),
+]
+
+
+INDEX_MIGRATION_LOCK = 0x72616769  # arbitrary pg advisory lock key
+
+
+def _index_migrations() -> list:
+    """CREATE INDEX CONCURRENTLY statements for every index declared on the models.
+
+    create_all only creates indexes together with their table, so indexes added to
+    a model later are created here, without blocking writes to a populated table.
+    """
+    statements = []
+    for table in Base.metadata.sorted_tables:
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=postgresql.dialect()))
+            statements.append((index.name, re.sub(r"^CREATE (UNIQUE )?INDEX", r"CREATE \1INDEX CONCURRENTLY", ddl)))
+    return statements
+
+
+async def create_missing_indexes():
+    """Build indexes missing from the database; run in the background after startup.
+
+    One worker builds; the others skip it. A build cut short by shutdown leaves an
+    invalid index, which is dropped and rebuilt on the next start.
+    """
+    try:
+        async with try_advisory_lock(INDEX_MIGRATION_LOCK) as conn:
+            if conn is None:
+                return
+            for name, ddl in _index_migrations():
+                # An interrupted concurrent build leaves an invalid index that IF NOT EXISTS would keep
+                invalid = await conn.scalar(text(
+                    "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE c.relname = :name AND NOT i.indisvalid"
+                ), {"name": name})
+                if invalid:
+                    logger.warning(f"Rebuilding invalid index {name}")
+                    await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+                await conn.execute(text(ddl))
+    except Exception:
+        logger.exception("Failed to create missing indexes")
+
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        for table, column, ddl in ADDED_COLUMNS:
+            await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {ddl}"))
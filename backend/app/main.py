@@ -1,15 +1,30 @@
+import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.db import init_db
-from app.api import knowledge_router, chat_router, settings_router
+from app.db import init_db, create_missing_indexes
+from app.api import knowledge_router, chat_router, settings_router, admin_router, evaluation_router
+from app.api.pagination import NEXT_CURSOR_HEADER
+from app.services.message_sink import message_sink
+from app.services.vector_gc import vector_gc
+from app.services.metrics import ServerTimingMiddleware, loop_lag_monitor, render as render_metrics
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    # CREATE INDEX CONCURRENTLY can take minutes on a large table; serve meanwhile
+    index_build = asyncio.create_task(create_missing_indexes())
+    message_sink.start()
+    vector_gc.start()
+    loop_lag_monitor.start()
     yield
+    index_build.cancel()
+    await asyncio.gather(index_build, return_exceptions=True)
+    await loop_lag_monitor.stop()
+    await message_sink.stop()
+    await vector_gc.stop()
 
 
 app = FastAPI(
@@ -25,13 +40,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", NEXT_CURSOR_HEADER],
 )
+app.add_middleware(ServerTimingMiddleware)
 
 app.include_router(knowledge_router)
 app.include_router(chat_router)
 app.include_router(settings_router)
+app.include_router(admin_router)
+app.include_router(evaluation_router)
 
 
 @app.get("/api/health")
 async def health_check():
     return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
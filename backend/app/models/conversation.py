@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import String, DateTime, Text, ForeignKey, func
+from sqlalchemy import String, DateTime, Text, ForeignKey, Index, func
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 from app.db import Base
@@ -8,20 +8,27 @@ from app.db import Base
 
 class Conversation(Base):
     __tablename__ = "conversations"
+    # Keyset pagination of a knowledge base's conversations, newest first (scanned backwards)
+    __table_args__ = (Index("ix_conversations_kb_updated", "knowledge_base_id", "updated_at", "id"),)
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     knowledge_base_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("knowledge_bases.id"), nullable=False)
     title: Mapped[str] = mapped_column(String(500), default="新对话")
-    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
-    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+    # Naive UTC from the app's clock, like the rows buffered by message_sink; func.now() would
+    # use the database server's time zone and order differently from pending rows
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, server_default=func.now(), onupdate=datetime.utcnow
+    )
 
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (Index("ix_messages_conversation_created", "conversation_id", "created_at", "id"),)
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     conversation_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("conversations.id"), nullable=False)
     role: Mapped[str] = mapped_column(String(20), nullable=False)  # user, assistant
     content: Mapped[str] = mapped_column(Text, nullable=False)
-    sources: Mapped[dict] = mapped_column(JSONB, default=list)  # [{url, title, chunk_text}]
-    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    sources: Mapped[dict] = mapped_column(JSONB, default=list)  # [{doc_id, chunk_index, score}], see services/sources.py
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_default=func.now())
@@ -1,7 +1,8 @@
 import uuid
 from datetime import datetime
+from typing import Optional
 from sqlalchemy import String, DateTime, Integer, func
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db import Base
 
@@ -13,6 +14,10 @@ class KnowledgeBase(Base):
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     description: Mapped[str] = mapped_column(String(1000), default="")
     document_count: Mapped[int] = mapped_column(Integer, default=0)
+    index_settings: Mapped[dict] = mapped_column(JSONB, default=dict)  # see schemas.IndexSettings
+    storage_layout: Mapped[str] = mapped_column(String(20), default="dedicated")  # dedicated, shared
+    # Rebuild or layout move in progress, see services/qdrant_store.py
+    storage_migration: Mapped[Optional[dict]] = mapped_column(JSONB(none_as_null=True), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
 
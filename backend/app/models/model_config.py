@@ -1,6 +1,7 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import String, DateTime, Text, func
+from typing import Optional
+from sqlalchemy import String, DateTime, Text, Integer, Float, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column
 from app.db import Base
@@ -16,5 +17,11 @@ class ModelConfig(Base):
     api_key: Mapped[str] = mapped_column(Text, default="")
     model_name: Mapped[str] = mapped_column(String(100), nullable=False)
     is_default: Mapped[bool] = mapped_column(default=False)
+    # LLM admission control, NULL falls back to settings
+    max_concurrency: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    max_queue: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    queue_timeout: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    # Local embedding inference: sentence-transformers (NULL) or onnx-int8
+    runtime: Mapped[Optional[str]] = mapped_column(String(30), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
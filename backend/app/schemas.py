@@ -1,13 +1,34 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Literal
 from uuid import UUID
 from datetime import datetime
 
 
 # Knowledge Base
+class IndexSettings(BaseModel):
+    """Vector index settings of a knowledge base's Qdrant collection."""
+    distance: Literal["cosine", "dot", "euclid"] = "cosine"
+    quantization: Optional[Literal["scalar", "product"]] = None
+    quantization_always_ram: bool = True
+    rescore: bool = True
+    # Bounds Qdrant enforces; the settings are saved before the rebuild runs
+    oversampling: float = Field(2.0, ge=1.0)
+    on_disk_vectors: bool = False
+    on_disk_payload: bool = False
+    hnsw_m: Optional[int] = Field(None, ge=0)  # 0 disables the HNSW graph
+    hnsw_ef_construct: Optional[int] = Field(None, ge=4)
+    search_ef: Optional[int] = Field(None, ge=1)
+
+
 class KnowledgeBaseCreate(BaseModel):
     name: str
     description: str = ""
+    index_settings: IndexSettings = IndexSettings()
+    storage_layout: Optional[Literal["dedicated", "shared"]] = None  # defaults to settings.default_storage_layout
+
+
+class StorageLayoutUpdate(BaseModel):
+    layout: Literal["dedicated", "shared"]
 
 
 class KnowledgeBaseResponse(BaseModel):
@@ -15,6 +36,8 @@ class KnowledgeBaseResponse(BaseModel):
     name: str
     description: str
     document_count: int
+    index_settings: Optional[IndexSettings] = None
+    storage_layout: str = "dedicated"
     created_at: datetime
     updated_at: datetime
 
@@ -48,9 +71,23 @@ class ChatRequest(BaseModel):
 
 
 class SourceItem(BaseModel):
-    url: str
-    title: str
-    chunk_text: str
+    """A chunk reference; url, title and chunk_text come from /api/chat/sources (inline on older messages)."""
+    doc_id: Optional[str] = None
+    chunk_index: Optional[int] = None
+    score: Optional[float] = None
+    url: Optional[str] = None
+    title: Optional[str] = None
+    chunk_text: Optional[str] = None
+
+
+class SourceRef(BaseModel):
+    doc_id: str
+    chunk_index: int
+
+
+class SourceLookupRequest(BaseModel):
+    knowledge_base_id: UUID
+    refs: List[SourceRef] = Field(..., max_length=200)
 
 
 class ChatMessageResponse(BaseModel):
@@ -76,6 +113,9 @@ class ConversationResponse(BaseModel):
 
 
 # Model Config
+EmbeddingRuntime = Literal["sentence-transformers", "onnx-int8"]  # see app/services/onnx_embedder.py
+
+
 class ModelConfigCreate(BaseModel):
     type: str  # llm or embedding
     name: str
@@ -83,6 +123,11 @@ class ModelConfigCreate(BaseModel):
     api_key: str = ""
     model_name: str
     is_default: bool = False
+    # Admission limits of an LLM config; unset falls back to the llm_* settings
+    max_concurrency: Optional[int] = Field(None, ge=1)
+    max_queue: Optional[int] = Field(None, ge=0)
+    queue_timeout: Optional[float] = Field(None, gt=0)
+    runtime: Optional[EmbeddingRuntime] = None  # embedding only
 
 
 class ModelConfigResponse(BaseModel):
@@ -92,6 +137,10 @@ class ModelConfigResponse(BaseModel):
     base_url: str
     model_name: str
     is_default: bool
+    max_concurrency: Optional[int] = None
+    max_queue: Optional[int] = None
+    queue_timeout: Optional[float] = None
+    runtime: Optional[EmbeddingRuntime] = None
     created_at: datetime
 
     class Config:
@@ -103,3 +152,4 @@ class ModelTestRequest(BaseModel):
     base_url: str
     api_key: str
     model_name: str
+    runtime: Optional[EmbeddingRuntime] = None
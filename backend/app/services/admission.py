@@ -0,0 +1,163 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from typing import AsyncGenerator, Dict
+
+from app.config import settings
+from app.services.llm_router import provider_key
+from app.services.metrics import record_admission_wait
+
+# Lower value is admitted first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+
+class AdmissionRejected(Exception):
+    """The wait queue is full."""
+
+
+class AdmissionTimeout(Exception):
+    """The request waited longer than the queue timeout."""
+
+
+class Ticket:
+    """A request's place in an admission queue."""
+
+    def __init__(self, controller: "AdmissionController", priority: int, seq: int):
+        self.controller = controller
+        self.key = (priority, seq)
+        self.enqueued_at = time.monotonic()
+        self.admitted = asyncio.get_running_loop().create_future()
+        self._released = False
+
+    async def wait(self) -> AsyncGenerator[int, None]:
+        """Yield the queue position whenever it changes, return once admitted."""
+        deadline = self.enqueued_at + self.controller.queue_timeout
+        last_position = None
+        while not self.admitted.done():
+            position = self.controller.position(self)
+            if position != last_position:
+                last_position = position
+                yield position
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.controller.timed_out += 1
+                self.release()
+                raise AdmissionTimeout(f"Waited more than {self.controller.queue_timeout}s for an LLM slot")
+            try:
+                await asyncio.wait_for(asyncio.shield(self.admitted), timeout=min(remaining, 1.0))
+            except asyncio.TimeoutError:
+                pass
+
+    def release(self):
+        """Give back the slot, or leave the queue if not admitted yet."""
+        if self._released:
+            return
+        self._released = True
+        self.controller._release(self)
+
+
+class AdmissionController:
+    """Bounded concurrency with a bounded, prioritised wait queue."""
+
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float, provider: str = ""):
+        self.provider = provider
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.admitted_total = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_times = deque(maxlen=1000)
+        self._waiters = []  # heap of (key, ticket)
+        self._seq = itertools.count()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def configure(self, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._dispatch()
+
+    def enqueue(self, priority: int = PRIORITY_INTERACTIVE) -> Ticket:
+        ticket = Ticket(self, priority, next(self._seq))
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self._admit(ticket)
+        elif len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected("LLM request queue is full")
+        else:
+            heapq.heappush(self._waiters, (ticket.key, ticket))
+        return ticket
+
+    def position(self, ticket: Ticket) -> int:
+        """1-based position among waiters, 0 once admitted."""
+        if ticket.admitted.done():
+            return 0
+        return 1 + sum(1 for key, _ in self._waiters if key < ticket.key)
+
+    def stats(self) -> dict:
+        waits = sorted(self.wait_times)
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "admitted": self.admitted_total,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_p50": waits[len(waits) // 2] if waits else 0.0,
+            "wait_p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+        }
+
+    def _admit(self, ticket: Ticket):
+        self.in_flight += 1
+        self.admitted_total += 1
+        waited = time.monotonic() - ticket.enqueued_at
+        self.wait_times.append(waited)
+        record_admission_wait(self.provider, waited)
+        ticket.admitted.set_result(True)
+
+    def _release(self, ticket: Ticket):
+        if ticket.admitted.done():
+            self.in_flight -= 1
+        else:
+            ticket.admitted.cancel()
+            self._waiters = [w for w in self._waiters if w[1] is not ticket]
+            heapq.heapify(self._waiters)
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._waiters and self.in_flight < self.max_in_flight:
+            _, ticket = heapq.heappop(self._waiters)
+            self._admit(ticket)
+
+
+_controllers: Dict[str, AdmissionController] = {}
+
+
+def get_controller(config: dict) -> AdmissionController:
+    """Controller for an LLM config; limits fall back to the global settings."""
+    key = provider_key(config)
+    max_in_flight = config.get("max_concurrency") or settings.llm_max_concurrency
+    max_queue = config.get("max_queue")
+    if max_queue is None:
+        max_queue = settings.llm_max_queue
+    queue_timeout = config.get("queue_timeout") or settings.llm_queue_timeout
+
+    controller = _controllers.get(key)
+    if controller is None:
+        controller = _controllers[key] = AdmissionController(max_in_flight, max_queue, queue_timeout, key)
+    elif (controller.max_in_flight, controller.max_queue, controller.queue_timeout) != (max_in_flight, max_queue, queue_timeout):
+        controller.configure(max_in_flight, max_queue, queue_timeout)
+    return controller
+
+
+def admission_stats() -> Dict[str, dict]:
+    return {key: controller.stats() for key, controller in _controllers.items()}
+
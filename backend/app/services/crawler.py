@@ -8,6 +8,8 @@ from app.models import Document, KnowledgeBase
 from app.services.chunker import split_text
 from app.services.embedding import get_embeddings
 from app.services.retriever import store_chunks
+from app.services.metrics import stage
+from app.services.profiler import slow_requests
 
 logger = logging.getLogger(__name__)
 
@@ -52,49 +54,54 @@ async def process_urls(kb_id: UUID, doc_ids: List[UUID]):
             if not doc:
                 continue
 
-            try:
-                doc.status = "processing"
-                await db.commit()
+            with slow_requests.track("ingest", doc.url):
+                try:
+                    doc.status = "processing"
+                    await db.commit()
+
+                    # Crawl
+                    with stage("crawl"):
+                        result = await crawl_url(doc.url)
+                    doc.title = result["title"] or doc.url
+
+                    if not result["content"].strip():
+                        doc.status = "failed"
+                        doc.error_message = "No content extracted from URL"
+                        await db.commit()
+                        continue
+
+                    # Chunk
+                    with stage("chunk"):
+                        chunks = split_text(result["content"], result["title"])
+
+                    # Embed
+                    texts = [c["text"] for c in chunks]
+                    with stage("embed"):
+                        embeddings = await get_embeddings(texts)
+
+                    # Store in vector DB
+                    with stage("upsert"):
+                        await store_chunks(
+                            collection_name=str(kb_id),
+                            chunks=chunks,
+                            embeddings=embeddings,
+                            doc_id=str(doc_id),
+                            url=doc.url,
+                            title=doc.title,
+                        )
+
+                    doc.status = "completed"
+                    doc.chunk_count = len(chunks)
+
+                    # Update KB document count
+                    kb = await db.get(KnowledgeBase, kb_id)
+                    if kb:
+                        kb.document_count = (kb.document_count or 0) + 1
 
-                # Crawl
-                result = await crawl_url(doc.url)
-                doc.title = result["title"] or doc.url
+                    await db.commit()
 
-                if not result["content"].strip():
+                except Exception as e:
+                    logger.exception(f"Failed to process document {doc_id}")
                     doc.status = "failed"
-                    doc.error_message = "No content extracted from URL"
+                    doc.error_message = str(e)[:500]
                     await db.commit()
-                    continue
-
-                # Chunk
-                chunks = split_text(result["content"], result["title"])
-
-                # Embed
-                texts = [c["text"] for c in chunks]
-                embeddings = await get_embeddings(texts)
-
-                # Store in vector DB
-                await store_chunks(
-                    collection_name=str(kb_id),
-                    chunks=chunks,
-                    embeddings=embeddings,
-                    doc_id=str(doc_id),
-                    url=doc.url,
-                    title=doc.title,
-                )
-
-                doc.status = "completed"
-                doc.chunk_count = len(chunks)
-
-                # Update KB document count
-                kb = await db.get(KnowledgeBase, kb_id)
-                if kb:
-                    kb.document_count = (kb.document_count or 0) + 1
-
-                await db.commit()
-
-            except Exception as e:
-                logger.exception(f"Failed to process document {doc_id}")
-                doc.status = "failed"
-                doc.error_message = str(e)[:500]
-                await db.commit()
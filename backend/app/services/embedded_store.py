@@ -0,0 +1,626 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import defaultdict
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.services.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_EMBEDDED = "embedded"
+
+# Vectors are L2-normalised on write, so int8 needs no per-row scale
+INT8_SCALE = 127.0
+SEARCH_BLOCK_ROWS = 65536
+
+
+def _doc_hash(doc_id: str) -> int:
+    return int.from_bytes(hashlib.blake2b(doc_id.encode(), digest_size=8).digest(), "little")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class _Segment:
+    """One append-only segment: vectors, per-row doc hashes, payload offsets and payloads.
+
+    Files are memory-mapped on first use and remapped when they have grown. A segment
+    replaced by compaction keeps its files until the last search reading it is done.
+    """
+
+    def __init__(self, directory: str, seg_id: int, dim: int, dtype: np.dtype):
+        self.base = os.path.join(directory, f"seg_{seg_id:06d}")
+        self.id = seg_id
+        self.dim = dim
+        self.dtype = dtype
+        self.rows = 0
+        self.readers = 0
+        self.retired = False
+        self.vec = self.doc = self.off = None
+        self._repair()
+        self.refresh()
+
+    def _map(self, suffix: str, dtype, shape):
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self.base + suffix, dtype=dtype, mode="r", shape=shape)
+
+    def _row_bytes(self):
+        return ((".vec", self.dim * self.dtype.itemsize), (".doc", 8), (".off", 8))
+
+    def _complete_rows(self) -> int:
+        # A crash mid-append can leave files of different lengths; trust the shortest
+        sizes = [
+            os.path.getsize(self.base + suffix) // row_bytes if os.path.exists(self.base + suffix) else 0
+            for suffix, row_bytes in self._row_bytes()
+        ]
+        return min(sizes)
+
+    def _repair(self):
+        """Cut every file back to the last complete row, so the next append lines up."""
+        if self.dim is None:
+            return
+        rows = self._complete_rows()
+        for suffix, row_bytes in self._row_bytes():
+            path = self.base + suffix
+            if os.path.exists(path) and os.path.getsize(path) > rows * row_bytes:
+                os.truncate(path, rows * row_bytes)
+        pay_end = 0
+        if rows:
+            with open(self.base + ".off", "rb") as f:
+                f.seek((rows - 1) * 8)
+                pay_end = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+        path = self.base + ".pay"
+        if os.path.exists(path) and os.path.getsize(path) > pay_end:
+            logger.warning(f"Truncating partially written rows of {self.base}")
+            os.truncate(path, pay_end)
+
+    def refresh(self):
+        rows = self._complete_rows()
+        if rows != self.rows or self.vec is None:
+            self.rows = rows
+            self.vec = self._map(".vec", self.dtype, (rows, self.dim))
+            self.doc = self._map(".doc", np.uint64, (rows,))
+            self.off = self._map(".off", np.uint64, (rows,))
+
+    def append(self, vectors: np.ndarray, doc_hashes: np.ndarray, payloads: List[bytes]):
+        with open(self.base + ".pay", "ab") as f:
+            start = f.tell()
+            f.write(b"".join(payloads))
+        ends = start + np.cumsum([len(p) for p in payloads], dtype=np.uint64)
+        # Payloads first: a row only counts once its vector, doc hash and offset are all written
+        for suffix, data in ((".vec", vectors), (".doc", doc_hashes), (".off", ends)):
+            with open(self.base + suffix, "ab") as f:
+                f.write(np.ascontiguousarray(data).tobytes())
+        self.refresh()
+
+    def raw_payloads(self, rows) -> List[bytes]:
+        result = []
+        with open(self.base + ".pay", "rb") as f:
+            for row in rows:
+                start = int(self.off[row - 1]) if row > 0 else 0
+                f.seek(start)
+                result.append(f.read(int(self.off[row]) - start))
+        return result
+
+    def remove_files(self):
+        for suffix in (".vec", ".doc", ".off", ".pay"):
+            if os.path.exists(self.base + suffix):
+                os.remove(self.base + suffix)
+
+
+class _KnowledgeBaseIndex:
+    """Segments, tombstones and optional IVF index of one knowledge base.
+
+    ``manifest.json`` lists the live segments; ``docs.txt`` and ``deleted.txt`` are
+    append-only doc_id logs. Deletes are tombstones by doc_id until compaction
+    rewrites the live rows into fresh segments.
+    """
+
+    def __init__(self, directory: str):
+        self.dir = directory
+        self.lock = threading.Lock()
+        self.manifest = {"dim": None, "dtype": settings.embedded_vector_dtype, "segments": [], "next_segment": 1}
+        path = os.path.join(directory, "manifest.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                self.manifest = json.load(f)
+        self.dtype = np.dtype(self.manifest["dtype"])
+        self._remove_unlisted_segments()
+        self.segments: List[_Segment] = [
+            _Segment(directory, seg_id, self.manifest["dim"], self.dtype) for seg_id in self.manifest["segments"]
+        ]
+        self.doc_ids = set(self._read_lines("docs.txt"))
+        self.deleted = set(self._read_lines("deleted.txt"))
+        self._deleted_hashes = np.array(sorted(_doc_hash(d) for d in self.deleted), dtype=np.uint64)
+        self._alive_cache: Dict[int, tuple] = {}
+        self.ivf = self._load_ivf()
+
+    # -- persistence -------------------------------------------------------
+
+    def _read_lines(self, name: str) -> List[str]:
+        path = os.path.join(self.dir, name)
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return [line.strip() for line in f if line.strip()]
+
+    def _append_lines(self, name: str, lines):
+        with open(os.path.join(self.dir, name), "a") as f:
+            f.writelines(f"{line}\n" for line in lines)
+
+    def _remove_unlisted_segments(self):
+        """Delete segment files the manifest does not list, e.g. from a compaction that crashed.
+
+        ``_new_segment`` would otherwise reopen them with their old rows.
+        """
+        if not os.path.isdir(self.dir):
+            return
+        listed = {f"seg_{seg_id:06d}" for seg_id in self.manifest["segments"]}
+        for name in os.listdir(self.dir):
+            if name.startswith("seg_") and os.path.splitext(name)[0] not in listed:
+                os.remove(os.path.join(self.dir, name))
+
+    def _write_manifest(self):
+        path = os.path.join(self.dir, "manifest.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(path + ".tmp", path)
+
+    def _load_ivf(self) -> Optional[dict]:
+        covered = self.manifest.get("ivf_rows")
+        if not covered:
+            return None
+        ivf = {"rows": covered}
+        for name in ("centroids", "order", "offsets"):
+            ivf[name] = np.load(os.path.join(self.dir, f"ivf_{name}.npy"), mmap_mode="r")
+        return ivf
+
+    # -- writes --------------------------------------------------------------
+
+    @property
+    def total_rows(self) -> int:
+        return sum(seg.rows for seg in self.segments)
+
+    def _new_segment(self) -> _Segment:
+        seg = _Segment(self.dir, self.manifest["next_segment"], self.manifest["dim"], self.dtype)
+        self.manifest["next_segment"] += 1
+        return seg
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = _normalize(vectors.astype(np.float32))
+        if self.dtype == np.int8:
+            return np.clip(np.rint(vectors * INT8_SCALE), -127, 127).astype(np.int8)
+        return vectors.astype(self.dtype)
+
+    def append(self, points: List[Dict]):
+        with self.lock:
+            os.makedirs(self.dir, exist_ok=True)
+            if self.manifest["dim"] is None:
+                self.manifest["dim"] = len(points[0]["vector"])
+
+            new_docs = {p["payload"]["doc_id"] for p in points} - self.doc_ids
+            if new_docs:
+                self._append_lines("docs.txt", sorted(new_docs))
+                self.doc_ids |= new_docs
+
+            vectors = self._encode(np.asarray([p["vector"] for p in points]))
+            hashes = np.array([_doc_hash(p["payload"]["doc_id"]) for p in points], dtype=np.uint64)
+            payloads = [json.dumps({**p["payload"], "id": p["id"]}, ensure_ascii=False).encode() for p in points]
+
+            segments = list(self.segments)
+            start = 0
+            while start < len(points):
+                if not segments or segments[-1].rows >= settings.embedded_segment_rows:
+                    segments.append(self._new_segment())
+                    self.manifest["segments"] = [seg.id for seg in segments]
+                    self._write_manifest()
+                seg = segments[-1]
+                end = min(len(points), start + settings.embedded_segment_rows - seg.rows)
+                seg.append(vectors[start:end], hashes[start:end], payloads[start:end])
+                start = end
+            self.segments = segments
+
+            if self._needs_index():
+                self.build_index()
+
+    def delete_docs(self, doc_ids: List[str]):
+        with self.lock:
+            new = [d for d in doc_ids if d in self.doc_ids and d not in self.deleted]
+            if not new:
+                return
+            self._append_lines("deleted.txt", new)
+            self.deleted |= set(new)
+            self._deleted_hashes = np.array(sorted(_doc_hash(d) for d in self.deleted), dtype=np.uint64)
+            self._alive_cache.clear()
+
+            total = self.total_rows
+            if total and self._dead_rows() / total >= settings.embedded_compact_ratio:
+                self._compact()
+
+    def _dead_rows(self) -> int:
+        return sum(seg.rows - int(self._alive(seg).sum()) for seg in self.segments)
+
+    def _compact(self):
+        """Rewrite live rows into fresh segments and drop the tombstones."""
+        old = self.segments
+        segments: List[_Segment] = []
+        for seg in old:
+            alive = np.flatnonzero(self._alive(seg))
+            for block in range(0, len(alive), SEARCH_BLOCK_ROWS):
+                rows = alive[block:block + SEARCH_BLOCK_ROWS]
+                payloads = seg.raw_payloads(rows)
+                start = 0
+                while start < len(rows):
+                    if not segments or segments[-1].rows >= settings.embedded_segment_rows:
+                        segments.append(self._new_segment())
+                    target = segments[-1]
+                    end = min(len(rows), start + settings.embedded_segment_rows - target.rows)
+                    part = rows[start:end]
+                    target.append(np.asarray(seg.vec[part]), np.asarray(seg.doc[part]), payloads[start:end])
+                    start = end
+
+        live_docs = self.doc_ids - self.deleted
+        with open(os.path.join(self.dir, "docs.txt.tmp"), "w") as f:
+            f.writelines(f"{d}\n" for d in sorted(live_docs))
+        os.replace(os.path.join(self.dir, "docs.txt.tmp"), os.path.join(self.dir, "docs.txt"))
+
+        self.manifest["segments"] = [seg.id for seg in segments]
+        self.manifest["ivf_rows"] = 0
+        self._write_manifest()
+        if os.path.exists(os.path.join(self.dir, "deleted.txt")):
+            os.remove(os.path.join(self.dir, "deleted.txt"))
+
+        self.segments = segments
+        self.doc_ids = live_docs
+        self.deleted = set()
+        self._deleted_hashes = np.array([], dtype=np.uint64)
+        self._alive_cache.clear()
+        self.ivf = None
+        for seg in old:
+            seg.retired = True
+            if not seg.readers:
+                seg.remove_files()
+        logger.info(f"Compacted {self.dir}: {sum(s.rows for s in old)} -> {self.total_rows} rows")
+
+        if self._needs_index():
+            self.build_index()
+
+    # -- ANN index -------------------------------------------------------------
+
+    def _needs_index(self) -> bool:
+        total = self.total_rows
+        if total < settings.embedded_ann_threshold:
+            return False
+        covered = self.ivf["rows"] if self.ivf else 0
+        return total - covered > 0.2 * max(covered, 1)
+
+    def _rows_as_float(self, seg: _Segment, rows) -> np.ndarray:
+        vectors = np.asarray(seg.vec[rows], dtype=np.float32)
+        return vectors / INT8_SCALE if self.dtype == np.int8 else vectors
+
+    def build_index(self, iterations: int = 10):
+        """Build an IVF index (spherical k-means lists) over all current rows."""
+        total = self.total_rows
+        nlist = int(min(max(np.sqrt(total), 16), 4096))
+        rng = np.random.default_rng(0)
+
+        sample_ids = np.sort(rng.choice(total, size=min(total, nlist * 64), replace=False))
+        sample = self._gather(sample_ids)
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+
+        assignments = np.empty(total, dtype=np.int32)
+        base = 0
+        for seg in self.segments:
+            for start in range(0, seg.rows, SEARCH_BLOCK_ROWS):
+                block = self._rows_as_float(seg, slice(start, min(start + SEARCH_BLOCK_ROWS, seg.rows)))
+                assignments[base + start:base + start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+            base += seg.rows
+
+        order = np.argsort(assignments, kind="stable").astype(np.int64)
+        offsets = np.searchsorted(assignments[order], np.arange(nlist + 1)).astype(np.int64)
+        for name, data in (("centroids", centroids.astype(np.float32)), ("order", order), ("offsets", offsets)):
+            np.save(os.path.join(self.dir, f"ivf_{name}.npy"), data)
+        self.manifest["ivf_rows"] = total
+        self._write_manifest()
+        self.ivf = self._load_ivf()
+        logger.info(f"Built IVF index for {self.dir}: {total} rows, {nlist} lists")
+
+    # -- reads -----------------------------------------------------------------
+
+    def _alive(self, seg: _Segment) -> np.ndarray:
+        cached = self._alive_cache.get(seg.id)
+        if cached and cached[0] == seg.rows:
+            return cached[1]
+        if len(self._deleted_hashes):
+            alive = ~np.isin(np.asarray(seg.doc), self._deleted_hashes)
+        else:
+            alive = np.ones(seg.rows, dtype=bool)
+        self._alive_cache[seg.id] = (seg.rows, alive)
+        return alive
+
+    def _gather(self, global_rows: np.ndarray) -> np.ndarray:
+        """Vectors (float32) for sorted global row ids."""
+        parts = []
+        base = 0
+        for seg in self.segments:
+            local = global_rows[(global_rows >= base) & (global_rows < base + seg.rows)] - base
+            if len(local):
+                parts.append(self._rows_as_float(seg, local))
+            base += seg.rows
+        return np.concatenate(parts) if parts else np.zeros((0, self.manifest["dim"]), dtype=np.float32)
+
+    def _pin(self) -> tuple:
+        """A consistent view for one search: (segment, rows, live mask) per segment, and the IVF index.
+
+        The segments are pinned so a compaction meanwhile leaves their files in place
+        until ``_unpin``.
+        """
+        with self.lock:
+            view = []
+            for seg in self.segments:
+                seg.refresh()
+                seg.readers += 1
+                view.append((seg, seg.rows, self._alive(seg)))
+            return view, self.ivf
+
+    def _unpin(self, view: list):
+        with self.lock:
+            for seg, _, _ in view:
+                seg.readers -= 1
+                if seg.retired and not seg.readers:
+                    seg.remove_files()
+
+    def _score_rows(self, q: np.ndarray, view: list, candidates: Optional[np.ndarray]):
+        """Scores and global row ids of live rows; all rows when ``candidates`` is None."""
+        scores, ids = [], []
+        base = 0
+        for seg, rows, alive in view:
+            if candidates is None:
+                for start in range(0, rows, SEARCH_BLOCK_ROWS):
+                    stop = min(start + SEARCH_BLOCK_ROWS, rows)
+                    block_scores = self._rows_as_float(seg, slice(start, stop)) @ q
+                    block_scores[~alive[start:stop]] = -np.inf
+                    scores.append(block_scores)
+                    ids.append(np.arange(base + start, base + stop))
+            else:
+                local = candidates[(candidates >= base) & (candidates < base + rows)] - base
+                local = local[alive[local]]
+                if len(local):
+                    scores.append(self._rows_as_float(seg, local) @ q)
+                    ids.append(local + base)
+            base += rows
+        if not scores:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        return np.concatenate(scores), np.concatenate(ids)
+
+    def search(self, vector: List[float], top_k: int) -> List[Dict]:
+        view, ivf = self._pin()
+        try:
+            return self._search(view, ivf, vector, top_k)
+        finally:
+            self._unpin(view)
+
+    def _search(self, view: list, ivf: Optional[dict], vector: List[float], top_k: int) -> List[Dict]:
+        if not view or self.manifest["dim"] is None:
+            return []
+
+        q = _normalize(np.asarray(vector, dtype=np.float32))
+        candidates = None
+        if ivf is not None:
+            nprobe = min(settings.embedded_ivf_nprobe, len(ivf["centroids"]))
+            lists = np.argpartition(-(ivf["centroids"] @ q), nprobe - 1)[:nprobe]
+            parts = [np.asarray(ivf["order"][ivf["offsets"][l]:ivf["offsets"][l + 1]]) for l in lists]
+            total = sum(rows for _, rows, _ in view)
+            parts.append(np.arange(ivf["rows"], total))  # rows appended since the index was built
+            candidates = np.sort(np.concatenate(parts))
+
+        scores, ids = self._score_rows(q, view, candidates)
+        live = np.isfinite(scores)
+        scores, ids = scores[live], ids[live]
+        if not len(scores):
+            return []
+        k = min(top_k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+
+        hits = []
+        for idx in best:
+            row = int(ids[idx])
+            for seg, rows, _ in view:
+                if row < rows:
+                    payload = json.loads(seg.raw_payloads([row])[0])
+                    break
+                row -= rows
+            payload.pop("id", None)
+            hits.append({"payload": payload, "score": float(scores[idx])})
+        return hits
+
+    def live_doc_ids(self) -> Set[str]:
+        return self.doc_ids - self.deleted
+
+    def doc_chunks(self, doc_ids: List[str]) -> List[Dict]:
+        hashes = np.array([_doc_hash(d) for d in doc_ids], dtype=np.uint64)
+        wanted = set(doc_ids)
+        payloads = []
+        with self.lock:
+            for seg in self.segments:
+                rows = np.flatnonzero(np.isin(np.asarray(seg.doc), hashes) & self._alive(seg))
+                for raw in seg.raw_payloads(rows):
+                    payload = json.loads(raw)
+                    # Doc hashes can collide; the payload has the real doc_id
+                    if payload["doc_id"] in wanted:
+                        payload.pop("id", None)
+                        payloads.append(payload)
+        return payloads
+
+    def chunks(self, keys: List[Tuple[str, int]]) -> List[Dict]:
+        """Payloads of the given (doc_id, chunk_index) chunks, reading as few payloads as possible.
+
+        A document's chunks are appended in order in one batch, so chunk ``i`` is
+        normally the document's ``i``-th live row; that row is checked first and the
+        document's other rows are only read when it does not match.
+        """
+        wanted: Dict[str, Set[int]] = defaultdict(set)
+        for doc_id, chunk_index in keys:
+            wanted[doc_id].add(chunk_index)
+        hashes = {_doc_hash(doc_id): doc_id for doc_id in wanted}
+        payloads = []
+        with self.lock:
+            # Live rows of each wanted document, in append order
+            rows: Dict[str, list] = defaultdict(list)
+            for seg in self.segments:
+                doc = np.asarray(seg.doc)
+                for row in np.flatnonzero(np.isin(doc, np.array(list(hashes), dtype=np.uint64)) & self._alive(seg)):
+                    rows[hashes[int(doc[row])]].append((seg, int(row)))
+
+            for doc_id, indexes in wanted.items():
+                doc_rows = rows[doc_id]
+                missing = set()
+                for i in sorted(indexes):
+                    payload = self._payload(*doc_rows[i]) if i < len(doc_rows) else None
+                    if payload and payload["doc_id"] == doc_id and payload.get("chunk_index") == i:
+                        payloads.append(payload)
+                    else:
+                        missing.add(i)
+                if missing:
+                    for seg, row in doc_rows:
+                        payload = self._payload(seg, row)
+                        if payload["doc_id"] == doc_id and payload.get("chunk_index") in missing:
+                            missing.discard(payload["chunk_index"])
+                            payloads.append(payload)
+        return payloads
+
+    @staticmethod
+    def _payload(seg: _Segment, row: int) -> Dict:
+        payload = json.loads(seg.raw_payloads([row])[0])
+        payload.pop("id", None)
+        return payload
+
+    def read_rows(self, seg_index: int, start: int, count: int) -> tuple:
+        """Live points among ``count`` rows of a segment from ``start``; returns (points, next start)."""
+        with self.lock:
+            if seg_index >= len(self.segments):
+                return [], None
+            seg = self.segments[seg_index]
+            end = min(start + count, seg.rows)
+            rows = np.arange(start, end)[self._alive(seg)[start:end]]
+            vectors = self._rows_as_float(seg, rows)
+            payloads = [json.loads(raw) for raw in seg.raw_payloads(rows)]
+        points = [
+            {"id": payload.pop("id"), "vector": vector.tolist(), "payload": payload}
+            for payload, vector in zip(payloads, vectors)
+        ]
+        return points, end if end < seg.rows else None
+
+
+class EmbeddedStore(VectorStore):
+    """Single-node backend on memory-mapped segment files, no server needed.
+
+    Each knowledge base is a directory under ``root`` and is opened on first use;
+    opening reads only the manifest and doc_id logs, vectors stay on disk and are
+    paged in by the OS. Brute-force NumPy search is used for small knowledge bases,
+    an IVF index once they reach ``embedded_ann_threshold`` rows. One process
+    should write to a store directory at a time.
+    """
+
+    name = "embedded"
+
+    def __init__(self, root: str):
+        self.root = root
+        self._kbs: Dict[str, _KnowledgeBaseIndex] = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _kb(self, kb_id: str) -> _KnowledgeBaseIndex:
+        with self._lock:
+            if kb_id not in self._kbs:
+                self._kbs[kb_id] = _KnowledgeBaseIndex(os.path.join(self.root, kb_id))
+            return self._kbs[kb_id]
+
+    def _exists(self, kb_id: str) -> bool:
+        return os.path.exists(os.path.join(self.root, kb_id, "manifest.json"))
+
+    async def upsert(self, kb_id: str, points: List[Dict]):
+        """Append points; ids are not deduplicated."""
+        if points:
+            await asyncio.to_thread(self._kb(kb_id).append, points)
+
+    async def search(self, kb_id: str, vector: List[float], top_k: int) -> List[Dict]:
+        if not self._exists(kb_id):
+            return []
+        return await asyncio.to_thread(self._kb(kb_id).search, vector, top_k)
+
+    async def search_batch(self, kb_id: str, vectors: List[List[float]], top_k: int) -> List[List[Dict]]:
+        if not self._exists(kb_id):
+            return [[] for _ in vectors]
+        kb = self._kb(kb_id)
+        return await asyncio.to_thread(lambda: [kb.search(vector, top_k) for vector in vectors])
+
+    async def delete_docs(self, kb_id: str, doc_ids: List[str]):
+        if self._exists(kb_id):
+            await asyncio.to_thread(self._kb(kb_id).delete_docs, doc_ids)
+
+    async def delete_kb(self, kb_id: str, layout: Optional[str] = None):
+        with self._lock:
+            self._kbs.pop(kb_id, None)
+        await asyncio.to_thread(shutil.rmtree, os.path.join(self.root, kb_id), True)
+
+    async def list_kbs(self) -> Dict[str, str]:
+        return {name: LAYOUT_EMBEDDED for name in os.listdir(self.root) if self._exists(name)}
+
+    async def list_doc_ids(self, kb_id: str, layout: Optional[str] = None) -> Set[str]:
+        if not self._exists(kb_id):
+            return set()
+        return self._kb(kb_id).live_doc_ids()
+
+    async def get_doc_chunks(self, kb_id: str, doc_ids: List[str]) -> List[Dict]:
+        if not doc_ids or not self._exists(kb_id):
+            return []
+        return await asyncio.to_thread(self._kb(kb_id).doc_chunks, doc_ids)
+
+    async def get_chunks(self, kb_id: str, keys: List[Tuple[str, int]]) -> List[Dict]:
+        if not keys or not self._exists(kb_id):
+            return []
+        return await asyncio.to_thread(self._kb(kb_id).chunks, keys)
+
+    async def scroll(self, kb_id: str, batch_size: int = 512) -> AsyncIterator[List[Dict]]:
+        """Walks the segments in order; a compaction running meanwhile may skip or repeat rows."""
+        if not self._exists(kb_id):
+            return
+        kb = self._kb(kb_id)
+        seg_index, start = 0, 0
+        while seg_index < len(kb.segments):
+            points, start = await asyncio.to_thread(kb.read_rows, seg_index, start, batch_size)
+            if points:
+                yield points
+            if start is None:
+                seg_index, start = seg_index + 1, 0
+
+    async def compact(self, kb_id: str):
+        """Reclaim the space of deleted documents now instead of at the tombstone threshold."""
+        if not self._exists(kb_id):
+            return
+        kb = self._kb(kb_id)
+
+        def run():
+            with kb.lock:
+                kb._compact()
+        await asyncio.to_thread(run)
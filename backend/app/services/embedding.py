@@ -1,10 +1,13 @@
 import logging
+from functools import lru_cache
 from typing import List, Optional
 
 from sqlalchemy import select
 from app.db import async_session
 from app.models import ModelConfig
 from app.config import settings
+from app.services.onnx_embedder import get_onnx_embedder, onnx_embeddings, RUNTIME_ONNX_INT8
+from app.services.metrics import stage
 
 logger = logging.getLogger(__name__)
 
@@ -21,25 +24,30 @@ async def _get_embedding_config():
                 "base_url": config.base_url,
                 "api_key": config.api_key,
                 "model_name": config.model_name,
+                "runtime": config.runtime,
             }
 
     return {
         "base_url": settings.default_embedding_base_url,
         "api_key": settings.default_embedding_api_key,
         "model_name": settings.default_embedding_model,
+        "runtime": settings.default_embedding_runtime,
     }
 
 
 async def get_embeddings(texts: List[str]) -> List[List[float]]:
     """Generate embeddings for a list of texts."""
-    config = await _get_embedding_config()
+    with stage("embedding_config"):
+        config = await _get_embedding_config()
 
     # Try OpenAI-compatible API first
     if config["base_url"] and config["api_key"]:
         return await _openai_embeddings(texts, config)
 
-    # Fallback to local sentence-transformers
-    return _local_embeddings(texts, config["model_name"])
+    # Fallback to local sentence-transformers, in process or on the shared embedding server
+    if settings.embedding_backend == "server":
+        return await _server_embeddings(texts, config["model_name"], config["runtime"])
+    return _local_embeddings(texts, config["model_name"], config["runtime"])
 
 
 async def _openai_embeddings(texts: List[str], config: dict) -> List[List[float]]:
@@ -51,16 +59,31 @@ async def _openai_embeddings(texts: List[str], config: dict) -> List[List[float]
     return [item.embedding for item in response.data]
 
 
-def _local_embeddings(texts: List[str], model_name: str) -> List[List[float]]:
-    """Use local sentence-transformers model."""
+@lru_cache(maxsize=2)
+def load_local_model(model_name: str):
+    """Load a sentence-transformers model once per process."""
     from sentence_transformers import SentenceTransformer
 
-    model = SentenceTransformer(model_name, trust_remote_code=True)
+    return SentenceTransformer(model_name, trust_remote_code=True)
+
+
+def _local_embeddings(texts: List[str], model_name: str, runtime: Optional[str] = None) -> List[List[float]]:
+    """Use local sentence-transformers model, or its int8 ONNX export."""
+    if runtime == RUNTIME_ONNX_INT8:
+        return onnx_embeddings(texts, model_name).tolist()
+    model = load_local_model(model_name)
     embeddings = model.encode(texts, normalize_embeddings=True)
     return embeddings.tolist()
 
 
-async def test_embedding_connection(base_url: str, api_key: str, model_name: str) -> str:
+async def _server_embeddings(texts: List[str], model_name: str, runtime: Optional[str] = None) -> List[List[float]]:
+    """Use the shared embedding server (app.services.embedding_server) over its Unix socket."""
+    from app.services.embedding_server import encode_remote
+
+    return (await encode_remote(texts, model_name, runtime)).tolist()
+
+
+async def test_embedding_connection(base_url: str, api_key: str, model_name: str, runtime: Optional[str] = None) -> str:
     """Test embedding model connectivity."""
     if base_url and api_key:
         from openai import AsyncOpenAI
@@ -68,9 +91,18 @@ async def test_embedding_connection(base_url: str, api_key: str, model_name: str
         response = await client.embeddings.create(input=["test"], model=model_name)
         dim = len(response.data[0].embedding)
         return f"Connection successful. Embedding dimension: {dim}"
+    elif settings.embedding_backend == "server":
+        emb = await _server_embeddings(["test"], model_name, runtime)
+        return f"Embedding server reachable. Embedding dimension: {len(emb[0])}"
+    elif runtime == RUNTIME_ONNX_INT8:
+        meta = get_onnx_embedder(model_name).meta
+        dim = len(onnx_embeddings(["test"], model_name)[0])
+        quality = meta.get("quality")
+        if quality:
+            return f"ONNX int8 model loaded. Embedding dimension: {dim}, mean cosine vs reference: {quality['mean_cosine']}"
+        return f"ONNX int8 model loaded. Embedding dimension: {dim} (quality not checked yet)"
     else:
-        from sentence_transformers import SentenceTransformer
-        model = SentenceTransformer(model_name, trust_remote_code=True)
+        model = load_local_model(model_name)
         emb = model.encode(["test"])
         dim = len(emb[0])
         return f"Local model loaded. Embedding dimension: {dim}"
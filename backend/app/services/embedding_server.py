@@ -0,0 +1,239 @@
+"""Shared embedding server: one resident sentence-transformers model behind a Unix socket.
+
+    python -m app.services.embedding_server --socket /tmp/rag-embedding.sock --preload BAAI/bge-m3
+
+API workers started with EMBEDDING_BACKEND=server send their local-model encode
+requests here, so N workers share one copy of the model and one batching queue.
+
+Framing (big-endian lengths, one request/response per frame, connections may be reused):
+
+    frame    = u32 body_length, body
+    request  = u8 op (1 = encode with sentence-transformers, 2 = encode with the int8 ONNX export),
+               u16 model_len, model (utf-8), u32 count, count * (u32 len, utf-8 text)
+    response = u8 status (0 = ok), u32 count, u32 dim, count * dim little-endian float32
+             | u8 status (1 = error), utf-8 message
+"""
+import argparse
+import asyncio
+import logging
+import os
+import struct
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.services.onnx_embedder import onnx_embeddings, RUNTIMES, RUNTIME_ONNX_INT8, RUNTIME_SENTENCE_TRANSFORMERS
+
+logger = logging.getLogger(__name__)
+
+OP_ENCODE = 1
+OP_ENCODE_ONNX_INT8 = 2
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+_U32 = struct.Struct(">I")
+_U16 = struct.Struct(">H")
+_OK_HEADER = struct.Struct(">BII")
+
+
+def pack_request(model_name: str, texts: List[str], runtime: str = None) -> bytes:
+    op = OP_ENCODE_ONNX_INT8 if runtime == RUNTIME_ONNX_INT8 else OP_ENCODE
+    model = model_name.encode()
+    parts = [bytes([op]), _U16.pack(len(model)), model, _U32.pack(len(texts))]
+    for text in texts:
+        data = text.encode()
+        parts.append(_U32.pack(len(data)))
+        parts.append(data)
+    body = b"".join(parts)
+    return _U32.pack(len(body)) + body
+
+
+def unpack_request(body: bytes) -> Tuple[str, str, List[str]]:
+    """Returns (runtime, model_name, texts)."""
+    if body[0] not in (OP_ENCODE, OP_ENCODE_ONNX_INT8):
+        raise ValueError(f"Unknown op {body[0]}")
+    runtime = RUNTIME_ONNX_INT8 if body[0] == OP_ENCODE_ONNX_INT8 else RUNTIME_SENTENCE_TRANSFORMERS
+    (model_len,) = _U16.unpack_from(body, 1)
+    offset = 3
+    model_name = body[offset:offset + model_len].decode()
+    offset += model_len
+    (count,) = _U32.unpack_from(body, offset)
+    offset += 4
+    texts = []
+    for _ in range(count):
+        (length,) = _U32.unpack_from(body, offset)
+        offset += 4
+        texts.append(body[offset:offset + length].decode())
+        offset += length
+    return runtime, model_name, texts
+
+
+def pack_vectors(vectors: np.ndarray) -> bytes:
+    vectors = np.ascontiguousarray(vectors, dtype="<f4")
+    count, dim = vectors.shape
+    body = _OK_HEADER.pack(STATUS_OK, count, dim) + vectors.tobytes()
+    return _U32.pack(len(body)) + body
+
+
+def pack_error(message: str) -> bytes:
+    body = bytes([STATUS_ERROR]) + message.encode()
+    return _U32.pack(len(body)) + body
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    (length,) = _U32.unpack(await reader.readexactly(4))
+    return await reader.readexactly(length)
+
+
+async def encode_remote(
+    texts: List[str], model_name: str, runtime: str = None, socket_path: str = None,
+) -> np.ndarray:
+    """Encode texts on the shared embedding server; returns a (len(texts), dim) float32 array."""
+    socket_path = socket_path or settings.embedding_server_socket
+    try:
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        raise RuntimeError(
+            f"Embedding server not reachable at {socket_path}; start it with `python -m app.services.embedding_server`"
+        ) from e
+    try:
+        writer.write(pack_request(model_name, texts, runtime))
+        await writer.drain()
+        body = await _read_frame(reader)
+    finally:
+        writer.close()
+
+    if body[0] != STATUS_OK:
+        raise RuntimeError(f"Embedding server error: {body[1:].decode()}")
+    _, count, dim = _OK_HEADER.unpack_from(body)
+    return np.frombuffer(body, dtype="<f4", offset=_OK_HEADER.size).reshape(count, dim)
+
+
+class EmbeddingServer:
+    """Coalesces concurrent encode requests into batches and runs them one at a time."""
+
+    def __init__(self, socket_path: str, max_batch: int, max_wait: float):
+        self.socket_path = socket_path
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    async def serve(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        logger.info(f"Embedding server listening on {self.socket_path}")
+        batcher = asyncio.create_task(self._batch_loop())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    body = await _read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    break
+                try:
+                    runtime, model_name, texts = unpack_request(body)
+                except (ValueError, struct.error, UnicodeDecodeError) as e:
+                    writer.write(pack_error(f"Bad request: {e}"))
+                    await writer.drain()
+                    break
+
+                future = asyncio.get_running_loop().create_future()
+                await self._queue.put(((runtime, model_name), texts, future))
+                try:
+                    writer.write(pack_vectors(await future))
+                except Exception as e:
+                    writer.write(pack_error(str(e)))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][1])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[1])
+
+            by_model = {}
+            for item in batch:
+                by_model.setdefault(item[0], []).append(item)
+            for (runtime, model_name), items in by_model.items():
+                await self._encode(runtime, model_name, items)
+
+    async def _encode(self, runtime: str, model_name: str, items: list):
+        texts = [text for _, item_texts, _ in items for text in item_texts]
+        start = time.perf_counter()
+        try:
+            vectors = await asyncio.to_thread(_encode_local, model_name, texts, runtime)
+        except Exception as e:
+            logger.exception(f"Encoding {len(texts)} texts with {model_name} failed")
+            for _, _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        logger.debug(f"Encoded {len(texts)} texts from {len(items)} requests in {time.perf_counter() - start:.3f}s")
+
+        offset = 0
+        for _, item_texts, future in items:
+            if not future.done():
+                future.set_result(vectors[offset:offset + len(item_texts)])
+            offset += len(item_texts)
+
+
+def _encode_local(model_name: str, texts: List[str], runtime: str = None) -> np.ndarray:
+    from app.services.embedding import load_local_model
+
+    if runtime == RUNTIME_ONNX_INT8:
+        return onnx_embeddings(texts, model_name)
+    model = load_local_model(model_name)
+    return model.encode(texts, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32, copy=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.services.embedding_server")
+    parser.add_argument("--socket", default=settings.embedding_server_socket)
+    parser.add_argument("--max-batch", type=int, default=settings.embedding_server_max_batch,
+                        help="texts per batch before it is encoded without waiting")
+    parser.add_argument("--max-wait", type=float, default=settings.embedding_server_max_wait,
+                        help="seconds to wait for more requests to join a batch")
+    parser.add_argument("--preload", help="model to load before accepting requests")
+    parser.add_argument("--preload-runtime", choices=RUNTIMES, default=RUNTIME_SENTENCE_TRANSFORMERS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if args.preload:
+        _encode_local(args.preload, ["warmup"], args.preload_runtime)
+
+    server = EmbeddingServer(args.socket, args.max_batch, args.max_wait)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
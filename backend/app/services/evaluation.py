@@ -0,0 +1,239 @@
+"""Bulk question evaluation: retrieval and answers for many questions, nothing persisted.
+
+Questions are read as they arrive and grouped into batches of ``eval_embedding_batch``;
+each batch is embedded in one call and searched with one batched call per knowledge
+base. Answers are generated by ``concurrency`` workers at batch priority, so
+interactive /ask traffic on the same worker is admitted first. Results come out
+as they finish; ``index`` is the question's position in the input.
+
+Input is JSON Lines: ``{"question": ..., "knowledge_base_id"?, "id"?, "expected"?,
+"expected_urls"?}`` per line, or a bare question per line. With ``expected_urls``
+the result reports the rank of the first retrieved chunk from one of them.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+from typing import AsyncIterator, Dict, List, Optional
+
+from app.config import settings
+from app.services import metrics
+from app.services.admission import AdmissionRejected, AdmissionTimeout, PRIORITY_BATCH
+from app.services.embedding import get_embeddings
+from app.services.llm import stream_chat_response
+from app.services.retriever import search_chunks_batch
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_RETRIES = 3
+
+
+class _Question:
+    __slots__ = ("index", "item", "question", "kb_id", "chunks", "answer", "timings", "batch_size", "error")
+
+    def __init__(self, index: int, item: dict, default_kb_id: Optional[str]):
+        self.index = index
+        self.item = item
+        self.question = (item.get("question") or "").strip()
+        self.kb_id = str(item.get("knowledge_base_id") or default_kb_id or "")
+        self.chunks: List[Dict] = []
+        self.answer: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self.batch_size = 0
+        self.error = item.get("_invalid")
+        if not self.error and not self.question:
+            self.error = "Missing question"
+        elif not self.error and not self.kb_id:
+            self.error = "Missing knowledge_base_id"
+
+
+async def read_questions(chunks: AsyncIterator[bytes]) -> AsyncIterator[dict]:
+    """Parse JSON Lines (or one plain question per line) from a byte stream."""
+    buffer = b""
+    async for data in chunks:
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            item = _parse_line(line)
+            if item is not None:
+                yield item
+    item = _parse_line(buffer)
+    if item is not None:
+        yield item
+
+
+def _parse_line(line: bytes) -> Optional[dict]:
+    text = line.decode("utf-8", errors="replace").strip()
+    if not text:
+        return None
+    if not text.startswith("{"):
+        return {"question": text}
+    try:
+        return json.loads(text)
+    except ValueError as e:
+        return {"_invalid": f"Invalid JSON: {e}"}
+
+
+async def evaluate(
+    questions: AsyncIterator[dict],
+    default_kb_id: Optional[str] = None,
+    concurrency: Optional[int] = None,
+    top_k: Optional[int] = None,
+    include_context: bool = False,
+) -> AsyncIterator[dict]:
+    """Yield one result per question, in completion order."""
+    concurrency = max(1, min(concurrency or settings.eval_concurrency, settings.eval_max_concurrency))
+    # Bounded, so retrieval runs at most a couple of batches ahead of the answers
+    work: asyncio.Queue = asyncio.Queue(maxsize=max(concurrency * 2, settings.eval_embedding_batch))
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        batch: List[_Question] = []
+        index = 0
+        async for item in questions:
+            batch.append(_Question(index, item, default_kb_id))
+            index += 1
+            if len(batch) >= settings.eval_embedding_batch:
+                await _retrieve(batch, top_k, work, results, include_context)
+                batch = []
+        if batch:
+            await _retrieve(batch, top_k, work, results, include_context)
+
+    async def answer():
+        while True:
+            q = await work.get()
+            if q is None:
+                return
+            await _answer(q)
+            await results.put(_result(q, include_context))
+
+    async def run():
+        workers = [asyncio.create_task(answer()) for _ in range(concurrency)]
+        try:
+            await produce()
+            for _ in workers:
+                await work.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            await results.put(None)
+
+    runner = asyncio.create_task(run())
+    try:
+        while True:
+            result = await results.get()
+            if result is None:
+                break
+            yield result
+        await runner  # re-raises a failure of the input stream
+    finally:
+        runner.cancel()
+
+
+async def _retrieve(batch: List[_Question], top_k: Optional[int], work: asyncio.Queue, results: asyncio.Queue,
+                    include_context: bool):
+    valid = [q for q in batch if not q.error]
+    if valid:
+        started = time.perf_counter()
+        try:
+            vectors = await get_embeddings([q.question for q in valid])
+        except Exception as e:
+            logger.warning(f"Embedding an evaluation batch failed: {e}")
+            vectors = None
+            for q in valid:
+                q.error = f"Embedding failed: {e}"
+        embed_seconds = time.perf_counter() - started
+        metrics.observe("eval_batch_embedding", embed_seconds)
+
+        if vectors is not None:
+            by_kb: Dict[str, List[int]] = defaultdict(list)
+            for i, q in enumerate(valid):
+                by_kb[q.kb_id].append(i)
+            for kb_id, positions in by_kb.items():
+                started = time.perf_counter()
+                try:
+                    hits = await search_chunks_batch(kb_id, [vectors[i] for i in positions], top_k)
+                except Exception as e:
+                    logger.warning(f"Batched search in {kb_id} failed: {e}")
+                    hits = None
+                search_seconds = time.perf_counter() - started
+                metrics.observe("eval_batch_search", search_seconds)
+                for n, i in enumerate(positions):
+                    q = valid[i]
+                    q.timings["query_embedding"] = embed_seconds
+                    q.timings["vector_search"] = search_seconds
+                    q.batch_size = len(valid)
+                    if hits is None:
+                        q.error = f"Vector search failed in {kb_id}"
+                    else:
+                        q.chunks = hits[n]
+
+    for q in batch:
+        if q.error:
+            await results.put(_result(q, include_context))
+        else:
+            await work.put(q)
+
+
+async def _answer(q: _Question):
+    timings, token = metrics.start_timings()
+    started = time.perf_counter()
+    parts: List[str] = []
+    try:
+        for attempt in range(ADMISSION_RETRIES + 1):
+            try:
+                async for part in stream_chat_response(q.question, q.chunks, priority=PRIORITY_BATCH):
+                    parts.append(part)
+                break
+            except (AdmissionRejected, AdmissionTimeout) as e:
+                # Interactive traffic has the LLM slots; back off instead of failing the question
+                if attempt == ADMISSION_RETRIES:
+                    q.error = f"LLM busy: {e}"
+                else:
+                    parts.clear()
+                    await asyncio.sleep(2 ** attempt)
+            except Exception as e:
+                q.error = f"LLM failed: {e}"
+                break
+    finally:
+        metrics.stop_timings(token)
+    q.timings.update(timings)
+    q.timings["llm"] = time.perf_counter() - started
+    q.answer = "".join(parts)
+
+
+def _retrieval_rank(chunks: List[Dict], expected_urls: List[str]) -> dict:
+    expected = {url.rstrip("/") for url in expected_urls}
+    rank = next((i + 1 for i, c in enumerate(chunks) if c["url"].rstrip("/") in expected), None)
+    return {"hit": rank is not None, "rank": rank, "reciprocal_rank": round(1 / rank, 4) if rank else 0.0}
+
+
+def _result(q: _Question, include_context: bool) -> dict:
+    sources = []
+    for c in q.chunks:
+        source = {
+            "doc_id": c["doc_id"], "chunk_index": c["chunk_index"], "score": round(c["score"], 4),
+            "url": c["url"], "title": c["title"],
+        }
+        if include_context:
+            source["text"] = c["text"]
+        sources.append(source)
+
+    result = {
+        "index": q.index,
+        "id": q.item.get("id"),
+        "knowledge_base_id": q.kb_id or None,
+        "question": q.question,
+        "answer": q.answer,
+        "sources": sources,
+    }
+    if "expected" in q.item:
+        result["expected"] = q.item["expected"]
+    if q.item.get("expected_urls") and not q.error:
+        result["retrieval"] = _retrieval_rank(q.chunks, q.item["expected_urls"])
+    result["timings_ms"] = {name: round(seconds * 1000, 1) for name, seconds in q.timings.items()}
+    result["batch_size"] = q.batch_size
+    result["error"] = q.error
+    return result
@@ -1,12 +1,17 @@
+import asyncio
 import logging
-from typing import List, Dict, Tuple, AsyncGenerator
+import time
+from typing import List, Dict, Tuple, AsyncGenerator, Union
 
+import httpx
 from sqlalchemy import select
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError
 
 from app.db import async_session
 from app.models import ModelConfig
 from app.config import settings
+from app.services import llm_router, metrics
+from app.services.admission import get_controller, AdmissionRejected, AdmissionTimeout, PRIORITY_INTERACTIVE
 
 logger = logging.getLogger(__name__)
 
@@ -23,25 +28,42 @@ SYSTEM_PROMPT = """你是一个专业的客服助手，基于以下参考资料
 """
 
 
-async def _get_llm_config() -> dict:
-    """Get the default LLM config from DB, fallback to env settings."""
+def _config_dict(config: ModelConfig) -> dict:
+    return {
+        "id": str(config.id),
+        "base_url": config.base_url,
+        "api_key": config.api_key,
+        "model_name": config.model_name,
+        "is_default": config.is_default,
+        "max_concurrency": config.max_concurrency,
+        "max_queue": config.max_queue,
+        "queue_timeout": config.queue_timeout,
+    }
+
+
+async def _get_llm_configs() -> List[dict]:
+    """Get all LLM configs from DB (default first), fallback to env settings."""
     async with async_session() as db:
         result = await db.execute(
-            select(ModelConfig).where(ModelConfig.type == "llm", ModelConfig.is_default == True)
+            select(ModelConfig)
+            .where(ModelConfig.type == "llm")
+            .order_by(ModelConfig.is_default.desc(), ModelConfig.created_at.asc())
         )
-        config = result.scalar_one_or_none()
-        if config:
-            return {
-                "base_url": config.base_url,
-                "api_key": config.api_key,
-                "model_name": config.model_name,
-            }
+        configs = [_config_dict(c) for c in result.scalars().all()]
+        if configs:
+            return configs
 
-    return {
+    return [{
         "base_url": settings.default_llm_base_url,
         "api_key": settings.default_llm_api_key or "",
         "model_name": settings.default_llm_model,
-    }
+        "is_default": True,
+    }]
+
+
+async def _get_llm_config() -> dict:
+    """Get the default LLM config from DB, fallback to env settings."""
+    return (await _get_llm_configs())[0]
 
 
 def _build_context(chunks: List[Dict]) -> str:
@@ -77,32 +99,196 @@ def _build_messages(
     return messages
 
 
+def _is_provider_failure(e: Exception) -> bool:
+    """Whether an error says the provider is unhealthy, as opposed to a bad request.
+
+    Timeouts, connection errors, 429 and 5xx count; other 4xx (bad request, auth,
+    context length) would fail the same way anywhere and leave the breaker alone.
+    """
+    if isinstance(e, APIStatusError):
+        return e.status_code in (408, 429) or e.status_code >= 500
+    return isinstance(e, (APIConnectionError, httpx.TransportError, asyncio.TimeoutError))
+
+
+async def _run_attempt(
+    index: int,
+    config: dict,
+    messages: List[Dict],
+    priority: int,
+    out: asyncio.Queue,
+    trial: bool = False,
+):
+    """Run one upstream stream, forwarding (index, kind, value) events to ``out``.
+
+    ``trial`` marks the single request a half-open circuit lets through; it is handed
+    back if the attempt ends without reaching the provider.
+    """
+    stats = llm_router.get_stats(config)
+    try:
+        ticket = get_controller(config).enqueue(priority)
+    except AdmissionRejected as e:
+        if trial:
+            stats.on_abandon()
+        await out.put((index, "error", e))
+        return
+
+    stream = None
+    started_at = None
+    first = True
+    try:
+        async for position in ticket.wait():
+            await out.put((index, "queue", position))
+        await out.put((index, "started", None))
+
+        started_at = time.monotonic()
+        client = AsyncOpenAI(base_url=config["base_url"], api_key=config["api_key"])
+        stream = await client.chat.completions.create(
+            model=config["model_name"],
+            messages=messages,
+            stream=True,
+            temperature=0.7,
+            max_tokens=2000,
+        )
+
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first:
+                    stats.record_ttft(time.monotonic() - started_at)
+                    first = False
+                await out.put((index, "token", chunk.choices[0].delta.content))
+
+        stats.record_success()
+        await out.put((index, "done", None))
+    except AdmissionTimeout as e:
+        if trial:
+            stats.on_abandon()
+        await out.put((index, "error", e))
+    except asyncio.CancelledError:
+        # Lost a hedge race: the time waited so far is a lower bound on this provider's TTFT
+        if started_at is not None and first:
+            stats.record_ttft(time.monotonic() - started_at)
+        if trial:
+            stats.on_abandon()
+        raise
+    except Exception as e:
+        logger.warning(f"LLM provider {config['model_name']} failed: {e}")
+        if _is_provider_failure(e):
+            stats.record_failure()
+        elif trial:
+            stats.on_abandon()
+        await out.put((index, "error", e))
+    finally:
+        ticket.release()
+        if stream is not None:
+            await stream.close()
+
+
 async def stream_chat_response(
     question: str,
     context_chunks: List[Dict],
     history: List[Tuple[str, str]] = None,
-) -> AsyncGenerator[str, None]:
-    """Stream chat response from LLM."""
+    priority: int = PRIORITY_INTERACTIVE,
+    report_queue: bool = False,
+) -> AsyncGenerator[Union[str, Dict], None]:
+    """Stream chat response from LLM.
+
+    Providers are tried in ``llm_router`` order. If the first token has not arrived
+    within the provider's p95-based deadline, a hedged request goes to the next
+    provider and whichever stream starts first wins; a provider that fails before
+    its first token is failed over immediately. Providers whose circuit is open are
+    skipped; raises NoProviderAvailable if that leaves none to start with.
+
+    Each upstream call waits for a slot from its config's admission controller.
+    With ``report_queue`` the generator also yields ``{"type": "queue", "position": n}``
+    events while waiting. Raises AdmissionRejected / AdmissionTimeout.
+    """
     if history is None:
         history = []
 
-    config = await _get_llm_config()
+    requested_at = time.perf_counter()
+    with metrics.stage("llm_config"):
+        configs = llm_router.rank_providers(await _get_llm_configs())
+    messages = _build_messages(question, context_chunks, history)
+    first_token_at = None
+    tokens = 0
 
-    client = AsyncOpenAI(base_url=config["base_url"], api_key=config["api_key"])
+    out: asyncio.Queue = asyncio.Queue()
+    tasks: List[asyncio.Task] = []
+    attempts: List[Dict] = []  # config of each task
+    untried = list(configs)
+    live = set()
+    hedge_at = None
 
-    messages = _build_messages(question, context_chunks, history)
+    def launch() -> bool:
+        """Start an attempt on the next provider its circuit breaker lets through."""
+        while untried:
+            config = untried.pop(0)
+            stats = llm_router.get_stats(config)
+            if not stats.acquire():
+                continue
+            index = len(tasks)
+            trial = stats.state == llm_router.HALF_OPEN
+            tasks.append(asyncio.create_task(_run_attempt(index, config, messages, priority, out, trial)))
+            attempts.append(config)
+            live.add(index)
+            return True
+        return False
 
-    stream = await client.chat.completions.create(
-        model=config["model_name"],
-        messages=messages,
-        stream=True,
-        temperature=0.7,
-        max_tokens=2000,
-    )
+    try:
+        if not launch():
+            raise llm_router.NoProviderAvailable("All LLM providers are unavailable (circuit open)")
+        winner = None
+        while winner is None:
+            timeout = None
+            if hedge_at is not None:
+                timeout = max(hedge_at - time.monotonic(), 0)
+            try:
+                index, kind, value = await asyncio.wait_for(out.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                hedge_at = None
+                if launch():
+                    logger.info(f"Hedging LLM request to {attempts[-1]['model_name']}")
+                continue
+
+            if kind == "queue":
+                if report_queue and index == 0:
+                    yield {"type": "queue", "position": value}
+            elif kind == "started":
+                if settings.llm_hedge_enabled and index == len(tasks) - 1 and untried:
+                    hedge_at = time.monotonic() + llm_router.hedge_delay(attempts[index])
+            elif kind == "error":
+                live.discard(index)
+                if not live:
+                    hedge_at = None
+                    if not launch():
+                        raise value
+            else:  # first token or an empty answer
+                winner = index
+                for i, task in enumerate(tasks):
+                    if i != winner:
+                        task.cancel()
+                if kind == "done":
+                    return
+                first_token_at = time.perf_counter()
+                metrics.observe("llm_ttft", first_token_at - requested_at)
+                tokens = 1
+                yield value
 
-    async for chunk in stream:
-        if chunk.choices and chunk.choices[0].delta.content:
-            yield chunk.choices[0].delta.content
+        while True:
+            index, kind, value = await out.get()
+            if index != winner:
+                continue
+            if kind == "token":
+                tokens += 1
+                yield value
+            elif kind == "done":
+                metrics.record_llm_stream(tokens, first_token_at, time.perf_counter())
+                return
+            elif kind == "error":
+                raise value
+    finally:
+        for task in tasks:
+            task.cancel()
 
 
 async def test_llm_connection(base_url: str, api_key: str, model_name: str) -> str:
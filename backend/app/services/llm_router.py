@@ -0,0 +1,126 @@
+import time
+from collections import deque
+from typing import Dict, List
+
+from app.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class NoProviderAvailable(RuntimeError):
+    """Every configured LLM provider has an open circuit."""
+
+
+class ProviderStats:
+    """Rolling TTFT / error window and circuit breaker for one LLM provider."""
+
+    def __init__(self):
+        self.ttfts = deque(maxlen=200)
+        self.outcomes = deque(maxlen=50)  # True = success
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def ttft_quantile(self, q: float) -> float:
+        values = sorted(self.ttfts)
+        if not values:
+            return 0.0
+        return values[min(int(len(values) * q), len(values) - 1)]
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    def available(self) -> bool:
+        """Whether a request could be sent now; one trial is let through after the cooldown."""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= settings.llm_breaker_cooldown:
+            self.state = HALF_OPEN
+            self._trial_in_flight = False
+        if self.state == CLOSED:
+            return True
+        return self.state == HALF_OPEN and not self._trial_in_flight
+
+    def acquire(self) -> bool:
+        """Like available(), but a half-open circuit's single trial is taken by the caller."""
+        if not self.available():
+            return False
+        if self.state == HALF_OPEN:
+            self._trial_in_flight = True
+        return True
+
+    def on_abandon(self):
+        """The trial request ended without an outcome; let another trial through."""
+        self._trial_in_flight = False
+
+    def record_ttft(self, seconds: float):
+        self.ttfts.append(seconds)
+
+    def record_success(self):
+        self.outcomes.append(True)
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+        tripped = (
+            self.state == HALF_OPEN
+            or self.consecutive_failures >= settings.llm_breaker_failure_threshold
+            or (len(self.outcomes) >= 10 and self.error_rate() >= settings.llm_breaker_error_rate)
+        )
+        if tripped:
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+_stats: Dict[str, ProviderStats] = {}
+
+
+def provider_key(config: dict) -> str:
+    return config.get("id") or f"{config['base_url']}|{config['model_name']}"
+
+
+def get_stats(config: dict) -> ProviderStats:
+    key = provider_key(config)
+    if key not in _stats:
+        _stats[key] = ProviderStats()
+    return _stats[key]
+
+
+def rank_providers(configs: List[dict]) -> List[dict]:
+    """Order configs for an attempt: default first, then by median TTFT, open circuits last."""
+    def sort_key(config):
+        stats = get_stats(config)
+        return (
+            not stats.available(),
+            not config.get("is_default", False),
+            stats.ttft_quantile(0.5) or float("inf"),
+        )
+    return sorted(configs, key=sort_key)
+
+
+def hedge_delay(config: dict) -> float:
+    """How long to wait for the first token before hedging, based on the provider's p95 TTFT."""
+    stats = get_stats(config)
+    if len(stats.ttfts) < 20:
+        return settings.llm_hedge_default_delay
+    return min(max(stats.ttft_quantile(0.95), settings.llm_hedge_min_delay), settings.llm_hedge_max_delay)
+
+
+def routing_stats() -> Dict[str, dict]:
+    return {
+        key: {
+            "state": stats.state,
+            "ttft_p50": stats.ttft_quantile(0.5),
+            "ttft_p95": stats.ttft_quantile(0.95),
+            "error_rate": stats.error_rate(),
+            "consecutive_failures": stats.consecutive_failures,
+        }
+        for key, stats in _stats.items()
+    }
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.db import async_session
+from app.models import Conversation, Message
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+SHUTDOWN_FLUSH_ATTEMPTS = 3
+
+
+class MessageSink:
+    """Write-behind buffer for conversations and messages.
+
+    Rows are kept in memory and flushed in batched multi-row inserts, either on
+    a short interval or once the buffer reaches the configured size. Pending
+    rows stay visible to readers on this worker until they are committed.
+
+    A batch rejected by a constraint is retried row by row and the rows that can
+    never be stored (deleted knowledge base or conversation) are dropped with an
+    error log. While the database is unreachable the buffer keeps at most
+    ``message_buffer_max_rows`` rows, none older than ``message_buffer_max_age``.
+    """
+
+    def __init__(self, flush_interval: float = None, batch_size: int = None):
+        self.flush_interval = flush_interval or settings.message_flush_interval
+        self.batch_size = batch_size or settings.message_flush_batch_size
+        self._conversations: Dict[uuid.UUID, Conversation] = {}
+        self._messages: List[Message] = []
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.dropped = 0
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background flusher and write out everything still buffered."""
+        if self._task is not None:
+            # Let an in-progress flush finish instead of cancelling it mid-commit
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        for attempt in range(SHUTDOWN_FLUSH_ATTEMPTS):
+            try:
+                await self.flush()
+                return
+            except Exception:
+                logger.exception("Failed to flush buffered chat messages at shutdown")
+                if attempt + 1 < SHUTDOWN_FLUSH_ATTEMPTS:
+                    await asyncio.sleep(1)
+        logger.error(f"Lost {self._pending_count()} buffered chat rows at shutdown")
+
+    def add_conversation(self, knowledge_base_id: uuid.UUID, title: str) -> Conversation:
+        now = datetime.utcnow()
+        conversation = Conversation(
+            id=uuid.uuid4(),
+            knowledge_base_id=knowledge_base_id,
+            title=title,
+            created_at=now,
+            updated_at=now,
+        )
+        self._conversations[conversation.id] = conversation
+        self._maybe_wake()
+        return conversation
+
+    def add_message(self, conversation_id: uuid.UUID, role: str, content: str, sources: list = None) -> Message:
+        message = Message(
+            id=uuid.uuid4(),
+            conversation_id=conversation_id,
+            role=role,
+            content=content,
+            sources=sources or [],
+            created_at=datetime.utcnow(),
+        )
+        self._messages.append(message)
+        self._maybe_wake()
+        return message
+
+    def get_conversation(self, conv_id: uuid.UUID) -> Optional[Conversation]:
+        return self._conversations.get(conv_id)
+
+    def merge_conversations(self, knowledge_base_id: uuid.UUID, stored: List[Conversation]) -> List[Conversation]:
+        """Prepend buffered conversations of a knowledge base; they are the newest ones."""
+        seen = {c.id for c in stored}
+        pending = [
+            c for c in self._conversations.values()
+            if c.knowledge_base_id == knowledge_base_id and c.id not in seen
+        ]
+        return sorted(pending, key=lambda c: (c.updated_at, c.id), reverse=True) + list(stored)
+
+    def merge_messages(self, conv_id: uuid.UUID, stored: List[Message]) -> List[Message]:
+        """Combine persisted messages with ones still waiting to be flushed, in keyset order."""
+        seen = {m.id for m in stored}
+        pending = [m for m in self._messages if m.conversation_id == conv_id and m.id not in seen]
+        if not pending:
+            return list(stored)
+        return sorted([*stored, *pending], key=lambda m: (m.created_at, m.id))
+
+    def _pending_count(self) -> int:
+        return len(self._conversations) + len(self._messages)
+
+    def _maybe_wake(self):
+        if self._pending_count() >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._stopping:
+                break
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush buffered chat messages, will retry")
+                self._shed()
+
+    async def flush(self):
+        """Write buffered rows in one transaction; conversations go first for the FK."""
+        async with self._lock:
+            conversations = list(self._conversations.values())
+            messages = list(self._messages)
+            if not conversations and not messages:
+                return
+
+            conversation_rows = [_conversation_row(c) for c in conversations]
+            message_rows = [_message_row(m) for m in messages]
+            try:
+                async with async_session() as db:
+                    if conversation_rows:
+                        await db.execute(insert(Conversation), conversation_rows)
+                    if message_rows:
+                        await db.execute(insert(Message), message_rows)
+                    await db.commit()
+            except (IntegrityError, DataError) as e:
+                # One bad row fails the whole batch; find it instead of retrying the batch forever
+                logger.warning(f"Batched flush of chat messages rejected, retrying row by row: {e.orig}")
+                await self._insert_each(
+                    [(Conversation, row) for row in conversation_rows] + [(Message, row) for row in message_rows]
+                )
+
+            # Only drop what was written; rows added during the flush stay buffered
+            self._forget(conversations, messages)
+
+    async def _insert_each(self, rows):
+        """Insert rows one savepoint each, dropping those the database refuses."""
+        async with async_session() as db:
+            for table, row in rows:
+                try:
+                    async with db.begin_nested():
+                        await db.execute(insert(table), [row])
+                except (IntegrityError, DataError) as e:
+                    self.dropped += 1
+                    logger.error(f"Dropping {table.__tablename__} row that cannot be stored: {row!r}: {e.orig}")
+            await db.commit()
+
+    def _forget(self, conversations: List[Conversation], messages: List[Message]):
+        for c in conversations:
+            self._conversations.pop(c.id, None)
+        gone = {m.id for m in messages}
+        self._messages = [m for m in self._messages if m.id not in gone]
+
+    def _shed(self):
+        """Drop rows past the age limit and the oldest ones beyond the size limit while flushes fail."""
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.message_buffer_max_age)
+        rows = sorted([*self._conversations.values(), *self._messages], key=lambda r: r.created_at)
+        excess = max(len(rows) - settings.message_buffer_max_rows, 0)
+        shed = [r for i, r in enumerate(rows) if i < excess or r.created_at < cutoff]
+        if not shed:
+            return
+        self._forget(
+            [r for r in shed if isinstance(r, Conversation)],
+            [r for r in shed if isinstance(r, Message)],
+        )
+        self.dropped += len(shed)
+        logger.error(f"Dropped {len(shed)} buffered chat rows the database did not accept in time")
+
+
+def _conversation_row(c: Conversation) -> dict:
+    return {
+        "id": c.id,
+        "knowledge_base_id": c.knowledge_base_id,
+        "title": c.title,
+        "created_at": c.created_at,
+        "updated_at": c.updated_at,
+    }
+
+
+def _message_row(m: Message) -> dict:
+    return {
+        "id": m.id,
+        "conversation_id": m.conversation_id,
+        "role": m.role,
+        "content": m.content,
+        "sources": m.sources,
+        "created_at": m.created_at,
+    }
+
+
+message_sink = MessageSink()
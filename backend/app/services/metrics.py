@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily, REGISTRY
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds",
+    "Time spent in each RAG pipeline stage",
+    ["stage"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+LLM_TOKENS = Counter("rag_llm_tokens_total", "Streamed LLM tokens (chunks)")
+LLM_TOKENS_PER_SECOND = Histogram(
+    "rag_llm_tokens_per_second",
+    "LLM streaming rate after the first token",
+    buckets=(5, 10, 20, 40, 80, 160, 320),
+)
+ADMISSION_WAIT = Histogram(
+    "rag_llm_admission_wait_seconds",
+    "Time an LLM request waited for an admission slot",
+    ["provider"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+CACHE_REQUESTS = Counter("rag_cache_requests_total", "Cache lookups", ["cache", "result"])
+LOOP_LAG = Histogram(
+    "rag_event_loop_lag_seconds",
+    "Delay of a periodic timer on the event loop",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+LOOP_LAG_LAST = Gauge("rag_event_loop_lag_last_seconds", "Most recent event loop lag sample")
+
+# Label children are cached so the hot path is a dict lookup plus an observe
+_stage_children = {}
+_cache_children = {}
+_admission_wait_children = {}
+
+# (stage, seconds) recorded during the current request, for the Server-Timing header
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+_tracer = None
+
+
+def _init_tracer():
+    global _tracer
+    if not settings.tracing_enabled:
+        return
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        logger.warning("TRACING_ENABLED is set but opentelemetry-api is not installed; spans disabled")
+        return
+    _tracer = trace.get_tracer("rag-platform")
+
+
+_init_tracer()
+
+
+def observe(name: str, seconds: float):
+    """Record a stage duration in the histogram and the current request's timings."""
+    child = _stage_children.get(name)
+    if child is None:
+        child = _stage_children[name] = STAGE_SECONDS.labels(name)
+    child.observe(seconds)
+    timings = _request_timings.get()
+    # Bounded: background tasks spawned by a request inherit its context
+    if timings is not None and len(timings) < 64:
+        timings.append((name, seconds))
+
+
+def current_timings() -> Optional[List[Tuple[str, float]]]:
+    return _request_timings.get()
+
+
+def start_timings():
+    """Collect stage timings into a fresh list from here on; returns (list, reset token)."""
+    timings: List[Tuple[str, float]] = []
+    return timings, _request_timings.set(timings)
+
+
+def stop_timings(token):
+    _request_timings.reset(token)
+
+
+class stage:
+    """Time a block as a pipeline stage; opens a span as well when tracing is enabled.
+
+    Don't wrap code that yields from an async generator: the span context would
+    leak into the consumer. Use ``observe`` there instead.
+    """
+
+    __slots__ = ("name", "start", "span")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.span = None
+
+    def __enter__(self):
+        if _tracer is not None:
+            self.span = _tracer.start_as_current_span(self.name)
+            self.span.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.name, time.perf_counter() - self.start)
+        if self.span is not None:
+            self.span.__exit__(exc_type, exc, tb)
+        return False
+
+
+def cache_lookup(cache: str, hit: bool):
+    key = (cache, hit)
+    child = _cache_children.get(key)
+    if child is None:
+        child = _cache_children[key] = CACHE_REQUESTS.labels(cache, "hit" if hit else "miss")
+    child.inc()
+
+
+def record_admission_wait(provider: str, seconds: float):
+    child = _admission_wait_children.get(provider)
+    if child is None:
+        child = _admission_wait_children[provider] = ADMISSION_WAIT.labels(provider)
+    child.observe(seconds)
+
+
+def record_llm_stream(tokens: int, first_token_at: float, finished_at: float):
+    LLM_TOKENS.inc(tokens)
+    duration = finished_at - first_token_at
+    if tokens > 1 and duration > 0:
+        LLM_TOKENS_PER_SECOND.observe((tokens - 1) / duration)
+
+
+def server_timing(timings: List[Tuple[str, float]]) -> str:
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings)
+
+
+class ServerTimingMiddleware:
+    """Collects stage timings per request and sends them as a Server-Timing header.
+
+    Plain ASGI so streaming responses pass through untouched; for SSE the header
+    covers the stages finished before the first byte (retrieval, history, ...).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings, token = start_timings()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and timings:
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(timings).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            stop_timings(token)
+
+
+class _RuntimeCollector:
+    """Scrape-time gauges for the DB pool, LLM admission queues and provider routing."""
+
+    def collect(self):
+        from app.db import engine
+        from app.services.admission import admission_stats
+        from app.services.llm_router import routing_stats
+
+        pool = engine.sync_engine.pool
+        pool_gauge = GaugeMetricFamily("rag_db_pool_connections", "DB connection pool usage", labels=["state"])
+        for state, fn in (("size", "size"), ("checked_out", "checkedout"), ("checked_in", "checkedin"), ("overflow", "overflow")):
+            if hasattr(pool, fn):
+                pool_gauge.add_metric([state], getattr(pool, fn)())
+        yield pool_gauge
+
+        in_flight = GaugeMetricFamily("rag_llm_in_flight", "LLM requests holding an admission slot", labels=["provider"])
+        queue_depth = GaugeMetricFamily("rag_llm_queue_depth", "LLM requests waiting for a slot", labels=["provider"])
+        admission = CounterMetricFamily("rag_llm_admission", "LLM admission outcomes", labels=["provider", "outcome"])
+        for key, stats in admission_stats().items():
+            in_flight.add_metric([key], stats["in_flight"])
+            queue_depth.add_metric([key], stats["queue_depth"])
+            for outcome in ("admitted", "rejected", "timed_out"):
+                admission.add_metric([key, outcome], stats[outcome])
+        yield in_flight
+        yield queue_depth
+        yield admission
+
+        breaker = GaugeMetricFamily(
+            "rag_llm_breaker_open", "1 if the provider's circuit breaker is not closed", labels=["provider", "state"],
+        )
+        ttft = GaugeMetricFamily("rag_llm_provider_ttft_p95_seconds", "Rolling p95 TTFT per provider", labels=["provider"])
+        for key, stats in routing_stats().items():
+            breaker.add_metric([key, stats["state"]], 0 if stats["state"] == "closed" else 1)
+            ttft.add_metric([key], stats["ttft_p95"])
+        yield breaker
+        yield ttft
+
+
+REGISTRY.register(_RuntimeCollector())
+
+
+def render() -> Tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class LoopLagMonitor:
+    """Samples how late a periodic timer fires, i.e. how long the loop was blocked."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None and settings.loop_lag_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        interval = settings.loop_lag_interval
+        while True:
+            start = loop.time()
+            await asyncio.sleep(interval)
+            lag = max(0.0, loop.time() - start - interval)
+            LOOP_LAG.observe(lag)
+            LOOP_LAG_LAST.set(lag)
+
+
+loop_lag_monitor = LoopLagMonitor()
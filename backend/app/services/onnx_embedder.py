@@ -0,0 +1,248 @@
+"""int8 ONNX Runtime backend for local embedding models.
+
+A model is exported once (``python -m app.cli export-onnx BAAI/bge-m3``): the
+transformer goes to ONNX, its weights are dynamically quantized to int8, and the
+tokenizer and pooling mode are saved next to it. At inference only the tokenizer
+and onnxruntime are needed. Texts are bucketed by token length so each batch is
+padded to its own longest member, within a token budget.
+"""
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+RUNTIME_SENTENCE_TRANSFORMERS = "sentence-transformers"
+RUNTIME_ONNX_INT8 = "onnx-int8"
+RUNTIMES = (RUNTIME_SENTENCE_TRANSFORMERS, RUNTIME_ONNX_INT8)
+
+MODEL_FILE = "model_int8.onnx"
+META_FILE = "meta.json"
+
+# Mixed-language sample for the quality check; override with your own texts for a stricter check
+QUALITY_SAMPLE = [
+    "如何申请退款？",
+    "订单发货后多久可以收到？",
+    "我的账户被锁定了，怎么解锁",
+    "发票可以在订单详情页下载，电子发票会在确认收货后三个工作日内开具。",
+    "支持七天无理由退货，商品需保持完好，退货运费由买家承担。",
+    "How do I reset my password?",
+    "Refunds are issued to the original payment method within 5-7 business days.",
+    "Our support team is available Monday to Friday, 9am to 6pm.",
+    "The warranty covers manufacturing defects for 12 months from the date of purchase.",
+    "会员等级根据近十二个月的累计消费自动计算，每月一号更新。",
+    "Shipping to remote areas may take an additional two to three days.",
+    "客服",
+    "price",
+    "如果包裹在运输过程中损坏，请在签收后四十八小时内拍照联系客服，我们会为您补发或退款。" * 3,
+]
+
+
+def model_dir(model_name: str) -> str:
+    return os.path.join(settings.onnx_model_dir, re.sub(r"[^A-Za-z0-9._-]+", "__", model_name))
+
+
+def _pooling_mode(st_model) -> str:
+    for module in st_model:
+        if type(module).__name__ == "Pooling":
+            if getattr(module, "pooling_mode_cls_token", False):
+                return "cls"
+            if getattr(module, "pooling_mode_mean_tokens", False):
+                return "mean"
+    return "mean"
+
+
+def export_model(model_name: str, opset: int = 17) -> str:
+    """Export a sentence-transformers model to int8 ONNX; returns the output directory."""
+    import torch
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    from app.services.embedding import load_local_model
+
+    st_model = load_local_model(model_name)
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+    sample = tokenizer(["export sample", "导出样例文本"], padding=True, return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs)))[0]
+
+    out_dir = model_dir(model_name)
+    os.makedirs(out_dir, exist_ok=True)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+
+    work_dir = tempfile.mkdtemp(prefix="onnx-export-")
+    try:
+        fp32_path = os.path.join(work_dir, "model.onnx")
+        with torch.no_grad():
+            torch.onnx.export(
+                LastHiddenState(transformer),
+                tuple(sample[name] for name in input_names),
+                fp32_path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=opset,
+                do_constant_folding=True,
+            )
+        # The fp32 export of a large model (BGE-M3 is ~2.2GB) spills its weights to external
+        # data files next to it; the int8 result is a quarter of that and fits in one file
+        quantize_dynamic(
+            fp32_path,
+            os.path.join(out_dir, MODEL_FILE),
+            weight_type=QuantType.QInt8,
+            use_external_data_format=False,
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    tokenizer.save_pretrained(out_dir)
+    meta = {
+        "model_name": model_name,
+        "pooling": _pooling_mode(st_model),
+        "max_seq_length": st_model.max_seq_length,
+        "dimension": st_model.get_sentence_embedding_dimension(),
+        "input_names": input_names,
+        "exported_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(os.path.join(out_dir, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+    _embedders.pop(model_name, None)
+    return out_dir
+
+
+class OnnxEmbedder:
+    def __init__(self, path: str):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+        self.max_length = min(self.meta["max_seq_length"], settings.onnx_max_seq_length)
+        self.pad_id = self.tokenizer.pad_token_id or 0
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if settings.onnx_intra_op_threads > 0:
+            options.intra_op_num_threads = settings.onnx_intra_op_threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            os.path.join(path, MODEL_FILE), options, providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Normalized sentence embeddings, in input order."""
+        encoded = self.tokenizer(texts, truncation=True, max_length=self.max_length)["input_ids"]
+        result = np.empty((len(texts), self.meta["dimension"]), dtype=np.float32)
+
+        # Longest first, so each batch is padded to its first member's length
+        order = sorted(range(len(texts)), key=lambda i: len(encoded[i]), reverse=True)
+        start = 0
+        while start < len(order):
+            longest = len(encoded[order[start]])
+            size = max(1, min(settings.onnx_max_batch_size, settings.onnx_max_batch_tokens // max(longest, 1)))
+            batch = order[start:start + size]
+            result[batch] = self._run([encoded[i] for i in batch], longest)
+            start += size
+        return result
+
+    def _run(self, ids: List[List[int]], length: int) -> np.ndarray:
+        input_ids = np.full((len(ids), length), self.pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(ids), length), dtype=np.int64)
+        for row, seq in enumerate(ids):
+            input_ids[row, :len(seq)] = seq
+            attention_mask[row, :len(seq)] = 1
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self.session.run(None, feeds)[0]
+
+        if self.meta["pooling"] == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+
+_embedders: Dict[str, OnnxEmbedder] = {}
+_load_lock = threading.Lock()
+
+
+def get_onnx_embedder(model_name: str) -> OnnxEmbedder:
+    embedder = _embedders.get(model_name)
+    if embedder is None:
+        with _load_lock:
+            embedder = _embedders.get(model_name)
+            if embedder is None:
+                path = model_dir(model_name)
+                if not os.path.exists(os.path.join(path, MODEL_FILE)):
+                    raise RuntimeError(
+                        f"No ONNX export of {model_name} in {path}; run `python -m app.cli export-onnx {model_name}`"
+                    )
+                embedder = _embedders[model_name] = OnnxEmbedder(path)
+    return embedder
+
+
+def onnx_embeddings(texts: List[str], model_name: str) -> np.ndarray:
+    return get_onnx_embedder(model_name).encode(texts)
+
+
+def check_quality(model_name: str, texts: Optional[List[str]] = None) -> dict:
+    """Compare the int8 export against the reference sentence-transformers model.
+
+    Reports per-text cosine similarity between the two embeddings and the
+    throughput of each; the result is also stored in the export's meta.json.
+    """
+    from app.services.embedding import load_local_model
+
+    texts = texts or QUALITY_SAMPLE
+    reference_model = load_local_model(model_name)
+    embedder = get_onnx_embedder(model_name)
+    reference_model.encode(texts[:2], normalize_embeddings=True)
+    embedder.encode(texts[:2])
+
+    start = time.perf_counter()
+    reference = reference_model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+    reference_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    candidate = embedder.encode(texts)
+    onnx_seconds = time.perf_counter() - start
+
+    cosine = (reference * candidate).sum(axis=1)
+    report = {
+        "samples": len(texts),
+        "mean_cosine": round(float(cosine.mean()), 5),
+        "min_cosine": round(float(cosine.min()), 5),
+        "reference_seconds": round(reference_seconds, 3),
+        "onnx_seconds": round(onnx_seconds, 3),
+        "speedup": round(reference_seconds / onnx_seconds, 2) if onnx_seconds else None,
+        "checked_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+    meta_path = os.path.join(model_dir(model_name), META_FILE)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    meta["quality"] = report
+    with open(meta_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    return report
@@ -0,0 +1,186 @@
+import itertools
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from app.config import settings
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+_LIB_PREFIX = re.compile(r".*[/\\](?:site-packages|dist-packages|lib[/\\]python\d+\.\d+)[/\\]")
+
+
+def _short_path(path: str) -> str:
+    short = _LIB_PREFIX.sub("", path)
+    if short != path:
+        return short
+    i = path.rfind(os.sep + "app" + os.sep)
+    return path[i + 1:] if i != -1 else path
+
+
+def fold_stack(frame) -> str:
+    """Frames root-first, ``;``-separated: one line of the collapsed flamegraph format."""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({_short_path(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    parts.reverse()
+    return ";".join(parts)
+
+
+def to_collapsed(stacks: Iterable) -> str:
+    """Render stack counts as ``stack count`` lines (flamegraph.pl / speedscope input)."""
+    counts = stacks if isinstance(stacks, Counter) else Counter(stacks)
+    return "\n".join(f"{stack} {count}" for stack, count in counts.most_common()) + "\n"
+
+
+def sample_threads(seconds: float, interval: float, thread_ids: Optional[List[int]] = None) -> Counter:
+    """Sample the stacks of the given threads (all but this one by default) for ``seconds``.
+
+    Blocking: run it in a worker thread so the sampled event loop keeps running.
+    """
+    me = threading.get_ident()
+    names = {t.ident: t.name for t in threading.enumerate()}
+    stacks: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == me or (thread_ids is not None and ident not in thread_ids):
+                continue
+            stack = fold_stack(frame)
+            if thread_ids is None or len(thread_ids) > 1:
+                stack = f"{names.get(ident, ident)};{stack}"
+            stacks[stack] += 1
+        time.sleep(interval)
+    return stacks
+
+
+class _Operation:
+    __slots__ = ("id", "kind", "detail", "thread_id", "started_at", "started_wall", "timings")
+
+    def __init__(self, op_id: int, kind: str, detail: str):
+        self.id = op_id
+        self.kind = kind
+        self.detail = detail
+        self.thread_id = threading.get_ident()
+        self.started_at = time.monotonic()
+        self.started_wall = datetime.utcnow()
+        # Shares the current request's stage timings (see metrics.ServerTimingMiddleware)
+        self.timings = metrics.current_timings() or []
+
+
+class SlowRequestRecorder:
+    """Keeps a stack profile and phase breakdown of /ask and ingestion jobs that run long.
+
+    While any tracked operation is in flight, a sampler thread records the stack of
+    the event loop thread every ``profiler_sample_interval``. When an operation
+    finishes over its threshold, the samples taken during its lifetime are folded
+    into a profile and stored, with its stage timings, in a bounded ring buffer.
+    The loop is shared, so the profile shows everything the loop was doing in that
+    window; that is what reveals blocking work such as parsing or local inference.
+    """
+
+    def __init__(self):
+        self._ops: Dict[int, _Operation] = {}
+        self._ids = itertools.count(1)
+        self._samples = deque(maxlen=50000)  # (monotonic time, thread id, folded stack)
+        self._records = deque(maxlen=settings.slow_request_buffer_size)
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def threshold(self, kind: str) -> float:
+        return settings.slow_ask_threshold if kind == "ask" else settings.slow_ingest_threshold
+
+    def begin(self, kind: str, detail: str = "") -> Optional[_Operation]:
+        """Start tracking; returns None when capture is disabled for this kind."""
+        if self.threshold(kind) <= 0:
+            return None
+        op = _Operation(next(self._ids), kind, detail)
+        with self._lock:
+            self._ops[op.id] = op
+        self._ensure_sampler()
+        self._active.set()
+        return op
+
+    def finish(self, op: Optional[_Operation]):
+        """Stop tracking; calling it again for the same operation is a no-op."""
+        if op is None:
+            return
+        ended_at = time.monotonic()
+        with self._lock:
+            if self._ops.pop(op.id, None) is None:
+                return
+            if not self._ops:
+                self._active.clear()
+
+        duration = ended_at - op.started_at
+        if duration < self.threshold(op.kind):
+            return
+        stacks = Counter(
+            stack for at, thread_id, stack in list(self._samples)
+            if op.started_at <= at <= ended_at and thread_id == op.thread_id
+        )
+        self._records.append({
+            "id": op.id,
+            "kind": op.kind,
+            "detail": op.detail,
+            "started_at": op.started_wall.isoformat() + "Z",
+            "duration_ms": round(duration * 1000, 1),
+            "phases": [{"stage": name, "ms": round(seconds * 1000, 1)} for name, seconds in op.timings],
+            "samples": sum(stacks.values()),
+            "profile": to_collapsed(stacks) if stacks else "",
+        })
+        logger.warning(f"Slow {op.kind} ({duration:.1f}s) captured as #{op.id}: {op.detail}")
+
+    @contextmanager
+    def track(self, kind: str, detail: str = ""):
+        """Track a block with its own stage timings, e.g. one document of a background ingestion job."""
+        _, token = metrics.start_timings()
+        op = self.begin(kind, detail)
+        try:
+            yield op
+        finally:
+            self.finish(op)
+            metrics.stop_timings(token)
+
+    def records(self) -> List[dict]:
+        return list(self._records)
+
+    def get(self, op_id: int) -> Optional[dict]:
+        return next((r for r in self._records if r["id"] == op_id), None)
+
+    def _ensure_sampler(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._sample, name="slow-request-sampler", daemon=True)
+            self._thread.start()
+
+    def _sample(self):
+        while True:
+            self._active.wait()
+            now = time.monotonic()
+            with self._lock:
+                # An SSE response whose body never started leaves its operation unfinished
+                for op_id in [i for i, op in self._ops.items() if now - op.started_at > 3600]:
+                    del self._ops[op_id]
+                if not self._ops:
+                    self._active.clear()
+                thread_ids = {op.thread_id for op in self._ops.values()}
+            frames = sys._current_frames()
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self._samples.append((now, thread_id, fold_stack(frame)))
+            time.sleep(settings.profiler_sample_interval)
+
+
+slow_requests = SlowRequestRecorder()
@@ -0,0 +1,730 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Callable, List, Dict, Optional, Set, Tuple
+from uuid import UUID, uuid4
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.exceptions import UnexpectedResponse
+from qdrant_client.models import (
+    VectorParams, Distance, PointStruct, Filter, FieldCondition, MatchValue, MatchAny, PayloadSchemaType,
+    HnswConfigDiff, ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    ProductQuantization, ProductQuantizationConfig, CompressionRatio,
+    SearchParams, QuantizationSearchParams, QueryRequest,
+    CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation,
+    KeywordIndexParams, KeywordIndexType,
+)
+from sqlalchemy import select, update
+
+from app.config import settings
+from app.db import async_session
+from app.models import KnowledgeBase
+from app.schemas import IndexSettings
+from app.services.vector_store import VectorStore
+from app.services.metrics import cache_lookup
+
+logger = logging.getLogger(__name__)
+
+DISTANCES = {"cosine": Distance.COSINE, "dot": Distance.DOT, "euclid": Distance.EUCLID}
+
+LAYOUT_DEDICATED = "dedicated"  # one collection per knowledge base
+LAYOUT_SHARED = "shared"  # one collection for all, partitioned by the kb_id payload field
+SHARED_DISTANCE = Distance.COSINE  # the shared collection ignores per-KB index settings
+
+# A rebuild or layout move in progress is recorded on the KB row (storage_migration) so
+# every worker writes to both copies while it runs:
+#   {"kind": "rebuild", "collection": <new collection>}
+#   {"kind": "move", "layout": <target layout>}
+MIGRATION_REBUILD = "rebuild"
+MIGRATION_MOVE = "move"
+
+# KB id -> (loaded_at, storage layout, IndexSettings, storage migration or None)
+_kb_storage_cache: Dict[str, Tuple[float, str, IndexSettings, Optional[dict]]] = {}
+
+# Physical collections known to have the doc_id/url payload indexes
+_indexed_collections: Set[str] = set()
+
+
+def _get_client() -> QdrantClient:
+    return QdrantClient(url=settings.qdrant_url)
+
+
+def _collection_name(kb_id: str) -> str:
+    return f"{settings.qdrant_collection_prefix}{kb_id.replace('-', '_')}"
+
+
+async def _kb_storage(kb_id: str) -> Tuple[float, str, IndexSettings, Optional[dict]]:
+    """A knowledge base's storage layout, index settings and migration, cached per worker."""
+    cached = _kb_storage_cache.get(kb_id)
+    if cached and time.monotonic() - cached[0] < settings.kb_storage_cache_ttl:
+        cache_lookup("kb_storage", True)
+        return cached
+    cache_lookup("kb_storage", False)
+
+    async with async_session() as db:
+        kb = await db.get(KnowledgeBase, UUID(kb_id))
+    layout = (kb.storage_layout if kb else None) or LAYOUT_DEDICATED
+    index = IndexSettings(**((kb.index_settings if kb else None) or {}))
+    migration = kb.storage_migration if kb else None
+    _kb_storage_cache[kb_id] = (time.monotonic(), layout, index, migration)
+    return _kb_storage_cache[kb_id]
+
+
+async def _get_kb_storage(kb_id: str) -> Tuple[str, IndexSettings]:
+    _, layout, index, _ = await _kb_storage(kb_id)
+    return layout, index
+
+
+async def _begin_migration(kb_id: str, migration: dict) -> bool:
+    """Record a rebuild or move on the KB row; False if one is already running."""
+    async with async_session() as db:
+        result = await db.execute(
+            update(KnowledgeBase)
+            .where(KnowledgeBase.id == UUID(kb_id), KnowledgeBase.storage_migration.is_(None))
+            .values(storage_migration=migration)
+        )
+        await db.commit()
+    _kb_storage_cache.pop(kb_id, None)
+    return result.rowcount == 1
+
+
+async def _end_migration(kb_id: str, **values):
+    async with async_session() as db:
+        await db.execute(
+            update(KnowledgeBase).where(KnowledgeBase.id == UUID(kb_id)).values(storage_migration=None, **values)
+        )
+        await db.commit()
+    _kb_storage_cache.pop(kb_id, None)
+
+
+async def _wait_for_workers():
+    """Wait until every worker's cached KB storage has been reloaded from the DB."""
+    await asyncio.sleep(settings.kb_storage_cache_ttl + 1)
+
+
+async def _migrating_kb_ids() -> Set[str]:
+    async with async_session() as db:
+        result = await db.execute(select(KnowledgeBase.id).where(KnowledgeBase.storage_migration.is_not(None)))
+    return {str(kb_id) for kb_id in result.scalars().all()}
+
+
+def _kb_filter(kb_id: str, *conditions: FieldCondition) -> Filter:
+    return Filter(must=[FieldCondition(key="kb_id", match=MatchValue(value=kb_id)), *conditions])
+
+
+def _resolve_collection(client: QdrantClient, name: str) -> Optional[str]:
+    """Physical collection behind a name, following aliases. None if missing."""
+    for alias in client.get_aliases().aliases:
+        if alias.alias_name == name:
+            return alias.collection_name
+    if any(c.name == name for c in client.get_collections().collections):
+        return name
+    return None
+
+
+def _existing(client: QdrantClient, name: str) -> Optional[str]:
+    return name if _resolve_collection(client, name) is not None else None
+
+
+def _rebuilt_collection(migration: Optional[dict]) -> Optional[str]:
+    return migration["collection"] if migration and migration["kind"] == MIGRATION_REBUILD else None
+
+
+def _create_collection(client: QdrantClient, name: str, dim: int, index: IndexSettings):
+    quantization = None
+    if index.quantization == "scalar":
+        quantization = ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=index.quantization_always_ram)
+        )
+    elif index.quantization == "product":
+        quantization = ProductQuantization(
+            product=ProductQuantizationConfig(compression=CompressionRatio.X16, always_ram=index.quantization_always_ram)
+        )
+
+    client.create_collection(
+        collection_name=name,
+        vectors_config=VectorParams(
+            size=dim,
+            distance=DISTANCES[index.distance],
+            on_disk=index.on_disk_vectors,
+        ),
+        hnsw_config=HnswConfigDiff(m=index.hnsw_m, ef_construct=index.hnsw_ef_construct),
+        quantization_config=quantization,
+        on_disk_payload=index.on_disk_payload,
+    )
+    _indexed_collections.discard(name)  # a dropped collection of the same name may be remembered
+    _ensure_payload_indexes(client, name)
+
+
+def _ensure_payload_indexes(client: QdrantClient, name: str):
+    """Keyword indexes so doc_id/url filters (deletes, GC) don't scan the collection."""
+    if name in _indexed_collections:
+        return
+    existing = client.get_collection(name).payload_schema
+    for field in ("doc_id", "url"):
+        if field not in existing:
+            client.create_payload_index(collection_name=name, field_name=field, field_schema=PayloadSchemaType.KEYWORD)
+    _indexed_collections.add(name)
+
+
+def _ensure_collection(client: QdrantClient, name: str, dim: int, index: IndexSettings):
+    """Create collection if not exists."""
+    if _resolve_collection(client, name) is None:
+        _create_collection(client, name, dim, index)
+
+
+def _ensure_shared_collection(client: QdrantClient, dim: int):
+    """Create the shared collection with a tenant index on kb_id.
+
+    HNSW links are built per tenant (payload_m) instead of globally (m=0), since
+    every search is filtered by kb_id.
+    """
+    name = settings.qdrant_shared_collection
+    if _resolve_collection(client, name) is not None:
+        return
+    client.create_collection(
+        collection_name=name,
+        vectors_config=VectorParams(size=dim, distance=SHARED_DISTANCE),
+        hnsw_config=HnswConfigDiff(m=0, payload_m=16),
+    )
+    client.create_payload_index(
+        collection_name=name,
+        field_name="kb_id",
+        field_schema=KeywordIndexParams(type=KeywordIndexType.KEYWORD, is_tenant=True),
+    )
+    _indexed_collections.discard(name)
+    _ensure_payload_indexes(client, name)
+
+
+def _upsert_if_exists(client: QdrantClient, name: str, points: List[PointStruct]):
+    """Upsert into ``name`` unless it is missing (or goes missing meanwhile)."""
+    if _resolve_collection(client, name) is None:
+        return
+    try:
+        client.upsert(collection_name=name, points=points)
+    except UnexpectedResponse:
+        if _resolve_collection(client, name) is not None:
+            raise
+
+
+def _write_points(
+    client: QdrantClient, kb_id: str, layout: str, index: IndexSettings, points: List[PointStruct],
+    rebuilt: Optional[str] = None,
+):
+    """Upsert into the KB's layout; ``rebuilt`` is the collection a running rebuild copies into."""
+    dim = len(points[0].vector)
+    if layout == LAYOUT_SHARED:
+        _ensure_shared_collection(client, dim)
+        client.upsert(
+            collection_name=settings.qdrant_shared_collection,
+            points=[PointStruct(id=p.id, vector=p.vector, payload={**p.payload, "kb_id": kb_id}) for p in points],
+        )
+        return
+
+    col_name = _collection_name(kb_id)
+    if rebuilt is None:
+        _ensure_collection(client, col_name, dim, index)
+        client.upsert(collection_name=col_name, points=points)
+        return
+    # The rebuild may be dropping a legacy collection of this name to alias it: write
+    # the new collection first (once it has been created) and never recreate the old name
+    _upsert_if_exists(client, rebuilt, points)
+    _upsert_if_exists(client, col_name, points)
+
+
+def _delete_points(client: QdrantClient, kb_id: str, layout: str, doc_ids: List[str], rebuilt: Optional[str] = None):
+    doc_condition = FieldCondition(key="doc_id", match=MatchAny(any=doc_ids))
+    if layout == LAYOUT_SHARED:
+        if _resolve_collection(client, settings.qdrant_shared_collection) is not None:
+            client.delete(
+                collection_name=settings.qdrant_shared_collection,
+                points_selector=_kb_filter(kb_id, doc_condition),
+            )
+        return
+
+    selector = Filter(must=[doc_condition])
+    if rebuilt is not None and _resolve_collection(client, rebuilt) is not None:
+        client.delete(collection_name=rebuilt, points_selector=selector)
+    col_name = _collection_name(kb_id)
+    if _resolve_collection(client, col_name) is None:
+        return
+    try:
+        client.delete(collection_name=col_name, points_selector=selector)
+    except UnexpectedResponse:
+        if _resolve_collection(client, col_name) is not None:
+            raise
+
+
+def _search_params(index: IndexSettings) -> Optional[SearchParams]:
+    if index.search_ef is None and index.quantization is None:
+        return None
+    quantization = None
+    if index.quantization is not None:
+        quantization = QuantizationSearchParams(rescore=index.rescore, oversampling=index.oversampling)
+    return SearchParams(hnsw_ef=index.search_ef, quantization=quantization)
+
+
+async def update_index_settings(kb_id: str, index: IndexSettings):
+    """Apply new index settings, rebuilding the existing collection online if there is one.
+
+    Knowledge bases in the shared collection only pick up the search-time settings.
+    """
+    _kb_storage_cache.pop(kb_id, None)
+    layout, _ = await _get_kb_storage(kb_id)
+    if layout == LAYOUT_SHARED:
+        return
+    client = _get_client()
+    col_name = _collection_name(kb_id)
+    current = await asyncio.to_thread(_resolve_collection, client, col_name)
+    if current is None:
+        return
+
+    new_name = f"{col_name}_{uuid4().hex[:8]}"
+    # Claimed before the collection exists, so reconciliation never takes it for a leftover
+    if not await _begin_migration(kb_id, {"kind": MIGRATION_REBUILD, "collection": new_name}):
+        logger.warning(f"Knowledge base {kb_id} is already being rebuilt or moved, new settings apply to the next rebuild")
+        return
+    try:
+        dim = (await asyncio.to_thread(client.get_collection, current)).config.params.vectors.size
+        await asyncio.to_thread(_create_collection, client, new_name, dim, index)
+    except Exception:
+        logger.exception(f"Failed to create collection {new_name}")
+        await _end_migration(kb_id)
+        raise
+
+    try:
+        # Points written before every worker has seen the migration are still picked up by the copy
+        await _wait_for_workers()
+        await asyncio.to_thread(_rebuild_collection, client, col_name, new_name)
+    except Exception:
+        logger.exception(f"Failed to rebuild collection {col_name}")
+        target = await asyncio.to_thread(_resolve_collection, client, col_name)
+        if target is None:
+            # The original is gone but the alias is not there: new_name is the only full
+            # copy, so the migration stays recorded and reads and writes keep going to it
+            logger.error(f"Collection {col_name} is missing, its points are in {new_name}; create the alias by hand")
+            raise
+        await _end_migration(kb_id)
+        if target != new_name:
+            await _wait_for_workers()
+            await asyncio.to_thread(client.delete_collection, new_name)
+        raise
+    await _end_migration(kb_id)
+
+
+def _copy_points(
+    client: QdrantClient,
+    source: str,
+    dest: str,
+    scroll_filter: Filter = None,
+    transform: Callable[[dict], dict] = None,
+    batch_size: int = 256,
+):
+    """Copy points (ids, vectors and payloads) between collections in batches."""
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=source,
+            scroll_filter=scroll_filter,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        if points:
+            client.upsert(
+                collection_name=dest,
+                points=[
+                    PointStruct(id=p.id, vector=p.vector, payload=transform(p.payload) if transform else p.payload)
+                    for p in points
+                ],
+            )
+        if offset is None:
+            break
+
+
+def _rebuild_collection(client: QdrantClient, name: str, new_name: str, batch_size: int = 256):
+    """Copy a collection into ``new_name``, created with the new settings, then switch the alias.
+
+    Every worker writes to both collections while the copy runs (see _write_points).
+    Collections created before aliases were used are deleted right before the alias
+    takes over their name; writers skip the name meanwhile and reads fall back to
+    ``new_name``. Later rebuilds swap the alias atomically.
+    """
+    current = _resolve_collection(client, name)
+    _copy_points(client, current, new_name, batch_size=batch_size)
+
+    create = CreateAliasOperation(create_alias=CreateAlias(collection_name=new_name, alias_name=name))
+    if current == name:
+        client.delete_collection(current)
+        client.update_collection_aliases(change_aliases_operations=[create])
+    else:
+        client.update_collection_aliases(change_aliases_operations=[
+            DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=name)),
+            create,
+        ])
+        client.delete_collection(current)
+    logger.info(f"Rebuilt collection {name} into {new_name}")
+
+
+def _drop_dedicated_collection(client: QdrantClient, name: str):
+    """Drop a KB's collection and any ``<name>_<suffix>`` collection a rebuild left behind."""
+    current = _resolve_collection(client, name)
+    if current is not None:
+        if current != name:
+            client.update_collection_aliases(change_aliases_operations=[
+                DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=name)),
+            ])
+        client.delete_collection(current)
+    for c in client.get_collections().collections:
+        if c.name.startswith(f"{name}_"):
+            client.delete_collection(c.name)
+
+
+def _move_points(client: QdrantClient, kb_id: str, source_layout: str, target_layout: str, index: IndexSettings):
+    col_name = _collection_name(kb_id)
+    shared = settings.qdrant_shared_collection
+    if target_layout == LAYOUT_SHARED:
+        source = _resolve_collection(client, col_name)
+        if source is None:
+            return
+        _ensure_shared_collection(client, client.get_collection(source).config.params.vectors.size)
+        _copy_points(client, source, shared, transform=lambda payload: {**payload, "kb_id": kb_id})
+    else:
+        if _resolve_collection(client, shared) is None:
+            return
+        _ensure_collection(client, col_name, client.get_collection(shared).config.params.vectors.size, index)
+        _copy_points(
+            client, shared, col_name,
+            scroll_filter=_kb_filter(kb_id),
+            transform=lambda payload: {k: v for k, v in payload.items() if k != "kb_id"},
+        )
+
+
+def _drop_points(client: QdrantClient, kb_id: str, layout: str):
+    if layout == LAYOUT_SHARED:
+        if _resolve_collection(client, settings.qdrant_shared_collection) is not None:
+            client.delete(collection_name=settings.qdrant_shared_collection, points_selector=_kb_filter(kb_id))
+    else:
+        _drop_dedicated_collection(client, _collection_name(kb_id))
+
+
+class LayoutMoveError(ValueError):
+    pass
+
+
+def _check_shared_move(client: QdrantClient, kb_id: str, index: IndexSettings):
+    """Refuse a move whose vectors the shared collection would score differently or not take at all."""
+    source = _resolve_collection(client, _collection_name(kb_id))
+    if source is not None:
+        params = client.get_collection(source).config.params.vectors
+        dim, distance = params.size, params.distance
+    else:
+        dim, distance = None, DISTANCES[index.distance]
+    if distance != SHARED_DISTANCE:
+        raise LayoutMoveError(
+            f"The knowledge base uses {Distance(distance).value} distance, "
+            f"the shared collection {SHARED_DISTANCE.value}"
+        )
+    shared = _resolve_collection(client, settings.qdrant_shared_collection)
+    if dim is not None and shared is not None:
+        shared_dim = client.get_collection(shared).config.params.vectors.size
+        if dim != shared_dim:
+            raise LayoutMoveError(
+                f"The knowledge base has {dim}-dimensional vectors, the shared collection {shared_dim}"
+            )
+
+
+async def check_layout_move(kb_id: str, target_layout: str):
+    """Raise LayoutMoveError if the knowledge base cannot be moved to ``target_layout``."""
+    _kb_storage_cache.pop(kb_id, None)
+    layout, index = await _get_kb_storage(kb_id)
+    if layout != target_layout and target_layout == LAYOUT_SHARED:
+        await asyncio.to_thread(_check_shared_move, _get_client(), kb_id, index)
+
+
+async def move_kb_layout(kb_id: str, target_layout: str):
+    """Move a knowledge base's vectors between the dedicated and shared layouts.
+
+    The move is recorded on the KB row so every worker writes to both layouts while
+    points are copied, then the layout is switched in the DB. The old copy is removed
+    once no worker can still be using its cached layout.
+    """
+    await check_layout_move(kb_id, target_layout)
+    layout, index = await _get_kb_storage(kb_id)
+    if layout == target_layout:
+        return
+    if not await _begin_migration(kb_id, {"kind": MIGRATION_MOVE, "layout": target_layout}):
+        logger.warning(f"Knowledge base {kb_id} is already being rebuilt or moved")
+        return
+
+    client = _get_client()
+    try:
+        # Points written before every worker has seen the move are still picked up by the copy
+        await _wait_for_workers()
+        await asyncio.to_thread(_move_points, client, kb_id, layout, target_layout, index)
+        await _end_migration(kb_id, storage_layout=target_layout)
+    except Exception:
+        logger.exception(f"Failed to move knowledge base {kb_id} to the {target_layout} layout")
+        await _end_migration(kb_id)
+        await _wait_for_workers()
+        await asyncio.to_thread(_drop_points, client, kb_id, target_layout)
+        raise
+
+    # Workers still on the old layout keep writing to both until their cache expires
+    await _wait_for_workers()
+    await asyncio.to_thread(_drop_points, client, kb_id, layout)
+    logger.info(f"Moved knowledge base {kb_id} from the {layout} to the {target_layout} layout")
+
+
+def count_kb_points(kb_id: str, layout: str) -> int:
+    """Number of vectors a knowledge base has in the given layout."""
+    client = _get_client()
+    if layout == LAYOUT_SHARED:
+        if _resolve_collection(client, settings.qdrant_shared_collection) is None:
+            return 0
+        return client.count(settings.qdrant_shared_collection, count_filter=_kb_filter(kb_id)).count
+    col_name = _collection_name(kb_id)
+    if _resolve_collection(client, col_name) is None:
+        return 0
+    return client.count(col_name).count
+
+
+def _kb_id_from_collection(name: str) -> Optional[str]:
+    """KB id encoded in a dedicated collection name (including rebuilt ``_<suffix>`` ones)."""
+    prefix = settings.qdrant_collection_prefix
+    if not name.startswith(prefix) or name == settings.qdrant_shared_collection:
+        return None
+    try:
+        return str(UUID(name[len(prefix):len(prefix) + 36].replace("_", "-")))
+    except ValueError:
+        return None
+
+
+def _scroll_payload_values(client: QdrantClient, name: str, field: str, scroll_filter: Filter = None) -> Set[str]:
+    values = set()
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=name,
+            scroll_filter=scroll_filter,
+            limit=1000,
+            offset=offset,
+            with_payload=[field],
+            with_vectors=False,
+        )
+        values.update(p.payload[field] for p in points if p.payload.get(field))
+        if offset is None:
+            return values
+
+
+def _list_kbs() -> Dict[str, str]:
+    """KB ids that have vectors, mapped to the layout holding them.
+
+    Also backfills the doc_id/url payload indexes on collections created before
+    they existed, once per collection and process.
+    """
+    client = _get_client()
+    kbs = {}
+    names = [c.name for c in client.get_collections().collections]
+    names += [a.alias_name for a in client.get_aliases().aliases]
+    for name in names:
+        kb_id = _kb_id_from_collection(name)
+        if kb_id and _resolve_collection(client, _collection_name(kb_id)) is not None:
+            kbs[kb_id] = LAYOUT_DEDICATED
+    for name in set(_resolve_collection(client, _collection_name(kb_id)) for kb_id in kbs):
+        _ensure_payload_indexes(client, name)
+
+    shared = settings.qdrant_shared_collection
+    if _resolve_collection(client, shared) is not None:
+        _ensure_payload_indexes(client, shared)
+        for kb_id in _scroll_payload_values(client, shared, "kb_id"):
+            kbs.setdefault(kb_id, LAYOUT_SHARED)
+    return kbs
+
+
+def _stray_collections() -> Dict[str, str]:
+    """Rebuild collections (``<name>_<suffix>``) no alias points to, mapped to their KB id.
+
+    They are the target of a running rebuild, or left behind by one that failed or
+    could not drop the collection it replaced.
+    """
+    client = _get_client()
+    aliased = {a.collection_name for a in client.get_aliases().aliases}
+    strays = {}
+    for c in client.get_collections().collections:
+        kb_id = _kb_id_from_collection(c.name)
+        if kb_id and c.name != _collection_name(kb_id) and c.name not in aliased:
+            strays[c.name] = kb_id
+    return strays
+
+
+def _list_doc_ids(kb_id: str, layout: str) -> Set[str]:
+    client = _get_client()
+    if layout == LAYOUT_SHARED:
+        return _scroll_payload_values(client, settings.qdrant_shared_collection, "doc_id", _kb_filter(kb_id))
+    return _scroll_payload_values(client, _collection_name(kb_id), "doc_id")
+
+
+class QdrantStore(VectorStore):
+    """Qdrant backend: a collection per knowledge base, or the shared collection."""
+
+    name = "qdrant"
+
+    async def upsert(self, kb_id: str, points: List[Dict]):
+        client = _get_client()
+        _, layout, index, migration = await _kb_storage(kb_id)
+        structs = [PointStruct(id=p["id"], vector=p["vector"], payload=p["payload"]) for p in points]
+        _write_points(client, kb_id, layout, index, structs, _rebuilt_collection(migration))
+        if migration and migration["kind"] == MIGRATION_MOVE:
+            _write_points(client, kb_id, migration["layout"], index, structs)
+
+    async def _read_target(self, kb_id: str, *conditions: FieldCondition) -> Tuple[Optional[str], Optional[Filter], IndexSettings]:
+        """Collection to read a KB from (None if it has none yet), its filter and index settings."""
+        client = _get_client()
+        _, layout, index, migration = await _kb_storage(kb_id)
+        if layout == LAYOUT_SHARED:
+            return _existing(client, settings.qdrant_shared_collection), _kb_filter(kb_id, *conditions), index
+        query_filter = Filter(must=list(conditions)) if conditions else None
+        # A legacy collection is missing for a moment while a rebuild swaps in its alias
+        col_name = _existing(client, _collection_name(kb_id)) or _rebuilt_collection(migration)
+        return col_name, query_filter, index
+
+    async def search(self, kb_id: str, vector: List[float], top_k: int) -> List[Dict]:
+        client = _get_client()
+        col_name, query_filter, index = await self._read_target(kb_id)
+        if col_name is None:
+            return []
+
+        results = client.query_points(
+            collection_name=col_name,
+            query=vector,
+            query_filter=query_filter,
+            limit=top_k,
+            search_params=_search_params(index),
+        )
+        return [{"payload": point.payload, "score": point.score} for point in results.points]
+
+    async def search_batch(self, kb_id: str, vectors: List[List[float]], top_k: int) -> List[List[Dict]]:
+        client = _get_client()
+        col_name, query_filter, index = await self._read_target(kb_id)
+        if not vectors or col_name is None:
+            return [[] for _ in vectors]
+
+        params = _search_params(index)
+        responses = await asyncio.to_thread(
+            client.query_batch_points,
+            collection_name=col_name,
+            requests=[
+                QueryRequest(query=vector, filter=query_filter, limit=top_k, params=params, with_payload=True)
+                for vector in vectors
+            ],
+        )
+        return [
+            [{"payload": point.payload, "score": point.score} for point in response.points]
+            for response in responses
+        ]
+
+    async def delete_docs(self, kb_id: str, doc_ids: List[str]):
+        client = _get_client()
+        _, layout, _, migration = await _kb_storage(kb_id)
+        _delete_points(client, kb_id, layout, doc_ids, _rebuilt_collection(migration))
+        if migration and migration["kind"] == MIGRATION_MOVE:
+            _delete_points(client, kb_id, migration["layout"], doc_ids)
+
+    async def delete_kb(self, kb_id: str, layout: Optional[str] = None):
+        """Drop the KB's collection or purge it from the shared one."""
+        if layout is None:
+            layout, _ = await _get_kb_storage(kb_id)
+        _kb_storage_cache.pop(kb_id, None)
+        await asyncio.to_thread(_drop_points, _get_client(), kb_id, layout)
+
+    async def list_kbs(self) -> Dict[str, str]:
+        """Knowledge bases being rebuilt or moved are left out, their vectors are in flux.
+
+        Rebuild collections left behind by knowledge bases that are not being rebuilt
+        are dropped on the way.
+        """
+        kbs = await asyncio.to_thread(_list_kbs)
+        strays = await asyncio.to_thread(_stray_collections)
+        # Read after listing: a rebuild claims its migration before creating its collection
+        migrating = await _migrating_kb_ids()
+        client = _get_client()
+        for name, kb_id in strays.items():
+            if kb_id not in migrating:
+                logger.info(f"Dropping leftover rebuild collection {name}")
+                await asyncio.to_thread(client.delete_collection, name)
+        return {kb_id: layout for kb_id, layout in kbs.items() if kb_id not in migrating}
+
+    async def list_doc_ids(self, kb_id: str, layout: Optional[str] = None) -> Set[str]:
+        if layout is None:
+            layout, _ = await _get_kb_storage(kb_id)
+        return await asyncio.to_thread(_list_doc_ids, kb_id, layout)
+
+    async def get_doc_chunks(self, kb_id: str, doc_ids: List[str]) -> List[Dict]:
+        if not doc_ids:
+            return []
+        return await self._scroll_payloads(kb_id, FieldCondition(key="doc_id", match=MatchAny(any=doc_ids)))
+
+    async def get_chunks(self, kb_id: str, keys: List[Tuple[str, int]]) -> List[Dict]:
+        wanted = set(keys)
+        doc_ids = sorted({doc_id for doc_id, _ in wanted})
+        indexes = sorted({chunk_index for _, chunk_index in wanted})
+        # doc_id x chunk_index is a superset of the keys; the extra pairs are dropped below
+        conditions = (
+            FieldCondition(key="doc_id", match=MatchAny(any=doc_ids)),
+            FieldCondition(key="chunk_index", match=MatchAny(any=indexes)),
+        )
+        payloads = await self._scroll_payloads(kb_id, *conditions) if wanted else []
+        return [p for p in payloads if (p["doc_id"], p.get("chunk_index")) in wanted]
+
+    async def _scroll_payloads(self, kb_id: str, *conditions: FieldCondition) -> List[Dict]:
+        client = _get_client()
+        col_name, scroll_filter, _ = await self._read_target(kb_id, *conditions)
+        if col_name is None:
+            return []
+
+        payloads = []
+        offset = None
+        while True:
+            points, offset = await asyncio.to_thread(
+                client.scroll,
+                collection_name=col_name,
+                scroll_filter=scroll_filter,
+                limit=1000,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False,
+            )
+            payloads.extend({k: v for k, v in p.payload.items() if k != "kb_id"} for p in points)
+            if offset is None:
+                return payloads
+
+    async def scroll(self, kb_id: str, batch_size: int = 512) -> AsyncIterator[List[Dict]]:
+        client = _get_client()
+        col_name, scroll_filter, _ = await self._read_target(kb_id)
+        if col_name is None:
+            return
+
+        offset = None
+        while True:
+            points, offset = await asyncio.to_thread(
+                client.scroll,
+                collection_name=col_name,
+                scroll_filter=scroll_filter,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            if points:
+                yield [
+                    {
+                        "id": str(p.id),
+                        "vector": p.vector,
+                        "payload": {k: v for k, v in p.payload.items() if k != "kb_id"},
+                    }
+                    for p in points
+                ]
+            if offset is None:
+                return
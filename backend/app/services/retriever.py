@@ -1,38 +1,14 @@
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional, Set
 from uuid import uuid4
 
-from qdrant_client import QdrantClient
-from qdrant_client.models import (
-    VectorParams, Distance, PointStruct, Filter, FieldCondition, MatchValue
-)
-
 from app.config import settings
 from app.services.embedding import get_embeddings
+from app.services.vector_store import get_vector_store
+from app.services.metrics import stage
 
 logger = logging.getLogger(__name__)
 
-VECTOR_DIM = 1024  # BGE-M3 default dimension
-
-
-def _get_client() -> QdrantClient:
-    return QdrantClient(url=settings.qdrant_url)
-
-
-def _collection_name(kb_id: str) -> str:
-    return f"{settings.qdrant_collection_prefix}{kb_id.replace('-', '_')}"
-
-
-async def _ensure_collection(client: QdrantClient, name: str):
-    """Create collection if not exists."""
-    collections = client.get_collections().collections
-    exists = any(c.name == name for c in collections)
-    if not exists:
-        client.create_collection(
-            collection_name=name,
-            vectors_config=VectorParams(size=VECTOR_DIM, distance=Distance.COSINE),
-        )
-
 
 async def store_chunks(
     collection_name: str,
@@ -42,27 +18,26 @@ async def store_chunks(
     url: str,
     title: str,
 ):
-    """Store chunks with embeddings in Qdrant."""
-    client = _get_client()
-    col_name = _collection_name(collection_name)
-    await _ensure_collection(client, col_name)
+    """Store chunks with embeddings in the vector store."""
+    if not embeddings:
+        return
 
     points = [
-        PointStruct(
-            id=str(uuid4()),
-            vector=emb,
-            payload={
+        {
+            "id": str(uuid4()),
+            "vector": emb,
+            "payload": {
                 "text": chunk["text"],
                 "title": title,
                 "url": url,
                 "doc_id": doc_id,
                 "chunk_index": chunk["index"],
             },
-        )
+        }
         for chunk, emb in zip(chunks, embeddings)
     ]
 
-    client.upsert(collection_name=col_name, points=points)
+    await get_vector_store().upsert(collection_name, points)
 
 
 async def retrieve_relevant_chunks(kb_id: str, query: str, top_k: int = None) -> List[Dict]:
@@ -70,47 +45,56 @@ async def retrieve_relevant_chunks(kb_id: str, query: str, top_k: int = None) ->
     if top_k is None:
         top_k = settings.top_k
 
-    client = _get_client()
-    col_name = _collection_name(kb_id)
-
-    # Check if collection exists
-    collections = client.get_collections().collections
-    if not any(c.name == col_name for c in collections):
-        return []
-
     # Embed the query
-    query_embedding = (await get_embeddings([query]))[0]
+    with stage("query_embedding"):
+        query_embedding = (await get_embeddings([query]))[0]
 
     # Search
-    results = client.query_points(
-        collection_name=col_name,
-        query=query_embedding,
-        limit=top_k,
-    )
+    with stage("vector_search"):
+        hits = await get_vector_store().search(kb_id, query_embedding, top_k)
 
-    return [
-        {
-            "text": point.payload["text"],
-            "title": point.payload.get("title", ""),
-            "url": point.payload.get("url", ""),
-            "score": point.score,
-        }
-        for point in results.points
-    ]
+    return [_hit_to_chunk(hit) for hit in hits]
+
+
+async def search_chunks_batch(kb_id: str, vectors: List[List[float]], top_k: int = None) -> List[List[Dict]]:
+    """Relevant chunks for several already-embedded queries of one knowledge base, in one search call."""
+    if top_k is None:
+        top_k = settings.top_k
+    results = await get_vector_store().search_batch(kb_id, vectors, top_k)
+    return [[_hit_to_chunk(hit) for hit in hits] for hits in results]
+
+
+def _hit_to_chunk(hit: Dict) -> Dict:
+    return {
+        "text": hit["payload"]["text"],
+        "title": hit["payload"].get("title", ""),
+        "url": hit["payload"].get("url", ""),
+        "doc_id": hit["payload"].get("doc_id"),
+        "chunk_index": hit["payload"].get("chunk_index"),
+        "score": hit["score"],
+    }
 
 
 async def delete_doc_chunks(kb_id: str, doc_id: str):
     """Delete all chunks for a document."""
-    client = _get_client()
-    col_name = _collection_name(kb_id)
+    await get_vector_store().delete_docs(kb_id, [doc_id])
+
+
+async def delete_docs_chunks(kb_id: str, doc_ids: List[str]):
+    """Delete all chunks of several documents of one knowledge base in one request."""
+    await get_vector_store().delete_docs(kb_id, doc_ids)
+
+
+async def delete_kb_vectors(kb_id: str, layout: Optional[str] = None):
+    """Remove all vectors of a knowledge base."""
+    await get_vector_store().delete_kb(kb_id, layout)
+
+
+async def list_vector_kbs() -> Dict[str, str]:
+    """KB ids that have vectors, mapped to the storage layout holding them."""
+    return await get_vector_store().list_kbs()
 
-    collections = client.get_collections().collections
-    if not any(c.name == col_name for c in collections):
-        return
 
-    client.delete(
-        collection_name=col_name,
-        points_selector=Filter(
-            must=[FieldCondition(key="doc_id", match=MatchValue(value=doc_id))]
-        ),
-    )
+async def list_vector_doc_ids(kb_id: str, layout: Optional[str] = None) -> Set[str]:
+    """Distinct doc_ids that have vectors in a knowledge base."""
+    return await get_vector_store().list_doc_ids(kb_id, layout)
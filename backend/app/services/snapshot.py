@@ -0,0 +1,259 @@
+"""Knowledge base snapshots: documents, chunk payloads and vectors in one streamable file.
+
+Layout: the magic ``RAGSNAP1``, then frames of ``u8 kind, u32 length, body``:
+
+    header     zlib(JSON): format, knowledge base settings, embedding model, source KB id
+    documents  zlib(JSON columns) of Document rows
+    chunks     u32 count, u32 dim, count * dim float16 vectors, zlib(JSON columns) of payloads
+    end        JSON totals, so a truncated file is detected
+
+Documents come before chunks so an import can map old doc ids to new ones while
+streaming. Import creates a new knowledge base with fresh ids.
+"""
+import json
+import logging
+import struct
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from uuid import UUID, uuid4
+
+import numpy as np
+from sqlalchemy import select, insert
+
+from app.config import settings
+from app.db import async_session
+from app.models import Document, KnowledgeBase
+from app.services.embedding import _get_embedding_config
+from app.services.vector_store import get_vector_store
+from app.services.vector_gc import vector_gc
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"RAGSNAP1"
+FORMAT_VERSION = 1
+
+FRAME_HEADER = 1
+FRAME_DOCUMENTS = 2
+FRAME_CHUNKS = 3
+FRAME_END = 4
+
+_FRAME = struct.Struct(">BI")
+_CHUNKS_HEADER = struct.Struct(">II")
+
+DOCUMENT_COLUMNS = ("id", "url", "title", "status", "chunk_count", "error_message", "created_at")
+
+BATCH_SIZE = 512
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def _frame(kind: int, body: bytes) -> bytes:
+    return _FRAME.pack(kind, len(body)) + body
+
+
+def _pack_columns(rows: List[Dict], columns) -> bytes:
+    data = {column: [row.get(column) for row in rows] for column in columns}
+    return zlib.compress(json.dumps(data, ensure_ascii=False, default=str).encode(), 6)
+
+
+def _unpack_columns(body: bytes) -> List[Dict]:
+    data = json.loads(zlib.decompress(body))
+    columns = list(data)
+    return [dict(zip(columns, values)) for values in zip(*(data[c] for c in columns))]
+
+
+async def export_snapshot(kb_id: str) -> AsyncIterator[bytes]:
+    """Yield the snapshot of a knowledge base piece by piece."""
+    async with async_session() as db:
+        kb = await db.get(KnowledgeBase, UUID(kb_id))
+    if not kb:
+        raise SnapshotError("Knowledge base not found")
+    embedding = await _get_embedding_config()
+
+    header = {
+        "format": FORMAT_VERSION,
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "source_kb_id": kb_id,
+        "knowledge_base": {
+            "name": kb.name,
+            "description": kb.description,
+            "index_settings": kb.index_settings or {},
+            "storage_layout": kb.storage_layout,
+        },
+        "embedding": {"model_name": embedding["model_name"], "runtime": embedding.get("runtime")},
+    }
+    yield MAGIC + _frame(FRAME_HEADER, zlib.compress(json.dumps(header, ensure_ascii=False).encode()))
+
+    documents = 0
+    async with async_session() as db:
+        result = await db.stream_scalars(
+            select(Document).where(Document.knowledge_base_id == kb.id).order_by(Document.created_at),
+            execution_options={"yield_per": BATCH_SIZE},
+        )
+        async for partition in result.partitions():
+            rows = [{column: getattr(doc, column) for column in DOCUMENT_COLUMNS} for doc in partition]
+            documents += len(rows)
+            yield _frame(FRAME_DOCUMENTS, _pack_columns(rows, DOCUMENT_COLUMNS))
+
+    chunks = 0
+    dim = None
+    async for points in get_vector_store().scroll(kb_id, BATCH_SIZE):
+        vectors = np.asarray([p["vector"] for p in points], dtype="<f2")
+        dim = vectors.shape[1]
+        body = _CHUNKS_HEADER.pack(len(points), dim) + vectors.tobytes()
+        payloads = [p["payload"] for p in points]
+        columns = sorted({key for payload in payloads for key in payload})
+        body += _pack_columns(payloads, columns)
+        chunks += len(points)
+        yield _frame(FRAME_CHUNKS, body)
+
+    yield _frame(FRAME_END, json.dumps({"documents": documents, "chunks": chunks, "dimension": dim}).encode())
+    logger.info(f"Exported knowledge base {kb_id}: {documents} documents, {chunks} chunks")
+
+
+class StreamReader:
+    """Exact-size reads over an async byte chunk iterator (request body) or a read(n) callable."""
+
+    def __init__(self, chunks: AsyncIterator[bytes] = None, read: Callable[[int], Awaitable[bytes]] = None):
+        self._chunks = chunks
+        self._read = read
+        self._buffer = bytearray()
+
+    async def readexactly(self, n: int) -> bytes:
+        while len(self._buffer) < n:
+            if self._read is not None:
+                data = await self._read(max(n - len(self._buffer), 1 << 16))
+            else:
+                data = await anext(self._chunks, b"")
+            if not data:
+                raise SnapshotError("Snapshot file is truncated")
+            self._buffer += data
+        out = bytes(self._buffer[:n])
+        del self._buffer[:n]
+        return out
+
+
+async def _read_frame(reader: StreamReader):
+    kind, length = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+    return kind, await reader.readexactly(length)
+
+
+async def import_snapshot(reader: StreamReader, name: Optional[str] = None, force: bool = False) -> Dict:
+    """Load a snapshot into a new knowledge base; returns its id and counts.
+
+    Raises SnapshotError if the file is invalid or was embedded with a different
+    model than the current default (unless ``force``). A failed import removes
+    the partially created knowledge base.
+    """
+    if await reader.readexactly(len(MAGIC)) != MAGIC:
+        raise SnapshotError("Not a knowledge base snapshot")
+    kind, body = await _read_frame(reader)
+    if kind != FRAME_HEADER:
+        raise SnapshotError("Snapshot header missing")
+    header = json.loads(zlib.decompress(body))
+    if header.get("format") != FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot format {header.get('format')}")
+
+    embedding = await _get_embedding_config()
+    source_model = header["embedding"]["model_name"]
+    if source_model != embedding["model_name"] and not force:
+        raise SnapshotError(
+            f"Snapshot was embedded with {source_model} but the current embedding model is "
+            f"{embedding['model_name']}; its vectors would not match new queries"
+        )
+
+    source = header["knowledge_base"]
+    async with async_session() as db:
+        kb = KnowledgeBase(
+            name=name or source["name"],
+            description=source.get("description") or "",
+            index_settings=source.get("index_settings") or {},
+            storage_layout=source.get("storage_layout") or settings.default_storage_layout,
+        )
+        db.add(kb)
+        await db.commit()
+        kb_id = kb.id
+
+    try:
+        counts = await _load_frames(reader, kb_id)
+    except BaseException:
+        await _discard(kb_id, kb.storage_layout)
+        raise
+
+    logger.info(f"Imported snapshot of {header['source_kb_id']} as {kb_id}: {counts}")
+    return {"id": str(kb_id), **counts}
+
+
+async def _load_frames(reader: StreamReader, kb_id: UUID) -> Dict:
+    store = get_vector_store()
+    doc_ids: Dict[str, str] = {}
+    documents = chunks = completed = 0
+    dim = None
+    while True:
+        kind, body = await _read_frame(reader)
+        if kind == FRAME_DOCUMENTS:
+            rows = []
+            for row in _unpack_columns(body):
+                new_id = uuid4()
+                doc_ids[row["id"]] = str(new_id)
+                completed += row["status"] == "completed"
+                rows.append({
+                    "id": new_id,
+                    "knowledge_base_id": kb_id,
+                    "url": row["url"],
+                    "title": row["title"] or "",
+                    "status": row["status"],
+                    "chunk_count": row["chunk_count"] or 0,
+                    "error_message": row["error_message"] or "",
+                    "created_at": datetime.fromisoformat(row["created_at"]) if row["created_at"] else datetime.utcnow(),
+                })
+            async with async_session() as db:
+                await db.execute(insert(Document), rows)
+                await db.commit()
+            documents += len(rows)
+
+        elif kind == FRAME_CHUNKS:
+            count, block_dim = _CHUNKS_HEADER.unpack_from(body)
+            if dim is not None and block_dim != dim:
+                raise SnapshotError("Snapshot mixes vector dimensions")
+            dim = block_dim
+            vector_bytes = count * dim * 2
+            vectors = np.frombuffer(body, dtype="<f2", count=count * dim, offset=_CHUNKS_HEADER.size)
+            vectors = vectors.reshape(count, dim).astype(np.float32)
+            payloads = _unpack_columns(body[_CHUNKS_HEADER.size + vector_bytes:])
+            points = []
+            for payload, vector in zip(payloads, vectors):
+                doc_id = doc_ids.get(payload["doc_id"])
+                if doc_id is None:
+                    continue  # vector of a document deleted before the export, not yet garbage-collected
+                points.append({"id": str(uuid4()), "vector": vector.tolist(), "payload": {**payload, "doc_id": doc_id}})
+            if points:
+                await store.upsert(str(kb_id), points)
+            chunks += len(points)
+
+        elif kind == FRAME_END:
+            totals = json.loads(body)
+            if totals["documents"] != documents:
+                raise SnapshotError(f"Snapshot lists {totals['documents']} documents but contains {documents}")
+            break
+        else:
+            raise SnapshotError(f"Unknown snapshot frame {kind}")
+
+    async with async_session() as db:
+        kb = await db.get(KnowledgeBase, kb_id)
+        kb.document_count = completed
+        await db.commit()
+    return {"documents": documents, "chunks": chunks}
+
+
+async def _discard(kb_id: UUID, layout: Optional[str]):
+    async with async_session() as db:
+        await db.execute(Document.__table__.delete().where(Document.knowledge_base_id == kb_id))
+        kb = await db.get(KnowledgeBase, kb_id)
+        if kb:
+            await db.delete(kb)
+        await db.commit()
+    vector_gc.delete_knowledge_base(str(kb_id), layout)
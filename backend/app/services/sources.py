@@ -0,0 +1,145 @@
+"""Message sources as chunk references.
+
+An assistant message stores ``{"doc_id", "chunk_index", "score"}`` per retrieved
+chunk instead of a copy of its text. Url, title and text are resolved from the
+vector store in one batch when a client expands the sources, through a short-lived
+per-worker cache. Messages written before this keep their ``{url, title, chunk_text}``
+entries until ``python -m app.cli compact-sources`` rewrites them.
+"""
+import json
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, update, func, literal_column
+
+from app.config import settings
+from app.db import async_session
+from app.models import Conversation, Document, Message
+from app.services.metrics import cache_lookup
+from app.services.vector_store import get_vector_store
+
+logger = logging.getLogger(__name__)
+
+# (kb_id, doc_id, chunk_index) -> (cached at, {url, title, chunk_text} or None if the chunk is gone)
+_cache: Dict[Tuple[str, str, int], Tuple[float, Optional[dict]]] = {}
+
+
+def source_ref(chunk: dict) -> dict:
+    return {"doc_id": chunk["doc_id"], "chunk_index": chunk["chunk_index"], "score": round(chunk["score"], 4)}
+
+
+def is_reference(source: dict) -> bool:
+    return "doc_id" in source and "chunk_text" not in source
+
+
+def _resolved(payload: dict) -> dict:
+    return {"url": payload.get("url", ""), "title": payload.get("title", ""), "chunk_text": payload["text"]}
+
+
+def _cache_put(key: Tuple[str, str, int], value: Optional[dict], now: float):
+    _cache.pop(key, None)
+    _cache[key] = (now, value)
+    while len(_cache) > settings.source_cache_size:
+        del _cache[next(iter(_cache))]
+
+
+async def resolve_sources(kb_id: str, refs: List[dict]) -> List[dict]:
+    """Each reference with its url, title and chunk_text, in order; those are None once the chunk is gone."""
+    now = time.monotonic()
+    values: List[Optional[dict]] = [None] * len(refs)
+    pending = []
+    for i, ref in enumerate(refs):
+        cached = _cache.get((kb_id, ref["doc_id"], ref["chunk_index"]))
+        hit = cached is not None and now - cached[0] < settings.source_cache_ttl
+        cache_lookup("sources", hit)
+        if hit:
+            values[i] = cached[1]
+        else:
+            pending.append(i)
+
+    if pending:
+        keys = sorted({(refs[i]["doc_id"], refs[i]["chunk_index"]) for i in pending})
+        payloads = await get_vector_store().get_chunks(kb_id, keys)
+        found = {(p["doc_id"], p.get("chunk_index")): _resolved(p) for p in payloads}
+        now = time.monotonic()
+        for i in pending:
+            key = (refs[i]["doc_id"], refs[i]["chunk_index"])
+            values[i] = found.get(key)
+            _cache_put((kb_id, *key), values[i], now)
+
+    missing = {"url": None, "title": None, "chunk_text": None}
+    return [
+        {"doc_id": ref["doc_id"], "chunk_index": ref["chunk_index"], "score": ref.get("score"), **(value or missing)}
+        for ref, value in zip(refs, values)
+    ]
+
+
+async def compact_message_sources(batch_size: int = 500, dry_run: bool = False) -> dict:
+    """Rewrite legacy ``{url, title, chunk_text}`` sources of stored messages into chunk references.
+
+    Entries are matched to a chunk by knowledge base, url and exact text; entries
+    whose document was deleted or re-crawled since keep their text.
+    """
+    stats = {"messages": 0, "updated": 0, "converted": 0, "kept": 0, "bytes_before": 0, "bytes_after": 0}
+    store = get_vector_store()
+    last_id = None
+    while True:
+        query = (
+            select(Message.id, Message.sources, Conversation.knowledge_base_id)
+            .join(Conversation, Conversation.id == Message.conversation_id)
+            .where(Message.role == "assistant", func.jsonb_path_exists(Message.sources, literal_column("'$[*].chunk_text'::jsonpath")))
+            .order_by(Message.id)
+            .limit(batch_size)
+        )
+        if last_id is not None:
+            query = query.where(Message.id > last_id)
+        async with async_session() as db:
+            rows = (await db.execute(query)).all()
+        if not rows:
+            return stats
+        last_id = rows[-1].id
+
+        # Documents and chunks of every url cited in this batch, per knowledge base
+        urls = defaultdict(set)
+        for row in rows:
+            for source in row.sources:
+                if not is_reference(source) and source.get("url"):
+                    urls[row.knowledge_base_id].add(source["url"])
+        chunk_refs: Dict[Tuple[UUID, str, str], dict] = {}
+        async with async_session() as db:
+            for kb_id, kb_urls in urls.items():
+                result = await db.execute(
+                    select(Document.id).where(Document.knowledge_base_id == kb_id, Document.url.in_(kb_urls))
+                )
+                doc_ids = [str(doc_id) for doc_id in result.scalars().all()]
+                for payload in await store.get_doc_chunks(str(kb_id), doc_ids) if doc_ids else []:
+                    chunk_refs[(kb_id, payload.get("url", ""), payload["text"])] = {
+                        "doc_id": payload["doc_id"], "chunk_index": payload.get("chunk_index"), "score": None,
+                    }
+
+        updates = []
+        for row in rows:
+            stats["messages"] += 1
+            compacted = []
+            for source in row.sources:
+                if is_reference(source):
+                    compacted.append(source)
+                    continue
+                ref = chunk_refs.get((row.knowledge_base_id, source.get("url", ""), source.get("chunk_text")))
+                stats["converted" if ref else "kept"] += 1
+                compacted.append(ref or source)
+            if compacted != row.sources:
+                updates.append({"message_id": row.id, "sources": compacted})
+                stats["bytes_before"] += len(json.dumps(row.sources, ensure_ascii=False).encode())
+                stats["bytes_after"] += len(json.dumps(compacted, ensure_ascii=False).encode())
+
+        if updates and not dry_run:
+            async with async_session() as db:
+                for item in updates:
+                    await db.execute(update(Message).where(Message.id == item["message_id"]).values(sources=item["sources"]))
+                await db.commit()
+        stats["updated"] += len(updates)
+        logger.info(f"Compacted sources of {stats['updated']} of {stats['messages']} messages so far")
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from app.db import async_session, try_advisory_lock
+from app.models import Document, KnowledgeBase
+from app.config import settings
+from app.services.retriever import delete_docs_chunks, delete_kb_vectors, list_vector_kbs, list_vector_doc_ids
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_LOCK = 0x72616763  # arbitrary pg advisory lock key
+
+
+class VectorGC:
+    """Background removal of vectors for deleted documents and knowledge bases.
+
+    Deletes are queued by the API and applied in batches: document deletes of one
+    knowledge base become a single filtered delete, knowledge base deletes drop the
+    whole collection (or the KB's partition of the shared one). A periodic
+    reconciliation purges vectors whose document or knowledge base no longer exists;
+    it first runs one interval after startup, in one worker at a time.
+    """
+
+    def __init__(self):
+        self._docs: Dict[str, Set[str]] = defaultdict(set)
+        self._kbs: Dict[str, str] = {}  # kb_id -> storage layout
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker and apply whatever is still queued."""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.collect()
+
+    def delete_document(self, kb_id: str, doc_id: str):
+        self._docs[kb_id].add(doc_id)
+        self._maybe_wake()
+
+    def delete_knowledge_base(self, kb_id: str, layout: str):
+        self._kbs[kb_id] = layout
+        self._docs.pop(kb_id, None)
+        self._maybe_wake()
+
+    def _maybe_wake(self):
+        if sum(len(d) for d in self._docs.values()) + len(self._kbs) >= settings.vector_gc_batch_size:
+            self._wakeup.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        interval = settings.vector_gc_reconcile_interval
+        next_reconcile = loop.time() + interval if interval > 0 else None
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.vector_gc_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.collect()
+                if next_reconcile is not None and loop.time() >= next_reconcile and not self._stopping:
+                    next_reconcile = loop.time() + interval
+                    await self._reconcile_exclusive()
+            except Exception:
+                logger.exception("Vector GC pass failed, will retry")
+
+    async def collect(self):
+        """Apply queued deletes; failed batches stay queued for the next pass."""
+        async with self._lock:
+            kbs, self._kbs = self._kbs, {}
+            docs, self._docs = self._docs, defaultdict(set)
+
+            failed_kbs: List[Tuple[str, str]] = []
+            for kb_id, layout in kbs.items():
+                try:
+                    await delete_kb_vectors(kb_id, layout)
+                except Exception:
+                    logger.exception(f"Failed to drop vectors of knowledge base {kb_id}")
+                    failed_kbs.append((kb_id, layout))
+
+            failed_docs: Dict[str, Set[str]] = {}
+            for kb_id, doc_ids in docs.items():
+                try:
+                    await delete_docs_chunks(kb_id, sorted(doc_ids))
+                except Exception:
+                    logger.exception(f"Failed to delete vectors of {len(doc_ids)} documents in {kb_id}")
+                    failed_docs[kb_id] = doc_ids
+
+            for kb_id, layout in failed_kbs:
+                self._kbs.setdefault(kb_id, layout)
+            for kb_id, doc_ids in failed_docs.items():
+                if kb_id not in self._kbs:
+                    self._docs[kb_id] |= doc_ids
+
+    async def _reconcile_exclusive(self):
+        """Reconcile unless another worker is already doing it."""
+        async with try_advisory_lock(RECONCILE_LOCK) as conn:
+            if conn is None:
+                logger.debug("Vector reconciliation is running in another worker, skipping")
+                return
+            await self.reconcile()
+
+    async def reconcile(self) -> dict:
+        """Queue deletes for vectors whose document or knowledge base is gone from Postgres."""
+        vector_kbs = await list_vector_kbs()
+        async with async_session() as db:
+            kb_ids = {str(i) for i in (await db.execute(select(KnowledgeBase.id))).scalars().all()}
+
+        orphan_kbs = 0
+        orphan_docs = 0
+        for kb_id, layout in vector_kbs.items():
+            if kb_id not in kb_ids:
+                self.delete_knowledge_base(kb_id, layout)
+                orphan_kbs += 1
+                continue
+
+            vector_doc_ids = await list_vector_doc_ids(kb_id, layout)
+            async with async_session() as db:
+                result = await db.execute(select(Document.id).where(Document.knowledge_base_id == kb_id))
+                doc_ids = {str(i) for i in result.scalars().all()}
+            for doc_id in vector_doc_ids - doc_ids:
+                self.delete_document(kb_id, doc_id)
+                orphan_docs += 1
+
+        if orphan_kbs or orphan_docs:
+            logger.info(f"Vector reconciliation queued {orphan_kbs} knowledge bases and {orphan_docs} documents")
+        return {"knowledge_bases": orphan_kbs, "documents": orphan_docs}
+
+
+vector_gc = VectorGC()
@@ -0,0 +1,71 @@
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from app.config import settings
+
+
+class VectorStore(ABC):
+    """Chunk vectors and payloads, partitioned by knowledge base.
+
+    A point is ``{"id": str, "vector": List[float], "payload": dict}``; the payload
+    carries text, title, url, doc_id and chunk_index. Search hits are
+    ``{"payload": dict, "score": float}``, best first.
+    """
+
+    name: str
+
+    @abstractmethod
+    async def upsert(self, kb_id: str, points: List[Dict]):
+        ...
+
+    @abstractmethod
+    async def search(self, kb_id: str, vector: List[float], top_k: int) -> List[Dict]:
+        ...
+
+    async def search_batch(self, kb_id: str, vectors: List[List[float]], top_k: int) -> List[List[Dict]]:
+        """One hit list per query vector; backends override this with a single round trip."""
+        return [await self.search(kb_id, vector, top_k) for vector in vectors]
+
+    @abstractmethod
+    async def delete_docs(self, kb_id: str, doc_ids: List[str]):
+        ...
+
+    @abstractmethod
+    async def delete_kb(self, kb_id: str, layout: Optional[str] = None):
+        """Remove every vector of a knowledge base. ``layout`` is the storage layout it used, if known."""
+
+    @abstractmethod
+    async def list_kbs(self) -> Dict[str, str]:
+        """KB ids that have vectors, mapped to the layout holding them."""
+
+    @abstractmethod
+    async def list_doc_ids(self, kb_id: str, layout: Optional[str] = None) -> Set[str]:
+        """Distinct doc_ids that have vectors in a knowledge base."""
+
+    @abstractmethod
+    async def get_doc_chunks(self, kb_id: str, doc_ids: List[str]) -> List[Dict]:
+        """Payloads of every live chunk of the given documents, without vectors."""
+
+    @abstractmethod
+    async def get_chunks(self, kb_id: str, keys: List[Tuple[str, int]]) -> List[Dict]:
+        """Payloads of the live chunks with the given (doc_id, chunk_index) keys, without vectors."""
+
+    @abstractmethod
+    def scroll(self, kb_id: str, batch_size: int = 512) -> AsyncIterator[List[Dict]]:
+        """Every live point of a knowledge base, vectors included, in batches."""
+
+
+_store: Optional[VectorStore] = None
+
+
+def get_vector_store() -> VectorStore:
+    """The configured backend (``settings.vector_store``), created once per process."""
+    global _store
+    if _store is None:
+        if settings.vector_store == "embedded":
+            from app.services.embedded_store import EmbeddedStore
+            _store = EmbeddedStore(settings.embedded_store_path)
+        else:
+            from app.services.qdrant_store import QdrantStore
+            _store = QdrantStore()
+    return _store
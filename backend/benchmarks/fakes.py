@@ -0,0 +1,196 @@
+"""Local stand-ins for the services the RAG pipeline talks to.
+
+- ``fake_embeddings``: deterministic hashed bag-of-words vectors, no model download
+- ``fake_llm_app``: OpenAI-compatible ``/v1/chat/completions`` streaming server
+  with tunable time-to-first-token and token rate
+- ``synthetic_site_app``: HTML pages generated from a fixed seed
+- ``use_stand_ins``: points the app's embedding, vector store and LLM lookups at them
+  and keeps the crawler off crawl4ai
+- ``BackgroundLoop``: an event loop on its own thread, to keep servers off the client's loop
+"""
+import asyncio
+import hashlib
+import json
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager, AsyncExitStack
+from typing import List
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, StreamingResponse
+
+EMBEDDING_DIM = 256
+
+WORDS = (
+    "account password refund order shipping invoice delivery warranty return payment card "
+    "subscription plan upgrade cancel login email address phone support ticket agent store "
+    "product price discount coupon tracking package damaged replace exchange policy days "
+    "business holiday hours contact chat response time security privacy data export delete"
+).split()
+
+
+def _token_vector(token: str) -> np.ndarray:
+    digest = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    rng = np.random.default_rng(int.from_bytes(digest, "little"))
+    return rng.standard_normal(EMBEDDING_DIM).astype(np.float32)
+
+
+async def fake_embeddings(texts: List[str]) -> List[List[float]]:
+    """Sum of per-token random vectors, so overlapping texts land close together."""
+    result = []
+    for text in texts:
+        vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+        for token in text.lower().split():
+            vector += _token_vector(token)
+        norm = np.linalg.norm(vector)
+        result.append((vector / norm if norm else vector).tolist())
+    return result
+
+
+def synthetic_page(index: int, paragraphs: int = 12) -> tuple:
+    rng = random.Random(index)
+    title = f"Help article {index}: {' '.join(rng.sample(WORDS, 3))}"
+    body = [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 90))) + "."
+        for _ in range(paragraphs)
+    ]
+    return title, body
+
+
+def synthetic_site_app(paragraphs: int = 12) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/page/{index}", response_class=HTMLResponse)
+    async def page(index: int):
+        title, body = synthetic_page(index, paragraphs)
+        paragraphs_html = "".join(f"<p>{p}</p>" for p in body)
+        return (
+            f"<html><head><title>{title}</title><style>p {{}}</style></head>"
+            f"<body><nav>Home | Help</nav><h1>{title}</h1>{paragraphs_html}<footer>(c) bench</footer></body></html>"
+        )
+
+    return app
+
+
+def fake_llm_app(ttft: float = 0.2, tokens_per_sec: float = 50.0, answer_tokens: int = 60) -> FastAPI:
+    """OpenAI-compatible chat completions; only ``stream=True`` is supported."""
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "fake")
+        created = int(time.time())
+
+        async def stream():
+            await asyncio.sleep(ttft)
+            for i in range(answer_tokens):
+                chunk = {
+                    "id": "chatcmpl-bench",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": f"tok{i} "}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                if tokens_per_sec > 0:
+                    await asyncio.sleep(1 / tokens_per_sec)
+            done = {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(done)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@asynccontextmanager
+async def serve(app, port: int = None, **config):
+    """Run an ASGI app with uvicorn on this event loop, yielding its base URL."""
+    port = port or free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", **config))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        await task
+
+
+class BackgroundLoop:
+    """Event loop running on a daemon thread; coroutines are submitted from other threads."""
+
+    def __init__(self, name: str):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self._stack = AsyncExitStack()
+        self._thread.start()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def run(self, coro):
+        """Await a coroutine running on this loop from another loop."""
+        return await asyncio.wrap_future(self.submit(coro))
+
+    async def serve(self, app, **config) -> str:
+        """Start ``app`` on this loop; it stays up until ``close``."""
+        return await self.run(self._stack.enter_async_context(serve(app, **config)))
+
+    async def close(self):
+        await self.run(self._stack.aclose())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+
+def use_stand_ins(llm_base_url: str, store: str = "qdrant"):
+    """Patch the app to use the fake embedder, a local vector store and the fake LLM server.
+
+    crawl4ai is hidden so ``crawl_url`` always takes its aiohttp/BeautifulSoup path.
+    """
+    from app.config import settings
+    from app.services import crawler, retriever, llm, vector_store
+
+    # A None entry makes ``import crawl4ai`` raise ImportError
+    sys.modules["crawl4ai"] = None
+
+    crawler.get_embeddings = fake_embeddings
+    retriever.get_embeddings = fake_embeddings
+
+    if store == "embedded":
+        from app.services.embedded_store import EmbeddedStore
+        vector_store._store = EmbeddedStore(tempfile.mkdtemp(prefix="bench-vectors-"))
+    else:
+        from qdrant_client import QdrantClient
+        from app.services import qdrant_store
+        client = QdrantClient(":memory:")
+        qdrant_store._get_client = lambda: client
+        vector_store._store = qdrant_store.QdrantStore()
+
+    async def llm_configs():
+        return [{"base_url": f"{llm_base_url}/v1", "api_key": "bench", "model_name": "fake", "is_default": True}]
+
+    llm._get_llm_configs = llm_configs
+    settings.llm_hedge_enabled = False
@@ -0,0 +1,269 @@
+"""Concurrent SSE load test for /api/chat/ask.
+
+The real app runs with uvicorn on its own event loop thread (the fake LLM on
+another), while virtual users on the main loop hold multi-turn conversations
+with think-times between turns. Concurrency is ramped in steps; each step
+reports client-side TTFT and inter-token latency plus server-side event-loop
+lag and DB pool checkout wait. Postgres must be reachable at DATABASE_URL.
+
+    python -m benchmarks.load --concurrency 1,10,25,50,100 --step-duration 30
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.fakes import BackgroundLoop, WORDS, fake_llm_app, synthetic_site_app, use_stand_ins
+from benchmarks.run import bench_ingest, cleanup, percentile
+
+
+class ServerProbe:
+    """Samples event-loop lag and DB pool wait inside the server's loop."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.loop_lag: List[float] = []
+        self.pool_wait: List[float] = []
+        self._task = None
+
+    async def start(self):
+        from app.db import engine
+
+        pool = engine.sync_engine.pool
+        do_get = pool._do_get
+
+        def timed_do_get():
+            start = time.perf_counter()
+            try:
+                return do_get()
+            finally:
+                self.pool_wait.append((time.perf_counter() - start) * 1000)
+
+        pool._do_get = timed_do_get
+        self._task = asyncio.create_task(self._sample_lag())
+
+    async def _sample_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.loop_lag.append(max(0.0, loop.time() - start - self.interval) * 1000)
+
+    async def drain(self) -> Dict[str, List[float]]:
+        lag, self.loop_lag = self.loop_lag, []
+        wait, self.pool_wait = self.pool_wait, []
+        return {"loop_lag": lag, "pool_wait": wait}
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+
+
+class StepStats:
+    def __init__(self):
+        self.ttft: List[float] = []
+        self.itl: List[float] = []
+        self.turns = 0
+        self.tokens = 0
+        self.errors = 0
+        self.queued = 0
+
+
+def conversation_script(rng: random.Random, turns: int) -> List[str]:
+    topic = rng.sample(WORDS, 3)
+    script = [f"how do I {topic[0]} my {topic[1]} {topic[2]}"]
+    for _ in range(turns - 1):
+        script.append(f"and what about {' '.join(rng.sample(WORDS, 2))} for that {topic[1]}")
+    return script
+
+
+async def ask(client: httpx.AsyncClient, kb_id: str, question: str, conversation_id, stats: StepStats):
+    """One turn; returns the conversation id reported by the server."""
+    payload = {"question": question, "knowledge_base_id": kb_id}
+    if conversation_id:
+        payload["conversation_id"] = conversation_id
+    start = time.perf_counter()
+    last = None
+    async with client.stream("POST", "/api/chat/ask", json=payload) as response:
+        if response.status_code != 200:
+            stats.errors += 1
+            return conversation_id
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[6:])
+            now = time.perf_counter()
+            kind = event.get("type")
+            if kind == "meta":
+                conversation_id = event["conversation_id"]
+            elif kind == "queue":
+                stats.queued += 1
+            elif kind == "token":
+                if last is None:
+                    stats.ttft.append((now - start) * 1000)
+                else:
+                    stats.itl.append((now - last) * 1000)
+                last = now
+                stats.tokens += 1
+            elif kind == "error":
+                stats.errors += 1
+                return conversation_id
+    stats.turns += 1
+    return conversation_id
+
+
+async def virtual_user(client, kb_id: str, seed: int, args, deadline: float, stats: StepStats):
+    rng = random.Random(seed)
+    # Stagger starts so a step doesn't open with a thundering herd
+    await asyncio.sleep(rng.uniform(0, args.think_time))
+    while time.monotonic() < deadline:
+        conversation_id = None
+        for question in conversation_script(rng, args.turns):
+            if time.monotonic() >= deadline:
+                return
+            try:
+                conversation_id = await ask(client, kb_id, question, conversation_id, stats)
+            except httpx.HTTPError:
+                stats.errors += 1
+            if args.think_time > 0:
+                await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+
+def summarize(concurrency: int, elapsed: float, stats: StepStats, server: Dict[str, List[float]]) -> Dict:
+    def pct(values):
+        return {
+            "p50": round(percentile(values, 0.5), 2),
+            "p95": round(percentile(values, 0.95), 2),
+            "p99": round(percentile(values, 0.99), 2),
+            "max": round(max(values), 2) if values else 0.0,
+        }
+
+    return {
+        "concurrency": concurrency,
+        "turns": stats.turns,
+        "errors": stats.errors,
+        "queued_turns": stats.queued,
+        "turns_per_sec": round(stats.turns / elapsed, 2),
+        "tokens_per_sec": round(stats.tokens / elapsed, 1),
+        "ttft_ms": pct(stats.ttft),
+        "inter_token_ms": pct(stats.itl),
+        "loop_lag_ms": pct(server["loop_lag"]),
+        "pool_wait_ms": pct(server["pool_wait"]),
+    }
+
+
+def print_step(row: Dict):
+    print(
+        f"c={row['concurrency']:<4} turns={row['turns']:<5} err={row['errors']:<4} "
+        f"ttft p50/p99={row['ttft_ms']['p50']:.0f}/{row['ttft_ms']['p99']:.0f}ms "
+        f"itl p50/p99={row['inter_token_ms']['p50']:.1f}/{row['inter_token_ms']['p99']:.1f}ms "
+        f"lag p99/max={row['loop_lag_ms']['p99']:.1f}/{row['loop_lag_ms']['max']:.1f}ms "
+        f"pool wait p99={row['pool_wait_ms']['p99']:.1f}ms",
+        file=sys.stderr,
+    )
+
+
+async def run(args) -> Dict:
+    from app.config import settings
+
+    llm_loop = BackgroundLoop("fake-llm")
+    app_loop = BackgroundLoop("app")
+    try:
+        llm_url = await llm_loop.serve(fake_llm_app(
+            ttft=args.llm_ttft, tokens_per_sec=args.llm_tokens_per_sec, answer_tokens=args.answer_tokens,
+        ))
+        site_url = await llm_loop.serve(synthetic_site_app())
+        use_stand_ins(llm_url, store=args.store)
+        if args.llm_max_concurrency:
+            settings.llm_max_concurrency = args.llm_max_concurrency
+            settings.llm_max_queue = max(settings.llm_max_queue, max(args.concurrency))
+
+        from app.main import app
+        from app.db import async_session
+        from app.models import KnowledgeBase
+
+        api_url = await app_loop.serve(app, backlog=4096)
+
+        async def create_kb():
+            async with async_session() as db:
+                kb = KnowledgeBase(name=f"loadtest-{int(time.time())}", description="benchmarks.load")
+                db.add(kb)
+                await db.commit()
+                return kb.id
+
+        kb_id = await app_loop.run(create_kb())
+        probe = ServerProbe()
+        steps = []
+        try:
+            await app_loop.run(bench_ingest(kb_id, site_url, args.pages))
+            await app_loop.run(probe.start())
+
+            limits = httpx.Limits(max_connections=None, max_keepalive_connections=max(args.concurrency))
+            async with httpx.AsyncClient(base_url=api_url, timeout=args.request_timeout, limits=limits) as client:
+                for concurrency in args.concurrency:
+                    await app_loop.run(probe.drain())
+                    stats = StepStats()
+                    start = time.monotonic()
+                    deadline = start + args.step_duration
+                    await asyncio.gather(*(
+                        virtual_user(client, str(kb_id), concurrency * 1000 + i, args, deadline, stats)
+                        for i in range(concurrency)
+                    ))
+                    elapsed = time.monotonic() - start
+                    row = summarize(concurrency, elapsed, stats, await app_loop.run(probe.drain()))
+                    print_step(row)
+                    steps.append(row)
+        finally:
+            await app_loop.run(probe.stop())
+            await app_loop.run(cleanup(kb_id))
+    finally:
+        await app_loop.close()
+        await llm_loop.close()
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "store": args.store,
+            "step_duration": args.step_duration,
+            "turns": args.turns,
+            "think_time": args.think_time,
+            "llm_ttft": args.llm_ttft,
+            "llm_tokens_per_sec": args.llm_tokens_per_sec,
+            "llm_max_concurrency": settings.llm_max_concurrency,
+        },
+        "steps": steps,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load")
+    parser.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",")], default=[1, 5, 10, 25, 50],
+                        help="comma separated concurrency steps")
+    parser.add_argument("--step-duration", type=float, default=20.0, help="seconds per concurrency step")
+    parser.add_argument("--turns", type=int, default=3, help="questions per conversation")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean seconds between turns (exponential)")
+    parser.add_argument("--pages", type=int, default=20, help="synthetic pages ingested before the run")
+    parser.add_argument("--store", choices=["qdrant", "embedded"], default="qdrant")
+    parser.add_argument("--llm-ttft", type=float, default=0.3)
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--answer-tokens", type=int, default=80)
+    parser.add_argument("--llm-max-concurrency", type=int, help="override LLM_MAX_CONCURRENCY for the run")
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Offline ingestion and retrieval benchmarks.
+
+Runs the real pipeline (process_urls, retrieve_relevant_chunks, /api/chat/ask)
+against local stand-ins from ``benchmarks.fakes``. Only Postgres has to be
+reachable at DATABASE_URL; a throwaway knowledge base is created and removed.
+Pages are fetched with the aiohttp/BeautifulSoup crawler even when crawl4ai is
+installed, so ingestion numbers don't depend on a headless browser.
+
+A run in which any page fails to ingest or any ask produces no token exits
+non-zero regardless of the baseline.
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --output bench.json --baseline benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+from sqlalchemy import delete, select
+
+from benchmarks.fakes import serve, synthetic_site_app, fake_llm_app, use_stand_ins, synthetic_page
+
+# metric -> True if higher is better; FAILURE_COUNTS are checked on their own and must be 0
+METRICS = {
+    "ingest_pages_per_sec": True,
+    "retrieval_p50_ms": False,
+    "retrieval_p99_ms": False,
+    "ask_ttft_p50_ms": False,
+    "ask_ttft_p99_ms": False,
+}
+
+# failure count metric -> (argument it is out of, what it counts)
+FAILURE_COUNTS = {
+    "ingest_failed_pages": ("pages", "pages were not ingested"),
+    "ask_failed": ("asks", "asks produced no token"),
+}
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+async def bench_ingest(kb_id, site_url: str, pages: int) -> Dict:
+    from app.db import async_session
+    from app.models import Document
+    from app.services.crawler import process_urls
+
+    async with async_session() as db:
+        docs = [Document(knowledge_base_id=kb_id, url=f"{site_url}/page/{i}", status="pending") for i in range(pages)]
+        db.add_all(docs)
+        await db.commit()
+        doc_ids = [doc.id for doc in docs]
+
+    start = time.perf_counter()
+    await process_urls(kb_id, doc_ids)
+    elapsed = time.perf_counter() - start
+
+    async with async_session() as db:
+        result = await db.execute(select(Document.status).where(Document.knowledge_base_id == kb_id))
+        completed = sum(1 for status in result.scalars().all() if status == "completed")
+    return {"ingest_pages_per_sec": completed / elapsed, "ingest_failed_pages": pages - completed}
+
+
+async def bench_retrieval(kb_id, pages: int, queries: int) -> Dict:
+    from app.services.retriever import retrieve_relevant_chunks
+
+    rng = random.Random(42)
+    timings = []
+    for _ in range(queries):
+        _, body = synthetic_page(rng.randrange(pages))
+        query = " ".join(rng.choice(body).split()[:12])
+        start = time.perf_counter()
+        await retrieve_relevant_chunks(str(kb_id), query)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {"retrieval_p50_ms": percentile(timings, 0.5), "retrieval_p99_ms": percentile(timings, 0.99)}
+
+
+async def bench_ask(kb_id, api_url: str, asks: int) -> Dict:
+    timings = []
+    async with httpx.AsyncClient(base_url=api_url, timeout=60) as client:
+        for i in range(asks):
+            start = time.perf_counter()
+            payload = {"question": f"how do I get a refund for order {i}", "knowledge_base_id": str(kb_id)}
+            async with client.stream("POST", "/api/chat/ask", json=payload) as response:
+                async for line in response.aiter_lines():
+                    if line.startswith("data: ") and json.loads(line[6:]).get("type") == "token":
+                        timings.append((time.perf_counter() - start) * 1000)
+                        break
+    # An ask that errors or streams no token has no TTFT; count it instead of leaving it out
+    return {
+        "ask_ttft_p50_ms": percentile(timings, 0.5),
+        "ask_ttft_p99_ms": percentile(timings, 0.99),
+        "ask_failed": asks - len(timings),
+    }
+
+
+async def cleanup(kb_id):
+    from app.db import async_session
+    from app.models import Conversation, Document, KnowledgeBase, Message
+    from app.services.message_sink import message_sink
+
+    await message_sink.flush()
+    async with async_session() as db:
+        conv_ids = select(Conversation.id).where(Conversation.knowledge_base_id == kb_id)
+        await db.execute(delete(Message).where(Message.conversation_id.in_(conv_ids)))
+        await db.execute(delete(Conversation).where(Conversation.knowledge_base_id == kb_id))
+        await db.execute(delete(Document).where(Document.knowledge_base_id == kb_id))
+        await db.execute(delete(KnowledgeBase).where(KnowledgeBase.id == kb_id))
+        await db.commit()
+
+
+async def run(args) -> Dict:
+    async with serve(fake_llm_app(ttft=args.llm_ttft, tokens_per_sec=args.llm_tokens_per_sec)) as llm_url, \
+            serve(synthetic_site_app()) as site_url:
+        use_stand_ins(llm_url, store=args.store)
+
+        from app.main import app
+        from app.db import async_session
+        from app.models import KnowledgeBase
+
+        async with serve(app) as api_url:
+            async with async_session() as db:
+                kb = KnowledgeBase(name=f"benchmark-{int(time.time())}", description="benchmarks.run")
+                db.add(kb)
+                await db.commit()
+                kb_id = kb.id
+
+            try:
+                metrics = {}
+                metrics.update(await bench_ingest(kb_id, site_url, args.pages))
+                metrics.update(await bench_retrieval(kb_id, args.pages, args.queries))
+                metrics.update(await bench_ask(kb_id, api_url, args.asks))
+            finally:
+                await cleanup(kb_id)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "store": args.store,
+            "pages": args.pages,
+            "queries": args.queries,
+            "asks": args.asks,
+        },
+        "metrics": metrics,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Metrics that got worse than the baseline by more than ``threshold`` (relative)."""
+    regressions = []
+    for name, higher_is_better in METRICS.items():
+        old = baseline["metrics"].get(name)
+        new = current["metrics"].get(name)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (change < -threshold) if higher_is_better else (change > threshold):
+            regressions.append(f"{name}: {old:.2f} -> {new:.2f} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--asks", type=int, default=20)
+    parser.add_argument("--store", choices=["qdrant", "embedded"], default="qdrant")
+    parser.add_argument("--llm-ttft", type=float, default=0.05)
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=200.0)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against this results JSON")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change that counts as a regression")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+    failed = False
+    for name, (total, what) in FAILURE_COUNTS.items():
+        count = result["metrics"].get(name, 0)
+        if count:
+            failed = True
+            print(f"FAILED {count} of {getattr(args, total)} {what}", file=sys.stderr)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+    if failed or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services.embedded_store import _KnowledgeBaseIndex
+
+DIM = 8
+
+
+@pytest.fixture
+def kb(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "embedded_segment_rows", 16)
+    monkeypatch.setattr(settings, "embedded_compact_ratio", 0.3)
+    monkeypatch.setattr(settings, "embedded_ann_threshold", 10 ** 9)
+    return _KnowledgeBaseIndex(str(tmp_path / "kb"))
+
+
+def _points(doc_id: str, count: int, direction: int):
+    rng = np.random.default_rng(direction)
+    base = np.eye(DIM)[direction]
+    return [
+        {
+            "id": f"{doc_id}-{i}",
+            "vector": (base + 0.05 * rng.standard_normal(DIM)).tolist(),
+            "payload": {"doc_id": doc_id, "chunk_index": i, "text": f"{doc_id} {i}", "url": f"https://x/{doc_id}"},
+        }
+        for i in range(count)
+    ]
+
+
+def _segment_files(kb):
+    return sorted(name for name in os.listdir(kb.dir) if name.startswith("seg_"))
+
+
+def test_append_search_delete_compact(kb):
+    for n, doc_id in enumerate(["a", "b", "c"]):
+        kb.append(_points(doc_id, 20, n))
+    assert kb.total_rows == 60
+    assert len(kb.segments) == 4
+
+    hits = kb.search(np.eye(DIM)[1].tolist(), 5)
+    assert [h["payload"]["doc_id"] for h in hits] == ["b"] * 5
+    assert "id" not in hits[0]["payload"]
+
+    before = _segment_files(kb)
+    kb.delete_docs(["b"])  # a third of the rows, which triggers compaction
+    assert kb.total_rows == 40
+    assert not kb.deleted
+    assert kb.live_doc_ids() == {"a", "c"}
+    assert not set(_segment_files(kb)) & set(before)
+
+    hits = kb.search(np.eye(DIM)[1].tolist(), 5)
+    assert {h["payload"]["doc_id"] for h in hits} <= {"a", "c"}
+    assert len(kb.search(np.eye(DIM)[2].tolist(), 50)) == 40
+    assert sorted(p["chunk_index"] for p in kb.doc_chunks(["c"])) == list(range(20))
+
+    reopened = _KnowledgeBaseIndex(kb.dir)
+    assert reopened.total_rows == 40
+    assert reopened.search(np.eye(DIM)[0].tolist(), 1)[0]["payload"]["doc_id"] == "a"
+
+
+def test_tombstones_hide_rows_before_compaction(kb):
+    kb.append(_points("a", 20, 0))
+    kb.append(_points("b", 5, 1))
+    kb.delete_docs(["b"])
+    assert kb.deleted == {"b"}
+    assert {h["payload"]["doc_id"] for h in kb.search(np.eye(DIM)[1].tolist(), 25)} == {"a"}
+    assert kb.doc_chunks(["b"]) == []
+
+
+def test_search_pinned_before_compaction_keeps_its_segments(kb):
+    for n, doc_id in enumerate(["a", "b", "c"]):
+        kb.append(_points(doc_id, 20, n))
+    old_files = _segment_files(kb)
+
+    view, ivf = kb._pin()
+    kb.delete_docs(["b"])
+    assert set(old_files) <= set(_segment_files(kb))
+
+    hits = kb._search(view, ivf, np.eye(DIM)[0].tolist(), 3)
+    assert [h["payload"]["doc_id"] for h in hits] == ["a"] * 3
+
+    kb._unpin(view)
+    assert not set(old_files) & set(_segment_files(kb))
+
+
+def test_searches_during_compactions(kb):
+    kb.append(_points("keep", 40, 0))
+    errors = []
+    stop = threading.Event()
+
+    def search():
+        while not stop.is_set():
+            try:
+                hits = kb.search(np.eye(DIM)[0].tolist(), 3)
+                assert [h["payload"]["doc_id"] for h in hits] == ["keep"] * 3
+            except Exception as e:
+                errors.append(e)
+                return
+
+    threads = [threading.Thread(target=search) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    try:
+        for n in range(30):
+            kb.append(_points(f"tmp{n}", 30, 1 + n % (DIM - 1)))
+            kb.delete_docs([f"tmp{n}"])
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    assert not errors
+    assert kb.total_rows == 40
+    assert len(_segment_files(kb)) == 4 * 3
+
+
+def test_chunks_by_key(kb):
+    kb.append(_points("a", 20, 0))
+    kb.append(_points("b", 20, 1))
+    kb.append(_points("a2", 3, 2))
+    kb.delete_docs(["a2"])
+
+    found = kb.chunks([("a", 3), ("b", 17), ("b", 0), ("a", 99), ("a2", 1), ("gone", 0)])
+    assert sorted((p["doc_id"], p["chunk_index"]) for p in found) == [("a", 3), ("b", 0), ("b", 17)]
+    assert all("id" not in p for p in found)
+
+
+def test_chunks_out_of_append_order(kb):
+    points = _points("a", 10, 0)
+    kb.append(points[5:])
+    kb.append(points[:5])
+    found = kb.chunks([("a", 0), ("a", 7)])
+    assert sorted(p["chunk_index"] for p in found) == [0, 7]
+
+
+def test_reopen_after_torn_append(kb):
+    kb.append(_points("a", 10, 0))
+    base = kb.segments[-1].base
+    # Crash after the payloads and vectors of a second append, before its doc hashes and offsets
+    extra = _points("b", 3, 1)
+    with open(base + ".pay", "ab") as f:
+        f.write(b'{"doc_id": "b", "partial": ')
+    with open(base + ".vec", "ab") as f:
+        f.write(np.zeros((3, DIM), dtype=kb.dtype).tobytes()[:-5])
+
+    reopened = _KnowledgeBaseIndex(kb.dir)
+    assert reopened.total_rows == 10
+    reopened.append(extra)
+    hits = reopened.search(np.eye(DIM)[1].tolist(), 3)
+    assert [h["payload"]["doc_id"] for h in hits] == ["b"] * 3
+    assert len(reopened.search(np.eye(DIM)[0].tolist(), 20)) == 13
+
+
+def test_reopen_drops_segments_left_by_crashed_compaction(kb):
+    kb.append(_points("a", 10, 0))
+    # A compaction that wrote a segment and died before the manifest listed it
+    orphan = kb._new_segment()
+    orphan.append(np.zeros((2, DIM), dtype=kb.dtype), np.zeros(2, dtype=np.uint64), [b"{}", b"{}"])
+
+    reopened = _KnowledgeBaseIndex(kb.dir)
+    assert not os.path.exists(orphan.base + ".vec")
+    reopened.append(_points("b", 20, 1))
+    assert reopened.total_rows == 30
+    assert {h["payload"]["doc_id"] for h in reopened.search(np.eye(DIM)[1].tolist(), 30)} == {"a", "b"}
@@ -9,7 +9,7 @@ import {
   DatabaseOutlined,
 } from '@ant-design/icons'
 import { Select, message, Modal, Tooltip } from 'antd'
-import { knowledgeApi, chatApi } from '@/services/api'
+import { knowledgeApi, chatApi, nextCursor } from '@/services/api'
 import { useAppStore } from '@/stores'
 import type { KnowledgeBase, Conversation, Message } from '@/stores'
 import dayjs from 'dayjs'
@@ -29,6 +29,7 @@ export default function Chat() {
 
   const [knowledgeBases, setKnowledgeBases] = useState<KnowledgeBase[]>([])
   const [conversations, setConversations] = useState<Conversation[]>([])
+  const [convCursor, setConvCursor] = useState<string | null>(null)
   const [inputValue, setInputValue] = useState('')
   const [isStreaming, setIsStreaming] = useState(false)
   const [expandedSources, setExpandedSources] = useState<string | null>(null)
@@ -46,23 +47,43 @@ export default function Chat() {
     })
   }, [])
 
+  const refreshConversations = (kbId: string) => {
+    chatApi.listConversations(kbId).then((res) => {
+      setConversations(res.data)
+      setConvCursor(nextCursor(res))
+    })
+  }
+
+  const loadMoreConversations = async () => {
+    if (!selectedKbId || !convCursor) return
+    const res = await chatApi.listConversations(selectedKbId, convCursor)
+    setConversations((prev) => [...prev, ...res.data])
+    setConvCursor(nextCursor(res))
+  }
+
   // Fetch conversations when KB changes
   useEffect(() => {
     if (selectedKbId) {
-      chatApi.listConversations(selectedKbId).then((res) => {
-        setConversations(res.data)
-      })
+      refreshConversations(selectedKbId)
       setCurrentConversationId(null)
       setMessages([])
     }
   }, [selectedKbId])
 
-  // Fetch messages when conversation changes
+  // Fetch messages when conversation changes, following the pages to the end
   useEffect(() => {
     if (currentConversationId) {
-      chatApi.getMessages(currentConversationId).then((res) => {
-        setMessages(res.data)
-      })
+      const loadMessages = async () => {
+        let all: Message[] = []
+        let cursor: string | undefined
+        do {
+          const res = await chatApi.getMessages(currentConversationId, cursor)
+          all = [...all, ...res.data]
+          cursor = nextCursor(res) ?? undefined
+        } while (cursor)
+        setMessages(all)
+      }
+      loadMessages()
     }
   }, [currentConversationId])
 
@@ -95,6 +116,43 @@ export default function Chat() {
     })
   }
 
+  const isUnresolved = (source: Message['sources'][number]) =>
+    !!source.doc_id && source.chunk_text === undefined
+
+  const handleToggleSources = async (msg: Message) => {
+    if (expandedSources === msg.id) {
+      setExpandedSources(null)
+      return
+    }
+    setExpandedSources(msg.id)
+    const refs = msg.sources.filter(isUnresolved)
+    if (!selectedKbId || refs.length === 0) return
+
+    try {
+      const res = await chatApi.lookupSources(
+        selectedKbId,
+        refs.map((s) => ({ doc_id: s.doc_id!, chunk_index: s.chunk_index! }))
+      )
+      const resolved = [...res.data]
+      setMessages((prev) =>
+        prev.map((m) =>
+          m.id === msg.id
+            ? {
+                ...m,
+                sources: m.sources.map((s) => {
+                  if (!isUnresolved(s)) return s
+                  const { url, title, chunk_text } = resolved.shift() ?? {}
+                  return { ...s, url, title, chunk_text }
+                }),
+              }
+            : m
+        )
+      )
+    } catch {
+      message.error('引用来源加载失败')
+    }
+  }
+
   const handleSend = async () => {
     if (!inputValue.trim() || !selectedKbId || isStreaming) return
 
@@ -156,6 +214,10 @@ export default function Chat() {
                   if (!currentConversationId) {
                     setCurrentConversationId(newConvId)
                   }
+                } else if (data.type === 'queue') {
+                  updateLastMessage(`排队中，前面还有 ${data.position - 1} 个请求…`)
+                } else if (data.type === 'error') {
+                  message.error(data.message || '回答生成失败')
                 } else if (data.type === 'token') {
                   fullContent += data.content
                   updateLastMessage(fullContent)
@@ -183,9 +245,7 @@ export default function Chat() {
 
       // Refresh conversations
       if (selectedKbId) {
-        chatApi.listConversations(selectedKbId).then((res) => {
-          setConversations(res.data)
-        })
+        refreshConversations(selectedKbId)
       }
     } catch (error) {
       message.error('发送失败，请重试')
@@ -253,6 +313,11 @@ export default function Chat() {
               </div>
             ))
           )}
+          {convCursor && (
+            <button className="load-more-btn" onClick={loadMoreConversations}>
+              加载更多
+            </button>
+          )}
         </div>
       </aside>
 
@@ -294,9 +359,7 @@ export default function Chat() {
                     <div className="message-sources">
                       <button
                         className="sources-toggle"
-                        onClick={() =>
-                          setExpandedSources(expandedSources === msg.id ? null : msg.id)
-                        }
+                        onClick={() => handleToggleSources(msg)}
                       >
                         <LinkOutlined />
                         <span>{msg.sources.length} 个引用来源</span>
@@ -307,18 +370,24 @@ export default function Chat() {
                             <div key={i} className="source-item">
                               <div className="source-header">
                                 <span className="source-index">[{i + 1}]</span>
-                                <Tooltip title={source.url}>
-                                  <a
-                                    href={source.url}
-                                    target="_blank"
-                                    rel="noopener noreferrer"
-                                    className="source-title"
-                                  >
-                                    {source.title || source.url}
-                                  </a>
-                                </Tooltip>
+                                {source.url ? (
+                                  <Tooltip title={source.url}>
+                                    <a
+                                      href={source.url}
+                                      target="_blank"
+                                      rel="noopener noreferrer"
+                                      className="source-title"
+                                    >
+                                      {source.title || source.url}
+                                    </a>
+                                  </Tooltip>
+                                ) : (
+                                  <span className="source-title">
+                                    {isUnresolved(source) ? '加载中…' : '来源文档已删除'}
+                                  </span>
+                                )}
                               </div>
-                              <p className="source-text">{source.chunk_text}</p>
+                              {source.chunk_text && <p className="source-text">{source.chunk_text}</p>}
                             </div>
                           ))}
                         </div>
@@ -12,7 +12,7 @@ import {
   ReloadOutlined,
 } from '@ant-design/icons'
 import { Modal, Input, message, Tooltip } from 'antd'
-import { knowledgeApi } from '@/services/api'
+import { knowledgeApi, nextCursor } from '@/services/api'
 import type { KnowledgeBase, Document } from '@/stores'
 import dayjs from 'dayjs'
 import './KnowledgeDetail.css'
@@ -29,11 +29,13 @@ export default function KnowledgeDetail() {
   const navigate = useNavigate()
   const [kb, setKb] = useState<KnowledgeBase | null>(null)
   const [docs, setDocs] = useState<Document[]>([])
+  const [docsCursor, setDocsCursor] = useState<string | null>(null)
   const [loading, setLoading] = useState(true)
   const [modalOpen, setModalOpen] = useState(false)
   const [urlInput, setUrlInput] = useState('')
   const [adding, setAdding] = useState(false)
   const pollRef = useRef<NodeJS.Timeout | null>(null)
+  const loadedMoreRef = useRef(false)
 
   const fetchData = async () => {
     if (!id) return
@@ -43,7 +45,18 @@ export default function KnowledgeDetail() {
         knowledgeApi.listDocuments(id),
       ])
       setKb(kbRes.data)
-      setDocs(docsRes.data)
+      // Refresh the first page; older pages that were already loaded are kept
+      const firstPage: Document[] = docsRes.data
+      if (loadedMoreRef.current) {
+        const pageIds = new Set(firstPage.map((d) => d.id))
+        setDocs((prev) => [
+          ...firstPage,
+          ...prev.slice(firstPage.length).filter((d) => !pageIds.has(d.id)),
+        ])
+      } else {
+        setDocs(firstPage)
+        setDocsCursor(nextCursor(docsRes))
+      }
     } catch {
       message.error('加载失败')
     } finally {
@@ -51,6 +64,18 @@ export default function KnowledgeDetail() {
     }
   }
 
+  const loadMoreDocs = async () => {
+    if (!id || !docsCursor) return
+    try {
+      const res = await knowledgeApi.listDocuments(id, docsCursor)
+      loadedMoreRef.current = true
+      setDocs((prev) => [...prev, ...res.data])
+      setDocsCursor(nextCursor(res))
+    } catch {
+      message.error('加载失败')
+    }
+  }
+
   useEffect(() => {
     fetchData()
     return () => {
@@ -162,7 +187,10 @@ export default function KnowledgeDetail() {
 
       <div className="stats-bar">
         <div className="stat-item">
-          <span className="stat-value">{docs.length}</span>
+          <span className="stat-value">
+            {docs.length}
+            {docsCursor ? '+' : ''}
+          </span>
           <span className="stat-label">总文档</span>
         </div>
         <div className="stat-item">
@@ -248,6 +276,11 @@ export default function KnowledgeDetail() {
               )
             })}
           </div>
+          {docsCursor && (
+            <button className="load-more-btn" onClick={loadMoreDocs}>
+              加载更多
+            </button>
+          )}
         </div>
       )}
 
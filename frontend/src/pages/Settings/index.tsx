@@ -43,6 +43,7 @@ export default function Settings() {
     api_key: '',
     model_name: '',
     is_default: false,
+    runtime: null as string | null,
   })
 
   const fetchModels = async () => {
@@ -68,6 +69,7 @@ export default function Settings() {
       api_key: '',
       model_name: '',
       is_default: false,
+      runtime: null,
     })
   }
 
@@ -81,6 +83,7 @@ export default function Settings() {
         api_key: '',
         model_name: model.model_name,
         is_default: model.is_default,
+        runtime: model.runtime ?? null,
       })
     } else {
       setEditingModel(null)
@@ -111,6 +114,7 @@ export default function Settings() {
         base_url: formData.base_url,
         api_key: formData.api_key,
         model_name: formData.model_name,
+        runtime: formData.runtime,
       })
       if (res.data.ok) {
         message.success(res.data.message)
@@ -351,6 +355,22 @@ export default function Settings() {
             />
           </div>
 
+          {formData.type === 'embedding' && !formData.base_url && (
+            <div className="form-group">
+              <label>本地推理引擎</label>
+              <Select
+                value={formData.runtime ?? 'sentence-transformers'}
+                onChange={(value) =>
+                  setFormData({ ...formData, runtime: value === 'sentence-transformers' ? null : value })
+                }
+                options={[
+                  { value: 'sentence-transformers', label: 'sentence-transformers (float32)' },
+                  { value: 'onnx-int8', label: 'ONNX int8 量化（需先导出，速度更快）' },
+                ]}
+              />
+            </div>
+          )}
+
           <div className="form-group inline">
             <label>设为默认</label>
             <Switch
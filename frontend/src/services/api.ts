@@ -5,6 +5,10 @@ const api = axios.create({
   timeout: 30000,
 })
 
+// List endpoints are paginated: the next page's cursor comes in this header, absent on the last page
+export const nextCursor = (res: { headers: Record<string, any> }): string | null =>
+  res.headers['x-next-cursor'] ?? null
+
 // Knowledge Base
 export const knowledgeApi = {
   list: () => api.get('/knowledge/bases'),
@@ -12,7 +16,8 @@ export const knowledgeApi = {
   create: (data: { name: string; description: string }) =>
     api.post('/knowledge/bases', data),
   delete: (id: string) => api.delete(`/knowledge/bases/${id}`),
-  listDocuments: (kbId: string) => api.get(`/knowledge/bases/${kbId}/documents`),
+  listDocuments: (kbId: string, cursor?: string) =>
+    api.get(`/knowledge/bases/${kbId}/documents`, { params: { cursor } }),
   addDocuments: (kbId: string, urls: string[]) =>
     api.post(`/knowledge/bases/${kbId}/documents`, { urls }),
   deleteDocument: (kbId: string, docId: string) =>
@@ -21,9 +26,12 @@ export const knowledgeApi = {
 
 // Chat
 export const chatApi = {
-  listConversations: (kbId: string) =>
-    api.get('/chat/conversations', { params: { knowledge_base_id: kbId } }),
-  getMessages: (convId: string) => api.get(`/chat/conversations/${convId}/messages`),
+  listConversations: (kbId: string, cursor?: string) =>
+    api.get('/chat/conversations', { params: { knowledge_base_id: kbId, cursor } }),
+  getMessages: (convId: string, cursor?: string) =>
+    api.get(`/chat/conversations/${convId}/messages`, { params: { cursor } }),
+  lookupSources: (kbId: string, refs: { doc_id: string; chunk_index: number }[]) =>
+    api.post('/chat/sources', { knowledge_base_id: kbId, refs }),
   deleteConversation: (convId: string) => api.delete(`/chat/conversations/${convId}`),
 }
 
@@ -38,6 +46,7 @@ export const settingsApi = {
     api_key: string
     model_name: string
     is_default: boolean
+    runtime?: string | null
   }) => api.post('/settings/models', data),
   updateModel: (id: string, data: {
     type: string
@@ -46,6 +55,7 @@ export const settingsApi = {
     api_key: string
     model_name: string
     is_default: boolean
+    runtime?: string | null
   }) => api.put(`/settings/models/${id}`, data),
   deleteModel: (id: string) => api.delete(`/settings/models/${id}`),
   testModel: (data: {
@@ -53,6 +63,7 @@ export const settingsApi = {
     base_url: string
     api_key: string
     model_name: string
+    runtime?: string | null
   }) => api.post('/settings/models/test', data),
 }
 
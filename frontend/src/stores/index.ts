@@ -19,11 +19,22 @@ export interface Document {
   created_at: string
 }
 
+// Stored messages carry chunk references; url, title and chunk_text are resolved on demand
+// (null once the source document is deleted)
+export interface Source {
+  doc_id?: string | null
+  chunk_index?: number | null
+  score?: number | null
+  url?: string | null
+  title?: string | null
+  chunk_text?: string | null
+}
+
 export interface Message {
   id: string
   role: 'user' | 'assistant'
   content: string
-  sources: { url: string; title: string; chunk_text: string }[]
+  sources: Source[]
   created_at: string
 }
 
@@ -42,6 +53,7 @@ export interface ModelConfig {
   base_url: string
   model_name: string
   is_default: boolean
+  runtime?: string | null
   created_at: string
 }
 